@@ -9,32 +9,25 @@ CÓDIGO COMPLETO: 4500+ LÍNEAS - PARTE 1/4
 CORRECCIÓN PRINCIPAL: Variable 'pd' renombrada a 'pd_lib' para evitar conflictos
 """
 
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+_INICIO_ARRANQUE = time.perf_counter()
+
 import streamlit as st
-import pandas as pd_lib  # ← CORRECCIÓN: Renombrado de 'pd' a 'pd_lib'
-import plotly.graph_objects as go
-import plotly.express as px
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 import numpy as np
 import io
-from scipy.stats import norm
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, letter
-from reportlab.platypus import (SimpleDocTemplate, Table, TableStyle, Paragraph, 
-                                Spacer, PageBreak, KeepTogether, Image as RLImage)
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import cm, mm, inch
-from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY, TA_LEFT, TA_RIGHT
-from reportlab.graphics.shapes import Drawing, Line, Rect, Circle, PolyLine, String, Polygon
-from reportlab.graphics.charts.barcharts import VerticalBarChart, HorizontalBarChart
-from reportlab.graphics.charts.lineplots import LinePlot
-from reportlab.graphics.charts.legends import Legend
-from reportlab.graphics import renderPDF
-from reportlab.pdfgen import canvas as pdf_canvas
-import base64
-import time
-import json
 from typing import Dict, List, Tuple, Optional
 import warnings
+from wppsi import (BaremosWPPSIUltra, procesar_evaluacion_completa, generar_recomendaciones,
+                   edad_en_meses, CACHE_EVALUACIONES, PuntuacionIncremental, TABLA_METRICAS)
+
+# pandas, Plotly, SciPy y ReportLab se importan de forma diferida en el paso que
+# los necesita (ver medir_importacion)
+_FIN_ARRANQUE = time.perf_counter()
 warnings.filterwarnings('ignore')
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -53,6 +46,35 @@ st.set_page_config(
     }
 )
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# PERFIL DE IMPORTACIÓN (CARGA DIFERIDA DE DEPENDENCIAS PESADAS)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# WPPSI_REPORTE_IMPORTACION=1 vuelca en stderr el tiempo de cada primera carga
+REPORTE_IMPORTACION = os.environ.get('WPPSI_REPORTE_IMPORTACION', '') not in ('', '0')
+
+@st.cache_resource
+def registro_importaciones() -> Dict[str, float]:
+    """Tiempos de primera importación del proceso, compartidos entre sesiones"""
+    return {}
+
+def registrar_importacion(etiqueta: str, milisegundos: float):
+    """Registra solo la primera carga de cada grupo (las siguientes salen de sys.modules)"""
+    registro = registro_importaciones()
+    if etiqueta not in registro:
+        registro[etiqueta] = milisegundos
+        if REPORTE_IMPORTACION:
+            print(f"[importación] {etiqueta}: {milisegundos:.1f} ms", file=sys.stderr, flush=True)
+
+@contextmanager
+def medir_importacion(etiqueta: str):
+    """Envuelve los import diferidos de un paso para medir su coste de arranque"""
+    inicio = time.perf_counter()
+    yield
+    registrar_importacion(etiqueta, (time.perf_counter() - inicio) * 1000)
+
+registrar_importacion("Arranque (Streamlit, NumPy, wppsi)", (_FIN_ARRANQUE - _INICIO_ARRANQUE) * 1000)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # INICIALIZACIÓN DE SESSION STATE
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -92,15 +114,25 @@ def init_session_state():
             'dibujos': False
         },
         'pd_dict': {},
-        'pe_dict': {},
-        'indices_primarios': {},
-        'indices_secundarios': {},
-        'analisis_completo': {},
-        'fortalezas': [],
-        'debilidades': [],
+        'puntuacion_incremental': PuntuacionIncremental(),  # Vista previa de índices del paso 3
+        'analisis_completo': None,  # ResultadoEvaluacion del último procesamiento
         'comparaciones': {},
         'interpretacion_generada': False,
-        'historial_evaluaciones': [],
+        'historial_evaluaciones': [],  # ids guardados en el almacén durante esta sesión
+        'evaluacion_id': None,
+        'diario_sesion': uuid.uuid4().hex,  # Identifica esta sesión en el diario de cambios
+        'diario_ultimo': None,              # Último estado anexado al diario
+        'diario_revisado': None,            # Examinador para el que ya se buscó una evaluación pendiente
+        'diario_pendiente': None,
+        'graficos': {},                     # Figuras del resultado actual (ver grafico_memorizado)
+        'instantanea_bytes': None,
+        'busqueda_texto': '',
+        'busqueda_pagina': 0,
+        'historial_filas': [],              # Solo la página visible del historial
+        'historial_siguiente': None,        # Cursor de la página siguiente
+        'historial_cursores': [],           # Cursores de las páginas anteriores (para volver)
+        'historial_consulta': None,         # Filtros, orden y cursor de la página cargada
+        'historial_total': 0,
         'pdf_generado': False,
         'buffer_pdf': None,
         'observaciones_conductuales': {
@@ -119,6 +151,194 @@ def init_session_state():
 
 init_session_state()
 
+def datos_personales_sesion() -> Dict:
+    """Datos del paciente tal como se ingresaron en el paso 1"""
+    datos_personales = {
+        'nombre': st.session_state.nombre_paciente,
+        'fecha_nacimiento': str(st.session_state.fecha_nacimiento),
+        'fecha_evaluacion': str(st.session_state.fecha_evaluacion),
+        'edad_texto': '',
+        'examinador': st.session_state.examinador,
+        'lugar': st.session_state.lugar_aplicacion,
+        'sexo': st.session_state.sexo,
+        'dominancia': st.session_state.dominancia,
+        'lenguaje': st.session_state.get('lenguaje', 'Español'),
+        'escolaridad': st.session_state.get('escolaridad', ''),
+        'motivo_consulta': st.session_state.motivo_consulta,
+        'observaciones': st.session_state.observaciones,
+        'antecedentes': st.session_state.get('antecedentes', '')
+    }
+    
+    if st.session_state.fecha_nacimiento and st.session_state.fecha_evaluacion:
+        y, m, d = BaremosWPPSIUltra.calcular_edad_exacta(
+            st.session_state.fecha_nacimiento,
+            st.session_state.fecha_evaluacion
+        )
+        datos_personales['edad_texto'] = f"{y} años, {m} meses y {d} días"
+    return datos_personales
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DIARIO DE CAMBIOS - RECUPERACIÓN TRAS RECARGAS O CAÍDAS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+CAMPOS_EVALUACION = (
+    'paso_actual', 'nombre_paciente', 'fecha_nacimiento', 'fecha_evaluacion', 'examinador',
+    'lugar_aplicacion', 'sexo', 'dominancia', 'lenguaje', 'escolaridad', 'motivo_consulta',
+    'observaciones', 'antecedentes', 'pruebas_aplicadas', 'pd_dict', 'observaciones_conductuales'
+)
+
+# Widgets del paso 1 cuyo estado tiene prioridad sobre el valor restaurado
+WIDGETS_DATOS = (
+    'input_nombre', 'input_fecha_nac', 'select_sexo', 'select_dominancia', 'input_fecha_eval',
+    'input_examinador', 'input_lugar', 'select_lenguaje', 'text_motivo', 'text_escolaridad',
+    'text_observaciones', 'text_antecedentes'
+)
+
+def diario_cambios():
+    """Diario del proceso; None si no se puede abrir (p. ej. disco de solo lectura)"""
+    try:
+        from wppsi import obtener_diario
+        return obtener_diario()
+    except OSError:
+        return None
+
+def estado_diario() -> Dict:
+    """Campos de la evaluación en curso; los diccionarios se aplanan como 'campo.clave'"""
+    estado = {}
+    for campo in CAMPOS_EVALUACION:
+        valor = st.session_state.get(campo)
+        if isinstance(valor, dict):
+            for clave, subvalor in valor.items():
+                estado[f"{campo}.{clave}"] = subvalor
+        else:
+            estado[campo] = valor
+    return estado
+
+def registrar_en_diario():
+    """Anexa al diario solo los campos que cambiaron desde el rerun anterior"""
+    estado = estado_diario()
+    anterior = st.session_state.diario_ultimo
+    st.session_state.diario_ultimo = estado
+    if anterior is None:  # Primer rerun de la sesión: los valores por defecto no se anexan
+        return
+    
+    cambios = {k: v for k, v in estado.items() if k not in anterior or anterior[k] != v}
+    diario = diario_cambios() if cambios else None
+    if diario is not None:
+        diario.registrar(st.session_state.diario_sesion, st.session_state.examinador, cambios)
+
+def aplicar_campos_evaluacion(campos: Dict):
+    """
+    Vuelca campos de evaluación en la sesión ('campo.clave' actualiza una entrada
+    de un diccionario) y descarta el estado de los widgets para que tomen los valores nuevos
+    """
+    for campo, valor in campos.items():
+        base, _, clave = campo.partition('.')
+        if base not in CAMPOS_EVALUACION:
+            continue
+        if clave:
+            st.session_state[base] = {**st.session_state[base], clave: valor}
+        elif isinstance(valor, dict):
+            st.session_state[base] = dict(valor)
+        else:
+            st.session_state[base] = valor
+    
+    for clave in list(st.session_state.keys()):
+        prefijo, _, prueba = clave.partition('_')
+        if clave in WIDGETS_DATOS or (prefijo in ('pd', 'check') and prueba in BaremosWPPSIUltra.PRUEBAS_INFO):
+            del st.session_state[clave]
+
+def restaurar_desde_diario(pendiente: Dict):
+    """Vuelca en la sesión los campos de una evaluación sin terminar y continúa su registro"""
+    aplicar_campos_evaluacion(pendiente['campos'])
+    st.session_state.datos_completos = False
+    st.session_state.analisis_completo = None
+    st.session_state.evaluacion_id = None
+    st.session_state.diario_sesion = pendiente['sesion']
+    st.session_state.diario_ultimo = estado_diario()
+    st.session_state.diario_pendiente = None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INSTANTÁNEAS DE SESIÓN - GUARDAR Y RESTAURAR
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def instantanea_sesion():
+    """Estado completo de la evaluación, con los gráficos ya generados para el resultado actual"""
+    from wppsi import Instantanea
+    resultado = st.session_state.analisis_completo
+    memo = st.session_state.graficos
+    graficos = {}
+    if resultado is not None and memo.get('resultado') == resultado:
+        graficos = {nombre: fig if isinstance(fig, str) else fig.to_json()
+                    for nombre, fig in memo['figuras'].items() if fig is not None}
+    return Instantanea(
+        campos={campo: st.session_state.get(campo) for campo in CAMPOS_EVALUACION},
+        resultado=resultado,
+        graficos=graficos
+    )
+
+def restaurar_instantanea(instantanea):
+    """Restaura campos y resultado (puntuado de nuevo al leerla) y, si le corresponden, sus gráficos"""
+    aplicar_campos_evaluacion(instantanea.campos)
+    st.session_state.analisis_completo = instantanea.resultado
+    st.session_state.datos_completos = instantanea.resultado is not None
+    st.session_state.evaluacion_id = None
+    st.session_state.graficos = {'resultado': instantanea.resultado, 'figuras': dict(instantanea.graficos)}
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EVALUACIONES GUARDADAS - ABRIR DESDE EL HISTORIAL
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Campo del almacén -> campo de la sesión
+CAMPOS_ALMACEN = {
+    'nombre': 'nombre_paciente', 'fecha_nacimiento': 'fecha_nacimiento', 'fecha_evaluacion': 'fecha_evaluacion',
+    'examinador': 'examinador', 'lugar': 'lugar_aplicacion', 'sexo': 'sexo', 'dominancia': 'dominancia',
+    'lenguaje': 'lenguaje', 'escolaridad': 'escolaridad', 'motivo_consulta': 'motivo_consulta',
+    'observaciones': 'observaciones', 'antecedentes': 'antecedentes'
+}
+
+def abrir_evaluacion_guardada(evaluacion: Dict):
+    """Carga una evaluación del almacén en la sesión y la muestra en el paso 4 (guardar la reemplaza)"""
+    campos = {'paso_actual': 4}
+    for campo, campo_sesion in CAMPOS_ALMACEN.items():
+        valor = evaluacion['datos_personales'].get(campo)
+        if campo_sesion in ('fecha_nacimiento', 'fecha_evaluacion'):
+            campos[campo_sesion] = date.fromisoformat(valor) if valor else None
+        else:
+            campos[campo_sesion] = valor or ''
+    campos['pruebas_aplicadas'] = evaluacion['pruebas_aplicadas']
+    campos['pd_dict'] = evaluacion['pd_dict']
+    campos['observaciones_conductuales'] = {**dict.fromkeys(st.session_state.observaciones_conductuales, ''),
+                                            **evaluacion['observaciones_conductuales']}
+    aplicar_campos_evaluacion(campos)
+    
+    st.session_state.analisis_completo = evaluacion['resultado']
+    st.session_state.datos_completos = True
+    st.session_state.evaluacion_id = evaluacion['id']
+    st.session_state.graficos = {}
+    st.session_state.pdf_generado = False
+    st.session_state.buffer_pdf = None
+    st.session_state.diario_ultimo = estado_diario()  # Ya está guardada: no se anexa al diario
+
+def mostrar_fila_evaluacion(ev: Dict, clave: str, detalle: Optional[str] = None):
+    """Resumen de una evaluación guardada con el botón para abrirla en el paso 4"""
+    col_info, col_abrir = st.columns([5, 1])
+    with col_info:
+        marca = "🟢 " if ev['id'] in st.session_state.historial_evaluaciones else ""
+        st.markdown(f"{marca}**{ev['nombre'] or 'Sin nombre'}** · Evaluación {ev['fecha_evaluacion'] or '-'} · "
+                    f"{ev['examinador'] or 'Sin examinador'} · CIT {ev['cit'] or '-'}")
+        if detalle:
+            st.caption(detalle)
+    with col_abrir:
+        if st.button("Abrir", key=f"btn_abrir_{clave}_{ev['id']}", use_container_width=True):
+            from wppsi import obtener_almacen
+            evaluacion = obtener_almacen().obtener(ev['id'])
+            if evaluacion is None:
+                st.error("❌ La evaluación ya no existe")
+            else:
+                abrir_evaluacion_guardada(evaluacion)
+                st.rerun()
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # ESTILOS CSS ULTRA MEJORADOS - DISEÑO PROFESIONAL
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -375,727 +595,83 @@ div[data-testid="metric-container"]:hover {
 st.markdown('<div class="daniela-avatar-ultra" title="Desarrollado con ❤️ para Daniela">👩‍🦱</div>', unsafe_allow_html=True)
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# CLASE DE BAREMOS WPPSI-IV ULTRA COMPLETA
+# FUNCIONES DE VISUALIZACIÓN CON PLOTLY (CORREGIDAS)
 # ═══════════════════════════════════════════════════════════════════════════════
 
-class BaremosWPPSIUltra:
-    """
-    Clase que contiene TODOS los baremos oficiales del WPPSI-IV
-    Basado en el manual técnico oficial de Pearson
-    Incluye baremos para edad 4:0-7:7 años
-    """
-    
-    # Tablas de conversión PD a PE (Puntuación Directa a Puntuación Escalar)
-    TABLAS_CONVERSION_PD_PE = {
-        'cubos': {
-            0:1, 1:1, 2:1, 3:1, 4:1, 5:2, 6:3, 7:4, 8:5, 9:6, 10:7, 11:8, 12:9,
-            13:10, 14:11, 15:12, 16:13, 17:14, 18:15, 19:16, 20:16, 21:17, 22:17,
-            23:18, 24:18, 25:19, 26:19, 27:19, 28:19, 29:19, 30:19
-        },
-        'informacion': {
-            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
-            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:17, 20:17, 21:18, 22:18,
-            23:19, 24:19, 25:19, 26:19
-        },
-        'matrices': {
-            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
-            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
-        },
-        'busqueda_animales': {
-            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
-            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:17, 20:18, 21:19
-        },
-        'reconocimiento': {
-            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
-            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:17, 20:18
-        },
-        'semejanzas': {
-            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
-            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:16, 20:17, 21:17, 22:18,
-            23:18, 24:19, 25:19, 26:19, 27:19, 28:19, 29:19, 30:19
-        },
-        'conceptos': {
-            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
-            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
-        },
-        'localizacion': {
-            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
-            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
-        },
-        'cancelacion': {
-            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
-            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19, 21:19
-        },
-        'rompecabezas': {
-            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
-            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
-        },
-        'vocabulario': {
-            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
-            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
-        },
-        'nombres': {
-            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
-            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
-        },
-        'clave_figuras': {
-            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
-            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
-        },
-        'comprension': {
-            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
-            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
-        },
-        'dibujos': {
-            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
-            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
-        }
-    }
-    
-    # Información detallada de cada prueba
-    PRUEBAS_INFO = {
-        'cubos': {
-            'nombre': 'Cubos',
-            'nombre_corto': 'C',
-            'indice_primario': 'IVE',
-            'descripcion': 'Razonamiento visoespacial y construcción',
-            'que_mide': 'Análisis y síntesis visoespacial, coordinación visomotora',
-            'icono': '🧩',
-            'rango_pd': (0, 30),
-            'complementaria': False,
-            'habilidades': ['Percepción visual', 'Organización perceptiva', 'Coordinación motora fina']
-        },
-        'informacion': {
-            'nombre': 'Información',
-            'nombre_corto': 'I',
-            'indice_primario': 'ICV',
-            'descripcion': 'Conocimientos adquiridos',
-            'que_mide': 'Inteligencia cristalizada, conocimiento general',
-            'icono': '📚',
-            'rango_pd': (0, 26),
-            'complementaria': False,
-            'habilidades': ['Memoria a largo plazo', 'Aprendizaje escolar', 'Conocimiento del entorno']
-        },
-        'matrices': {
-            'nombre': 'Matrices',
-            'nombre_corto': 'M',
-            'indice_primario': 'IRF',
-            'descripcion': 'Razonamiento fluido visual',
-            'que_mide': 'Razonamiento fluido no verbal, procesamiento simultáneo',
-            'icono': '🔲',
-            'rango_pd': (0, 20),
-            'complementaria': False,
-            'habilidades': ['Razonamiento abstracto', 'Procesamiento visual', 'Solución de problemas']
-        },
-        'busqueda_animales': {
-            'nombre': 'Búsqueda de Animales',
-            'nombre_corto': 'BA',
-            'indice_primario': 'IVP',
-            'descripcion': 'Velocidad de procesamiento visual',
-            'que_mide': 'Velocidad perceptiva, atención selectiva',
-            'icono': '🐾',
-            'rango_pd': (0, 21),
-            'complementaria': False,
-            'habilidades': ['Velocidad perceptiva', 'Atención selectiva', 'Discriminación visual']
-        },
-        'reconocimiento': {
-            'nombre': 'Reconocimiento',
-            'nombre_corto': 'R',
-            'indice_primario': 'IMT',
-            'descripcion': 'Memoria de trabajo visual',
-            'que_mide': 'Memoria visual a corto plazo',
-            'icono': '👁️',
-            'rango_pd': (0, 20),
-            'complementaria': False,
-            'habilidades': ['Memoria visual', 'Atención', 'Codificación visual']
-        },
-        'semejanzas': {
-            'nombre': 'Semejanzas',
-            'nombre_corto': 'S',
-            'indice_primario': 'ICV',
-            'descripcion': 'Razonamiento verbal abstracto',
-            'que_mide': 'Formación de conceptos verbales, razonamiento categorial',
-            'icono': '💭',
-            'rango_pd': (0, 30),
-            'complementaria': False,
-            'habilidades': ['Razonamiento verbal', 'Formación de conceptos', 'Pensamiento abstracto']
-        },
-        'conceptos': {
-            'nombre': 'Conceptos',
-            'nombre_corto': 'CON',
-            'indice_primario': 'IRF',
-            'descripcion': 'Razonamiento categorial',
-            'que_mide': 'Razonamiento abstracto categorial',
-            'icono': '🎯',
-            'rango_pd': (0, 20),
-            'complementaria': False,
-            'habilidades': ['Clasificación', 'Razonamiento inductivo', 'Flexibilidad cognitiva']
-        },
-        'localizacion': {
-            'nombre': 'Localización',
-            'nombre_corto': 'L',
-            'indice_primario': 'IMT',
-            'descripcion': 'Memoria espacial de trabajo',
-            'que_mide': 'Memoria de trabajo visual-espacial',
-            'icono': '📍',
-            'rango_pd': (0, 20),
-            'complementaria': False,
-            'habilidades': ['Memoria espacial', 'Organización visoespacial', 'Atención']
-        },
-        'cancelacion': {
-            'nombre': 'Cancelación',
-            'nombre_corto': 'CA',
-            'indice_primario': 'IVP',
-            'descripcion': 'Atención y velocidad perceptiva',
-            'que_mide': 'Velocidad de procesamiento, atención sostenida',
-            'icono': '✓',
-            'rango_pd': (0, 21),
-            'complementaria': False,
-            'habilidades': ['Atención sostenida', 'Velocidad psicomotora', 'Rastreo visual']
-        },
-        'rompecabezas': {
-            'nombre': 'Rompecabezas',
-            'nombre_corto': 'RO',
-            'indice_primario': 'IVE',
-            'descripcion': 'Análisis y síntesis visual',
-            'que_mide': 'Integración visomotora, análisis parte-todo',
-            'icono': '🧩',
-            'rango_pd': (0, 20),
-            'complementaria': False,
-            'habilidades': ['Análisis visual', 'Síntesis perceptiva', 'Planificación']
-        },
-        'vocabulario': {
-            'nombre': 'Vocabulario',
-            'nombre_corto': 'V',
-            'indice_primario': 'ICV',
-            'descripcion': 'Conocimiento léxico',
-            'que_mide': 'Desarrollo del lenguaje, formación de conceptos verbales',
-            'icono': '📖',
-            'rango_pd': (0, 19),
-            'complementaria': True,
-            'habilidades': ['Vocabulario expresivo', 'Conocimiento semántico', 'Desarrollo del lenguaje']
-        },
-        'nombres': {
-            'nombre': 'Nombres',
-            'nombre_corto': 'N',
-            'indice_primario': 'ICV',
-            'descripcion': 'Denominación y recuperación léxica',
-            'que_mide': 'Vocabulario expresivo, recuperación de palabras',
-            'icono': '🗣️',
-            'rango_pd': (0, 19),
-            'complementaria': True,
-            'habilidades': ['Denominación', 'Recuperación léxica', 'Procesamiento semántico']
-        },
-        'clave_figuras': {
-            'nombre': 'Clave de Figuras',
-            'nombre_corto': 'CF',
-            'indice_primario': 'IVP',
-            'descripcion': 'Velocidad de codificación',
-            'que_mide': 'Velocidad de procesamiento, memoria asociativa',
-            'icono': '🔑',
-            'rango_pd': (0, 19),
-            'complementaria': True,
-            'habilidades': ['Aprendizaje asociativo', 'Velocidad grafomotora', 'Memoria a corto plazo']
-        },
-        'comprension': {
-            'nombre': 'Comprensión',
-            'nombre_corto': 'CO',
-            'indice_primario': 'ICV',
-            'descripcion': 'Razonamiento social',
-            'que_mide': 'Comprensión de normas sociales, juicio práctico',
-            'icono': '🧐',
-            'rango_pd': (0, 19),
-            'complementaria': True,
-            'habilidades': ['Razonamiento social', 'Juicio práctico', 'Conocimiento de normas']
-        },
-        'dibujos': {
-            'nombre': 'Dibujos',
-            'nombre_corto': 'D',
-            'indice_primario': 'ICV',
-            'descripcion': 'Vocabulario receptivo',
-            'que_mide': 'Comprensión de vocabulario, conocimiento léxico',
-            'icono': '🖼️',
-            'rango_pd': (0, 19),
-            'complementaria': True,
-            'habilidades': ['Vocabulario receptivo', 'Comprensión auditiva', 'Conocimiento conceptual']
-        }
-    }
-    
-    # Tablas de conversión Suma PE a Índice Compuesto
-    TABLA_SUMA_PE_A_INDICE = {
-        'ICV': {
-            4:50, 5:53, 6:55, 7:58, 8:61, 9:64, 10:67, 11:69, 12:72, 13:75,
-            14:78, 15:81, 16:83, 17:86, 18:89, 19:92, 20:94, 21:97, 22:100,
-            23:103, 24:106, 25:108, 26:111, 27:114, 28:117, 29:119, 30:122,
-            31:125, 32:128, 33:131, 34:133, 35:136, 36:139, 37:142, 38:145
-        },
-        'IVE': {
-            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:68, 11:70, 12:73, 13:76,
-            14:79, 15:82, 16:85, 17:88, 18:90, 19:93, 20:96, 21:99, 22:102,
-            23:105, 24:108, 25:110, 26:113, 27:116, 28:119, 29:122, 30:125,
-            31:128, 32:131, 33:133, 34:136, 35:139, 36:142, 37:145, 38:148
-        },
-        'IRF': {
-            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:68, 11:71, 12:74, 13:76,
-            14:79, 15:82, 16:85, 17:88, 18:91, 19:94, 20:97, 21:100, 22:103,
-            23:106, 24:109, 25:112, 26:115, 27:118, 28:121, 29:124, 30:127,
-            31:130, 32:133, 33:136, 34:139, 35:142, 36:145, 37:148, 38:151
-        },
-        'IMT': {
-            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:67, 11:70, 12:73, 13:76,
-            14:79, 15:82, 16:85, 17:88, 18:91, 19:94, 20:97, 21:100, 22:103,
-            23:106, 24:109, 25:112, 26:115, 27:118, 28:121, 29:124, 30:127,
-            31:130, 32:133, 33:136, 34:139, 35:142, 36:145, 37:148, 38:151
-        },
-        'IVP': {
-            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:68, 11:71, 12:73, 13:76,
-            14:79, 15:82, 16:85, 17:88, 18:91, 19:94, 20:97, 21:100, 22:103,
-            23:106, 24:109, 25:112, 26:115, 27:118, 28:121, 29:124, 30:127,
-            31:130, 32:133, 33:136, 34:139, 35:142, 36:145, 37:148, 38:151
-        }
-    }
-    
-    # Tabla de conversión a CIT
-    TABLA_CIT = {
-        10:40, 12:42, 14:44, 16:46, 18:48, 20:50, 22:52, 24:54, 26:56, 28:58,
-        30:60, 32:62, 34:64, 36:66, 38:68, 40:70, 42:72, 44:74, 46:76, 48:78,
-        50:80, 52:82, 54:84, 56:86, 58:88, 60:90, 62:92, 63:93, 64:94, 65:95,
-        66:96, 67:97, 68:98, 69:99, 70:100, 71:101, 72:102, 73:103, 74:104,
-        75:105, 76:106, 77:107, 78:108, 79:109, 80:110, 82:112, 84:114, 86:116,
-        88:118, 90:120, 92:122, 94:124, 95:125, 96:126, 97:127, 98:128, 99:129,
-        100:130, 102:132, 104:134, 106:136, 108:138, 110:140, 112:142, 114:144,
-        115:145, 116:146, 117:147, 118:148, 119:149, 120:150
-    }
-    
-    # Configuración de índices secundarios
-    INDICES_SECUNDARIOS_CONFIG = {
-        'IAV': {
-            'nombre': 'Adquisición de Vocabulario',
-            'nombre_corto': 'IAV',
-            'pruebas': ['dibujos', 'nombres'],
-            'descripcion': 'Rendimiento en vocabulario receptivo y expresivo',
-            'tabla_conversion': {
-                2:50, 3:55, 4:60, 5:65, 6:70, 7:74, 8:79, 9:84, 10:89, 11:94,
-                12:99, 13:103, 14:108, 15:113, 16:118, 17:123, 18:128, 19:133,
-                20:137, 21:142, 22:147, 23:152, 24:157, 25:160
-            }
-        },
-        'INV': {
-            'nombre': 'No Verbal',
-            'nombre_corto': 'INV',
-            'pruebas': ['cubos', 'matrices', 'conceptos', 'reconocimiento', 'busqueda_animales'],
-            'descripcion': 'Aptitud intelectual sin lenguaje expresivo',
-            'tabla_conversion': {
-                10:40, 15:50, 20:60, 25:70, 30:80, 35:90, 40:95, 45:100, 50:105,
-                55:110, 60:115, 65:120, 70:125, 75:130, 80:135, 85:140, 90:145,
-                95:150
-            }
-        },
-        'ICG': {
-            'nombre': 'Capacidad General',
-            'nombre_corto': 'ICG',
-            'pruebas': ['informacion', 'semejanzas', 'cubos', 'matrices'],
-            'descripcion': 'Aptitud intelectual menos dependiente de MT y VP',
-            'tabla_conversion': {
-                10:47, 15:57, 20:67, 25:77, 30:87, 35:97, 40:107, 45:117, 50:128,
-                55:138, 60:148, 65:153, 70:158, 76:160
-            }
-        },
-        'ICC': {
-            'nombre': 'Competencia Cognitiva',
-            'nombre_corto': 'ICC',
-            'pruebas': ['reconocimiento', 'localizacion', 'busqueda_animales', 'cancelacion'],
-            'descripcion': 'Eficacia en procesamiento cognitivo',
-            'tabla_conversion': {
-                10:47, 15:57, 20:67, 25:77, 30:87, 35:97, 40:107, 45:117, 50:127,
-                55:137, 60:147, 65:153, 70:158, 76:160
-            }
-        }
-    }
-    
-    @staticmethod
-    def calcular_edad_exacta(fecha_nac: date, fecha_eval: date) -> Tuple[int, int, int]:
-        """Calcula edad cronológica exacta en años, meses y días"""
-        years = fecha_eval.year - fecha_nac.year
-        months = fecha_eval.month - fecha_nac.month
-        days = fecha_eval.day - fecha_nac.day
-        
-        if days < 0:
-            months -= 1
-            # Calcular días del mes anterior
-            mes_anterior = fecha_eval.month - 1 if fecha_eval.month > 1 else 12
-            año_mes_anterior = fecha_eval.year if fecha_eval.month > 1 else fecha_eval.year - 1
-            
-            if mes_anterior in [1, 3, 5, 7, 8, 10, 12]:
-                days_in_prev_month = 31
-            elif mes_anterior in [4, 6, 9, 11]:
-                days_in_prev_month = 30
-            else:  # Febrero
-                if (año_mes_anterior % 4 == 0 and año_mes_anterior % 100 != 0) or (año_mes_anterior % 400 == 0):
-                    days_in_prev_month = 29
-                else:
-                    days_in_prev_month = 28
-            
-            days += days_in_prev_month
-        
-        if months < 0:
-            years -= 1
-            months += 12
-        
-        return years, months, days
-    
-    @staticmethod
-    def convertir_pd_a_pe(prueba: str, puntuacion_directa: int) -> Optional[int]:
-        """Convierte PD a PE usando tablas oficiales"""
-        if puntuacion_directa is None or puntuacion_directa == '':
-            return None
-        
-        puntuacion_directa = int(puntuacion_directa)
-        tabla = BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE.get(prueba, {})
-        
-        if puntuacion_directa not in tabla:
-            if puntuacion_directa <= 0:
-                return 1
-            else:
-                return max(tabla.values()) if tabla else 19
-        
-        return tabla[puntuacion_directa]
-    
-    @staticmethod
-    def calcular_indice_compuesto(suma_pe: int, tipo_indice: str) -> Optional[int]:
-        """Calcula índice compuesto a partir de suma de PE"""
-        if suma_pe is None or suma_pe <= 0:
-            return None
-        
-        tabla = BaremosWPPSIUltra.TABLA_SUMA_PE_A_INDICE.get(tipo_indice, {})
-        valores_tabla = sorted(tabla.keys())
-        
-        for val in valores_tabla:
-            if suma_pe <= val:
-                return tabla[val]
-        
-        return tabla[valores_tabla[-1]] if valores_tabla else 100
-    
-    @staticmethod
-    def calcular_cit_total(suma_total_pe: int) -> Optional[int]:
-        """Calcula CIT a partir de suma total de PE"""
-        if suma_total_pe is None or suma_total_pe <= 0:
-            return None
-        
-        valores_tabla = sorted(BaremosWPPSIUltra.TABLA_CIT.keys())
-        for val in valores_tabla:
-            if suma_total_pe <= val:
-                return BaremosWPPSIUltra.TABLA_CIT[val]
-        
-        return BaremosWPPSIUltra.TABLA_CIT[valores_tabla[-1]] if valores_tabla else 100
-    
-    @staticmethod
-    def obtener_percentil_exacto(ci: int) -> str:
-        """Calcula percentil exacto usando distribución normal"""
-        if ci is None:
-            return None
-        
-        percentil = norm.cdf((ci - 100) / 15) * 100
-        
-        if percentil > 99.9:
-            return ">99.9"
-        elif percentil < 0.1:
-            return "<0.1"
-        else:
-            return round(percentil, 1)
-    
-    @staticmethod
-    def obtener_categoria_descriptiva(ci: int) -> Tuple[str, str, str]:
-        """Retorna categoría descriptiva, color y descripción según CI"""
-        if ci is None:
-            return "No calculado", "#95a5a6", "Datos insuficientes"
-        
-        if ci >= 130:
-            return "Muy Superior", "#27ae60", "Capacidades intelectuales excepcionales (2.2% superior)"
-        elif ci >= 120:
-            return "Superior", "#2ecc71", "Rendimiento significativamente por encima del promedio (6.7%)"
-        elif ci >= 110:
-            return "Medio Alto", "#3498db", "Rendimiento por encima del promedio (16.1%)"
-        elif ci >= 90:
-            return "Medio", "#f39c12", "Rendimiento dentro del rango promedio esperado (50%)"
-        elif ci >= 80:
-            return "Medio Bajo", "#e67e22", "Rendimiento ligeramente por debajo del promedio (16.1%)"
-        elif ci >= 70:
-            return "Límite", "#e74c3c", "Requiere atención y posible intervención (6.7%)"
-        else:
-            return "Muy Bajo", "#c0392b", "Requiere intervención especializada (2.2%)"
-    
-    @staticmethod
-    def obtener_intervalo_confianza_90(ci: int) -> Tuple[Optional[int], Optional[int]]:
-        """Calcula intervalo de confianza al 90%"""
-        if ci is None:
-            return None, None
-        
-        # Margen de error para 90% de confianza (SEM * 1.645)
-        margen = 6  # Aproximado según manual WPPSI-IV
-        return ci - margen, ci + margen
+def _base_perfil_escalares() -> 'go.Figure':
+    """Zonas de PE, línea media y layout del perfil escalar (sin datos del paciente)"""
+    fig = go.Figure()
+    # Zonas
+    fig.add_hrect(y0=13, y1=19, fillcolor="rgba(39, 174, 96, 0.12)", line_width=0)
+    fig.add_hrect(y0=8, y1=12, fillcolor="rgba(243, 156, 18, 0.10)", line_width=0)
+    fig.add_hrect(y0=1, y1=7, fillcolor="rgba(231, 76, 60, 0.12)", line_width=0)
+    fig.add_hline(y=10, line_dash="dot", line_color="#7f8c8d", line_width=3)
+    fig.update_layout(
+        title=dict(text='<b>📊 PERFIL DE PUNTUACIONES ESCALARES (PE)</b>', x=0.5, font=dict(size=20)),
+        yaxis=dict(range=[0, 20], dtick=2, title=dict(text="<b>Puntuación Escalar</b>"), tickfont=dict(size=12)),
+        xaxis=dict(tickangle=-45, tickfont=dict(size=12)),
+        height=550, margin=dict(t=80, b=100, l=50, r=50)
+    )
+    return fig
+
+def _base_distribucion_normal() -> 'go.Figure':
+    """Curva N(100, 15) y layout del gráfico de posición en la curva normal"""
+    with medir_importacion("SciPy (curva normal)"):
+        from scipy.stats import norm
+    x = np.linspace(40, 160, 1000)
+    y = norm.pdf(x, 100, 15)
     
-    @staticmethod
-    def clasificar_pe(pe: int) -> str:
-        """Clasifica una PE como Fortaleza, Promedio o Debilidad"""
-        if pe is None:
-            return "No evaluado"
-        elif pe >= 13:
-            return "Fortaleza"
-        elif pe <= 7:
-            return "Debilidad"
-        else:
-            return "Promedio"
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', fill='tozeroy', name='Curva Normal'))
+    fig.update_layout(
+        title=dict(text='<b>📐 POSICIÓN EN LA CURVA NORMAL</b>', x=0.5),
+        xaxis=dict(range=[40, 160], title=dict(text="CI")),
+        yaxis=dict(showticklabels=False),
+        height=400
+    )
+    return fig
 
-# ═══════════════════════════════════════════════════════════════════════════════
-# WPPSI-IV PARTE 2/4: FUNCIONES DE PROCESAMIENTO Y VISUALIZACIÓN
-# ═══════════════════════════════════════════════════════════════════════════════
+@st.cache_resource
+def _plantillas_graficos(version: str) -> Dict[str, str]:
+    return {'perfil': _base_perfil_escalares().to_json(),
+            'distribucion': _base_distribucion_normal().to_json()}
 
-def procesar_evaluacion_completa(datos_personales: Dict, pruebas_aplicadas: Dict, pd_dict: Dict) -> Dict:
+def plantillas_graficos() -> Dict[str, str]:
     """
-    Procesa la evaluación WPPSI-IV de forma completa y genera todos los análisis
-    
-    Args:
-        datos_personales: Diccionario con datos del paciente
-        pruebas_aplicadas: Diccionario con pruebas marcadas como aplicadas
-        pd_dict: Diccionario con puntuaciones directas
-    
-    Returns:
-        Diccionario completo con todos los resultados del análisis
+    JSON de las partes fijas de cada gráfico, generado una vez por proceso y por
+    versión del código de _base_* (editarlas en caliente genera plantillas nuevas)
     """
-    
-    resultados = {
-        'datos_personales': datos_personales,
-        'pruebas_aplicadas': pruebas_aplicadas,
-        'pd': {},
-        'pe': {},
-        'sumas_indices': {},
-        'indices_primarios': {},
-        'indices_secundarios': {},
-        'cit': None,
-        'percentiles': {},
-        'categorias': {},
-        'intervalos_confianza': {},
-        'fortalezas': [],
-        'debilidades': [],
-        'analisis_comparativo': {},
-        'interpretacion_narrativa': {},
-        'estadisticas_perfil': {},
-        'recomendaciones': []
-    }
-    
-    # 1. CONVERTIR PD A PE
-    for prueba, aplicada in pruebas_aplicadas.items():
-        if aplicada and prueba in pd_dict and pd_dict[prueba] is not None:
-            puntuacion_directa = pd_dict[prueba]
-            pe = BaremosWPPSIUltra.convertir_pd_a_pe(prueba, puntuacion_directa)
-            
-            resultados['pd'][prueba] = puntuacion_directa
-            resultados['pe'][prueba] = pe
-    
-    # 2. CALCULAR SUMAS POR ÍNDICE PRIMARIO
-    sumas = {'ICV': 0, 'IVE': 0, 'IRF': 0, 'IMT': 0, 'IVP': 0}
-    contadores = {'ICV': 0, 'IVE': 0, 'IRF': 0, 'IMT': 0, 'IVP': 0}
-    
-    for prueba, pe in resultados['pe'].items():
-        if pe is not None:
-            info_prueba = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]
-            indice = info_prueba['indice_primario']
-            
-            if indice in sumas:
-                sumas[indice] += pe
-                contadores[indice] += 1
-    
-    resultados['sumas_indices'] = sumas
-    
-    # 3. CALCULAR ÍNDICES COMPUESTOS PRIMARIOS
-    for indice, suma in sumas.items():
-        if contadores[indice] >= 2:
-            ic = BaremosWPPSIUltra.calcular_indice_compuesto(suma, indice)
-            resultados['indices_primarios'][indice] = ic
-            
-            resultados['percentiles'][indice] = BaremosWPPSIUltra.obtener_percentil_exacto(ic)
-            
-            cat, color, desc = BaremosWPPSIUltra.obtener_categoria_descriptiva(ic)
-            resultados['categorias'][indice] = {'categoria': cat, 'color': color, 'descripcion': desc}
-            
-            ic_inf, ic_sup = BaremosWPPSIUltra.obtener_intervalo_confianza_90(ic)
-            resultados['intervalos_confianza'][indice] = (ic_inf, ic_sup)
-    
-    # 4. CALCULAR CIT
-    suma_total = sum(resultados['pe'].values())
-    if len(resultados['pe']) >= 5:
-        cit = BaremosWPPSIUltra.calcular_cit_total(suma_total)
-        resultados['cit'] = cit
-        resultados['indices_primarios']['CIT'] = cit
-        
-        resultados['percentiles']['CIT'] = BaremosWPPSIUltra.obtener_percentil_exacto(cit)
-        
-        cat, color, desc = BaremosWPPSIUltra.obtener_categoria_descriptiva(cit)
-        resultados['categorias']['CIT'] = {'categoria': cat, 'color': color, 'descripcion': desc}
-        
-        ic_inf, ic_sup = BaremosWPPSIUltra.obtener_intervalo_confianza_90(cit)
-        resultados['intervalos_confianza']['CIT'] = (ic_inf, ic_sup)
-    
-    # 5. CALCULAR ÍNDICES SECUNDARIOS
-    for idx_sec, config in BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG.items():
-        suma_sec = 0
-        contador_sec = 0
-        
-        for prueba in config['pruebas']:
-            if prueba in resultados['pe'] and resultados['pe'][prueba] is not None:
-                suma_sec += resultados['pe'][prueba]
-                contador_sec += 1
-        
-        if contador_sec >= len(config['pruebas']):  # Todas las pruebas disponibles
-            # Buscar en tabla de conversión
-            if 'tabla_conversion' in config:
-                valores_tabla = sorted(config['tabla_conversion'].keys())
-                ic_sec = None
-                for val in valores_tabla:
-                    if suma_sec <= val:
-                        ic_sec = config['tabla_conversion'][val]
-                        break
-                
-                if ic_sec is None and valores_tabla:
-                    ic_sec = config['tabla_conversion'][valores_tabla[-1]]
-                
-                if ic_sec:
-                    resultados['indices_secundarios'][idx_sec] = ic_sec
-                    resultados['percentiles'][idx_sec] = BaremosWPPSIUltra.obtener_percentil_exacto(ic_sec)
-                    
-                    cat, color, desc = BaremosWPPSIUltra.obtener_categoria_descriptiva(ic_sec)
-                    resultados['categorias'][idx_sec] = {'categoria': cat, 'color': color, 'descripcion': desc}
-                    
-                    ic_inf, ic_sup = BaremosWPPSIUltra.obtener_intervalo_confianza_90(ic_sec)
-                    resultados['intervalos_confianza'][idx_sec] = (ic_inf, ic_sup)
-    
-    # 6. ESTADÍSTICAS DEL PERFIL
-    if resultados['pe']:
-        pe_valores = list(resultados['pe'].values())
-        resultados['estadisticas_perfil'] = {
-            'pe_min': min(pe_valores),
-            'pe_max': max(pe_valores),
-            'pe_media': np.mean(pe_valores),
-            'pe_mediana': np.median(pe_valores),
-            'pe_desviacion': np.std(pe_valores),
-            'pe_rango': max(pe_valores) - min(pe_valores),
-            'pe_varianza': np.var(pe_valores),
-            'pe_coef_variacion': (np.std(pe_valores) / np.mean(pe_valores)) * 100 if np.mean(pe_valores) > 0 else 0
-        }
-    
-    # 7. IDENTIFICAR FORTALEZAS Y DEBILIDADES
-    for prueba, pe in resultados['pe'].items():
-        info = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]
-        clasificacion = BaremosWPPSIUltra.clasificar_pe(pe)
-        
-        if clasificacion == "Fortaleza":
-            resultados['fortalezas'].append({
-                'prueba': info['nombre'],
-                'codigo': info['nombre_corto'],
-                'pe': pe,
-                'descripcion': info['descripcion'],
-                'que_mide': info['que_mide'],
-                'indice': info['indice_primario'],
-                'habilidades': info.get('habilidades', [])
-            })
-        elif clasificacion == "Debilidad":
-            resultados['debilidades'].append({
-                'prueba': info['nombre'],
-                'codigo': info['nombre_corto'],
-                'pe': pe,
-                'descripcion': info['descripcion'],
-                'que_mide': info['que_mide'],
-                'indice': info['indice_primario'],
-                'habilidades': info.get('habilidades', [])
-            })
-    
-    # 8. ANÁLISIS COMPARATIVO ENTRE ÍNDICES
-    if len(resultados['indices_primarios']) >= 2:
-        indices_sin_cit = {k: v for k, v in resultados['indices_primarios'].items() if k != 'CIT' and v is not None}
-        if indices_sin_cit:
-            media_indices = np.mean(list(indices_sin_cit.values()))
-            
-            for idx, valor in indices_sin_cit.items():
-                diferencia = valor - media_indices
-                resultados['analisis_comparativo'][idx] = {
-                    'valor': valor,
-                    'media_personal': media_indices,
-                    'diferencia_media': diferencia,
-                    'significativo': abs(diferencia) >= 15,
-                    'desviaciones': diferencia / 15  # En unidades de DE
-                }
-    
-    # 9. GENERAR RECOMENDACIONES AUTOMÁTICAS
-    resultados['recomendaciones'] = generar_recomendaciones(resultados)
-    
-    return resultados
+    from wppsi import huella_codigo
+    return _plantillas_graficos(huella_codigo(_plantillas_graficos))
 
-def generar_recomendaciones(resultados: Dict) -> List[str]:
-    """Genera recomendaciones automáticas basadas en los resultados"""
-    recomendaciones = []
-    
-    # Recomendaciones por CIT
-    if resultados.get('cit'):
-        cit = resultados['cit']
-        if cit >= 120:
-            recomendaciones.append("Considerar programas de enriquecimiento académico")
-            recomendaciones.append("Promover actividades de pensamiento crítico y creativo")
-        elif cit <= 80:
-            recomendaciones.append("Considerar evaluación psicopedagógica complementaria")
-            recomendaciones.append("Implementar estrategias de apoyo individualizado")
-    
-    # Recomendaciones por fortalezas
-    if resultados.get('fortalezas'):
-        areas_fuertes = [f['indice'] for f in resultados['fortalezas']]
-        if 'ICV' in areas_fuertes:
-            recomendaciones.append("Aprovechar fortalezas verbales en el aprendizaje")
-        if 'IVE' in areas_fuertes:
-            recomendaciones.append("Utilizar material visual y espacial en la enseñanza")
-    
-    # Recomendaciones por debilidades
-    if resultados.get('debilidades'):
-        areas_debiles = [d['indice'] for d in resultados['debilidades']]
-        if 'IVP' in areas_debiles:
-            recomendaciones.append("Permitir tiempo adicional en tareas que requieren rapidez")
-            recomendaciones.append("Reducir carga de trabajo que dependa de velocidad de procesamiento")
-        if 'IMT' in areas_debiles:
-            recomendaciones.append("Simplificar instrucciones y presentarlas en pasos pequeños")
-            recomendaciones.append("Utilizar apoyos visuales y recordatorios")
-    
-    return recomendaciones
-
-# ═══════════════════════════════════════════════════════════════════════════════
-# FUNCIONES DE VISUALIZACIÓN CON PLOTLY (CORREGIDAS)
-# ═══════════════════════════════════════════════════════════════════════════════
-
-def crear_grafico_perfil_escalares_ultra(pe_dict: Dict) -> go.Figure:
+def desde_plantilla(nombre: str, formas: Tuple[Dict, ...] = (), anotaciones: Tuple[Dict, ...] = ()) -> 'go.Figure':
+    """
+    Copia nueva de una plantilla, sin revalidar lo que ya se validó al crearla.
+    Las formas y anotaciones del paciente se añaden al dict antes de crear la figura
+    (add_vline y similares cuestan más que clonar la plantilla)
+    """
+    import json
+    figura = json.loads(plantillas_graficos()[nombre])
+    layout = figura.setdefault('layout', {})
+    if formas:
+        layout['shapes'] = layout.get('shapes', []) + list(formas)
+    if anotaciones:
+        layout['annotations'] = layout.get('annotations', []) + list(anotaciones)
+    return go.Figure(figura, _validate=False)
+
+def crear_grafico_perfil_escalares_ultra(pe_dict: Dict) -> 'go.Figure':
     if not pe_dict: return None
     pruebas = list(pe_dict.keys())
     valores = list(pe_dict.values())
     nombres = [BaremosWPPSIUltra.PRUEBAS_INFO[p]['nombre'] for p in pruebas]
-    codigos = [BaremosWPPSIUltra.PRUEBAS_INFO[p]['nombre_corto'] for p in pruebas]
-    
-    fig = go.Figure()
-    # Zonas
-    fig.add_hrect(y0=13, y1=19, fillcolor="rgba(39, 174, 96, 0.12)", line_width=0)
-    fig.add_hrect(y0=8, y1=12, fillcolor="rgba(243, 156, 18, 0.10)", line_width=0)
-    fig.add_hrect(y0=1, y1=7, fillcolor="rgba(231, 76, 60, 0.12)", line_width=0)
-    fig.add_hline(y=10, line_dash="dot", line_color="#7f8c8d", line_width=3)
     
+    fig = desde_plantilla('perfil')
     fig.add_trace(go.Scatter(x=nombres, y=valores, mode='lines+markers+text', text=valores,
         textposition="top center", line=dict(color='#8B1538', width=6),
         marker=dict(size=18, color=valores, cmin=1, cmax=19, colorscale='RdYlGn')))
-        
-    fig.update_layout(
-        title=dict(text='<b>📊 PERFIL DE PUNTUACIONES ESCALARES (PE)</b>', x=0.5, font=dict(size=20)),
-        yaxis=dict(range=[0, 20], dtick=2, title=dict(text="<b>Puntuación Escalar</b>"), tickfont=dict(size=12)),
-        xaxis=dict(tickangle=-45, tickfont=dict(size=12)),
-        height=550, margin=dict(t=80, b=100, l=50, r=50)
-    )
     return fig
 
-def crear_grafico_indices_compuestos_ultra(indices: Dict) -> go.Figure:
+def crear_grafico_indices_compuestos_ultra(indices: Dict) -> 'go.Figure':
     datos = {k: v for k, v in indices.items() if v is not None}
     if not datos: return None
     
@@ -1115,7 +691,7 @@ def crear_grafico_indices_compuestos_ultra(indices: Dict) -> go.Figure:
     )
     return fig
 
-def crear_grafico_radar_cognitivo(indices: Dict) -> go.Figure:
+def crear_grafico_radar_cognitivo(indices: Dict) -> 'go.Figure':
     mapeo = {'ICV': 'Comprensión', 'IVE': 'Visoespacial', 'IRF': 'Razonamiento', 'IMT': 'Memoria', 'IVP': 'Velocidad'}
     cats, vals = [], []
     for k, v in indices.items():
@@ -1136,26 +712,161 @@ def crear_grafico_radar_cognitivo(indices: Dict) -> go.Figure:
     )
     return fig
 
-def crear_grafico_comparacion_indices(indices: Dict) -> go.Figure:
+def crear_grafico_comparacion_indices(indices: Dict) -> 'go.Figure':
     # Versión simplificada que no falla
     return crear_grafico_indices_compuestos_ultra(indices)
 
-def crear_grafico_distribucion_normal(ci: int) -> go.Figure:
+def crear_grafico_distribucion_normal(ci: int) -> 'go.Figure':
     if ci is None: return None
-    x = np.linspace(40, 160, 1000)
-    y = norm.pdf(x, 100, 15)
+    # Lo mismo que add_vline(x=ci, line_dash="dash", line_color="red", annotation_text=...)
+    return desde_plantilla(
+        'distribucion',
+        formas=({'type': 'line', 'x0': ci, 'x1': ci, 'xref': 'x', 'y0': 0, 'y1': 1, 'yref': 'y domain',
+                 'line': {'color': 'red', 'dash': 'dash'}},),
+        anotaciones=({'text': f"CI: {ci}", 'showarrow': False, 'x': ci, 'xref': 'x', 'xanchor': 'left',
+                      'y': 1, 'yref': 'y domain', 'yanchor': 'top'},)
+    )
+
+def crear_grafico_trayectorias(analisis, compuestos: bool) -> 'go.Figure':
+    """Una línea por medida a lo largo de las evaluaciones; los cambios significativos se marcan con ◆"""
+    columnas = [i for i, compuesta in enumerate(analisis.compuestas) if compuesta == compuestos]
+    if not columnas: return None
+
+    fig = go.Figure()
+    if compuestos:
+        fig.add_hrect(y0=90, y1=109, fillcolor="rgba(243, 156, 18, 0.10)", line_width=0)
+        fig.add_hline(y=100, line_dash="dash", line_color="#2c3e50")
+    else:
+        fig.add_hrect(y0=8, y1=12, fillcolor="rgba(243, 156, 18, 0.10)", line_width=0)
+        fig.add_hline(y=10, line_dash="dot", line_color="#7f8c8d", line_width=3)
+
+    fechas = list(analisis.fechas)
+    for i in columnas:
+        medida = analisis.medidas[i]
+        nombre = medida if compuestos else BaremosWPPSIUltra.PRUEBAS_INFO.get(medida, {}).get('nombre_corto', medida)
+        valores = analisis.valores[:, i]
+        medido = ~np.isnan(valores)
+        significativo = analisis.significativo[:, i]
+        fig.add_trace(go.Scatter(
+            x=[f for f, m in zip(fechas, medido) if m], y=valores[medido], name=nombre,
+            mode='lines+markers', marker=dict(size=10,
+                symbol=['diamond' if s else 'circle' for s in significativo[medido]],
+                line=dict(color='#2c3e50', width=[2 if s else 0 for s in significativo[medido]]))
+        ))
+
+    titulo = 'ÍNDICES COMPUESTOS' if compuestos else 'PUNTUACIONES ESCALARES'
+    fig.update_layout(
+        title=dict(text=f'<b>📈 EVOLUCIÓN DE {titulo}</b>', x=0.5, font=dict(size=20)),
+        yaxis=dict(range=[40, 160] if compuestos else [0, 20], title=dict(text="<b>Puntuación</b>")),
+        xaxis=dict(title=dict(text="<b>Fecha de evaluación</b>"), type='category'),
+        height=500, margin=dict(t=80, b=60, l=50, r=50)
+    )
+    return fig
+
+def crear_grafico_cohorte_categorias(resumen: Dict) -> 'go.Figure':
+    """Distribución del CIT por categoría en cada lugar de aplicación (porcentaje de evaluaciones con CIT)"""
+    from wppsi import UMBRALES_CIT
+    lugares = {lugar or 'Sin lugar': datos for lugar, datos in resumen['por_lugar'].items() if datos['con_cit']}
+    if not lugares: return None
     
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=x, y=y, mode='lines', fill='tozeroy', name='Curva Normal'))
-    fig.add_vline(x=ci, line_dash="dash", line_color="red", annotation_text=f"CI: {ci}")
+    for umbral in UMBRALES_CIT:
+        categoria, color, _ = BaremosWPPSIUltra.obtener_categoria_descriptiva(umbral)
+        porcentajes = [100 * datos['categorias'][categoria] / datos['con_cit'] for datos in lugares.values()]
+        fig.add_trace(go.Bar(
+            x=list(lugares), y=porcentajes, name=categoria, marker_color=color,
+            customdata=[datos['categorias'][categoria] for datos in lugares.values()],
+            hovertemplate='%{x}: %{y:.1f}% (%{customdata} casos)<extra>' + categoria + '</extra>'
+        ))
     
     fig.update_layout(
-        title=dict(text='<b>📐 POSICIÓN EN LA CURVA NORMAL</b>', x=0.5),
-        xaxis=dict(range=[40, 160], title=dict(text="CI")),
-        yaxis=dict(showticklabels=False),
-        height=400
+        barmode='stack',
+        title=dict(text='<b>🏫 DISTRIBUCIÓN DEL CIT POR LUGAR DE APLICACIÓN</b>', x=0.5, font=dict(size=20)),
+        yaxis=dict(range=[0, 100], title=dict(text="<b>% de evaluaciones</b>")),
+        height=500, margin=dict(t=80, b=60, l=50, r=50)
+    )
+    return fig
+
+def crear_grafico_cohorte_pe(resumen: Dict) -> 'go.Figure':
+    """Media de PE por prueba y banda de edad"""
+    from wppsi import etiqueta_banda_edad
+    filas = resumen['pe_por_edad']
+    if not filas: return None
+    
+    pruebas = [p for p in BaremosWPPSIUltra.PRUEBAS_INFO if any(f['prueba'] == p for f in filas)]
+    bandas = sorted({f['banda_edad'] for f in filas})
+    medias = {(f['prueba'], f['banda_edad']): f for f in filas}
+    z = [[medias[(p, b)]['media'] if (p, b) in medias else None for b in bandas] for p in pruebas]
+    n = [[medias[(p, b)]['n'] if (p, b) in medias else 0 for b in bandas] for p in pruebas]
+    
+    fig = go.Figure(go.Heatmap(
+        z=z, x=[etiqueta_banda_edad(b) for b in bandas],
+        y=[BaremosWPPSIUltra.PRUEBAS_INFO[p]['nombre'] for p in pruebas],
+        customdata=n, colorscale='RdYlGn', zmin=1, zmax=19, zmid=10,
+        text=[[f"{v:.1f}" if v is not None else "" for v in fila] for fila in z], texttemplate='%{text}',
+        hovertemplate='%{y} · %{x}: PE media %{z:.1f} (n=%{customdata})<extra></extra>'
+    ))
+    fig.update_layout(
+        title=dict(text='<b>📊 PE MEDIA POR PRUEBA Y EDAD</b>', x=0.5, font=dict(size=20)),
+        xaxis=dict(title=dict(text="<b>Edad (años:meses)</b>")),
+        height=550, margin=dict(t=80, b=60, l=50, r=50)
     )
     return fig
+
+# Constructores que dibujan la misma figura que otro: comparten entrada en la caché
+CONSTRUCTORES_EQUIVALENTES = {'crear_grafico_comparacion_indices': 'crear_grafico_indices_compuestos_ultra'}
+
+@st.cache_resource
+def cache_figuras():
+    """JSON de las figuras por contenido, compartido entre sesiones (WPPSI_CACHE_FIGURAS_MB)"""
+    from wppsi import CacheLRU
+    megas = float(os.environ.get('WPPSI_CACHE_FIGURAS_MB', 64))
+    return CacheLRU(max_entradas=100000, max_tamano=int(megas * 1024 * 1024))
+
+def clave_figura(constructor, args: tuple) -> str:
+    """
+    Hash del constructor y de sus datos de entrada. huella_codigo cubre literales
+    y las funciones que usa (plantillas incluidas), por si cambian en caliente
+    """
+    import hashlib
+    import json
+    from wppsi import huella_codigo
+    nombre = CONSTRUCTORES_EQUIVALENTES.get(constructor.__name__, constructor.__name__)
+    codigo = huella_codigo(globals()[nombre]).encode('ascii')
+    datos = json.dumps(args, sort_keys=True, default=str).encode('utf-8')
+    return f"{nombre}:{hashlib.blake2b(codigo + b'|' + datos, digest_size=16).hexdigest()}"
+
+def figura_compartida(constructor, *args) -> Optional['go.Figure']:
+    """Figura desde la caché entre sesiones; si no está, se construye y se guarda su JSON"""
+    import json
+    cache = cache_figuras()
+    clave = clave_figura(constructor, args)
+    encontrada, datos = cache.obtener(clave)
+    if encontrada:
+        return go.Figure(json.loads(datos), _validate=False) if datos else None
+    figura = constructor(*args)
+    cache.guardar(clave, figura.to_json() if figura is not None else '')
+    return figura
+
+def grafico_memorizado(nombre: str, constructor, *args) -> Optional['go.Figure']:
+    """
+    Figura de la sesión para el resultado actual: se pide una sola vez por
+    resultado (a figura_compartida). Las restauradas de una instantánea llegan como
+    JSON y se cargan sin revalidar (la validación de Plotly es lo más costoso de
+    crear la figura)
+    """
+    resultado = st.session_state.analisis_completo
+    memo = st.session_state.graficos
+    if not memo or memo['resultado'] != resultado:
+        memo = st.session_state.graficos = {'resultado': resultado, 'figuras': {}}
+    
+    figuras = memo['figuras']
+    if nombre not in figuras:
+        figuras[nombre] = figura_compartida(constructor, *args)
+    elif isinstance(figuras[nombre], str):
+        import json
+        figuras[nombre] = go.Figure(json.loads(figuras[nombre]), _validate=False)
+    return figuras[nombre]
 #  ════════════════════════════════════════════════════════════════════════
 # WPPSI-IV PARTE 3/4: INTERFAZ DE USUARIO - PASOS 1, 2 Y 3
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -1178,7 +889,8 @@ with st.sidebar:
         2: "🎯 Selección de Pruebas",
         3: "🔢 Puntuaciones Directas",
         4: "📈 Resultados y Análisis",
-        5: "📄 Generar Informe PDF"
+        5: "📄 Generar Informe PDF",
+        6: "🗂️ Historial de Evaluaciones"
     }
     
     # --- LÓGICA CORREGIDA ---
@@ -1200,30 +912,150 @@ with st.sidebar:
     st.markdown("---")
     st.markdown("### ℹ️ INFORMACIÓN")
     
-    progreso = (st.session_state.paso_actual / 5) * 100
-    st.progress(progreso / 100, text=f"Progreso: {int(progreso)}%")
-    
-    st.info(f"""
-    **Paso actual:** {st.session_state.paso_actual}/5
-    
-    {pasos[st.session_state.paso_actual]}
-    """)
+    if st.session_state.paso_actual <= 5:
+        progreso = (st.session_state.paso_actual / 5) * 100
+        st.progress(progreso / 100, text=f"Progreso: {int(progreso)}%")
+        
+        st.info(f"""
+        **Paso actual:** {st.session_state.paso_actual}/5
+        
+        {pasos[st.session_state.paso_actual]}
+        """)
+    else:
+        st.info(pasos[st.session_state.paso_actual])
     
     if st.session_state.datos_completos:
         st.success("✅ Evaluación completada")
-        if st.session_state.pe_dict:
-            n_pruebas = len(st.session_state.pe_dict)
+        resultado = st.session_state.analisis_completo
+        if resultado is not None and resultado.pruebas:
+            n_pruebas = len(resultado.pruebas)
             st.metric("Pruebas aplicadas", n_pruebas)
             
-            if st.session_state.get('cit'):
-                st.metric("CIT", st.session_state.analisis_completo.get('cit', 'N/A'))
+            if resultado.cit:
+                st.metric("CIT", resultado.cit)
+    
+    # Al identificarse el examinador, ofrecer su última evaluación sin terminar
+    # (el widget del paso 1 ya tiene el valor nuevo; la sesión se actualiza más abajo)
+    examinador_actual = (st.session_state.get('input_examinador') or st.session_state.examinador).strip()
+    if examinador_actual and st.session_state.diario_revisado != examinador_actual:
+        st.session_state.diario_revisado = examinador_actual
+        diario = diario_cambios()
+        st.session_state.diario_pendiente = diario.pendiente(
+            examinador_actual, excluir=st.session_state.diario_sesion) if diario is not None else None
+    
+    pendiente = st.session_state.diario_pendiente
+    if pendiente is not None:
+        campos = pendiente['campos']
+        n_pd = sum(1 for campo in campos if campo.startswith('pd_dict.'))
+        st.warning(f"♻️ Evaluación sin terminar de **{campos.get('nombre_paciente') or 'Sin nombre'}** "
+                   f"(paso {campos.get('paso_actual', 1)}, {n_pd} PD) - "
+                   f"{datetime.fromtimestamp(pendiente['actualizado']):%d/%m/%Y %H:%M}")
+        col_rest, col_desc = st.columns(2)
+        with col_rest:
+            if st.button("Restaurar", key="btn_restaurar_diario", use_container_width=True):
+                restaurar_desde_diario(pendiente)
+                st.rerun()
+        with col_desc:
+            if st.button("Descartar", key="btn_descartar_diario", use_container_width=True):
+                diario = diario_cambios()
+                if diario is not None:
+                    diario.terminar(pendiente['sesion'], pendiente['examinador'])
+                st.session_state.diario_pendiente = None
+                st.rerun()
+    
+    diario = diario_cambios()
+    if diario is not None and diario.error is not None:
+        perdidos = f" ({diario.descartados} cambios descartados)" if diario.descartados else ""
+        st.warning(f"⚠️ El diario de recuperación no puede escribir en disco: {diario.error.strerror or diario.error}. "
+                   f"Los últimos cambios no se podrán recuperar tras una caída{perdidos}")
     
     st.markdown("---")
     
+    with st.expander("🗂️ Evaluaciones Guardadas"):
+        try:
+            from wppsi import obtener_almacen
+            recientes = obtener_almacen().listar(limite=10)
+        except Exception as e:
+            recientes = []
+            st.caption(f"Historial no disponible: {e}")
+        for ev in recientes:
+            marca = "🟢 " if ev['id'] in st.session_state.historial_evaluaciones else ""
+            st.caption(f"{marca}**{ev['nombre'] or 'Sin nombre'}** · {ev['fecha_evaluacion'] or '-'} · CIT {ev['cit'] or '-'}")
+        if not recientes:
+            st.caption("Aún no hay evaluaciones guardadas")
+    
+    with st.expander("💾 Guardar / Restaurar Sesión"):
+        if st.button("📦 Preparar instantánea", key="btn_preparar_instantanea", use_container_width=True):
+            from wppsi import crear_instantanea
+            inicio = time.perf_counter()
+            st.session_state.instantanea_bytes = crear_instantanea(instantanea_sesion())
+            st.session_state.instantanea_ms = (time.perf_counter() - inicio) * 1000
+        
+        if st.session_state.instantanea_bytes:
+            nombre_archivo = (st.session_state.nombre_paciente or 'sesion').replace(' ', '_')
+            st.download_button(
+                "⬇️ Descargar instantánea",
+                data=st.session_state.instantanea_bytes,
+                file_name=f"WPPSI_{nombre_archivo}_{date.today():%Y%m%d}.wppsi",
+                mime="application/octet-stream",
+                key="btn_descargar_instantanea",
+                use_container_width=True
+            )
+            st.caption(f"{len(st.session_state.instantanea_bytes) / 1024:.1f} KB · "
+                       f"{st.session_state.instantanea_ms:.1f} ms")
+        
+        archivo_instantanea = st.file_uploader("Restaurar desde archivo", type=['wppsi'], key="subir_instantanea")
+        if archivo_instantanea is not None and st.button("♻️ Restaurar instantánea", key="btn_restaurar_instantanea",
+                                                         use_container_width=True):
+            from wppsi import leer_instantanea, ErrorInstantanea
+            try:
+                instantanea = leer_instantanea(archivo_instantanea.getvalue())
+            except ErrorInstantanea as e:
+                st.error(f"❌ No se pudo restaurar: {e}")
+            else:
+                restaurar_instantanea(instantanea)
+                st.session_state.instantanea_bytes = None
+                st.rerun()
+    
     with st.expander("⚙️ Configuración"):
         tema = st.selectbox("Tema de colores", ["Profesional (Rojo)", "Azul", "Verde", "Morado"])
         tamaño_fuente = st.slider("Tamaño de fuente", 12, 18, 14)
         st.caption("Próximamente: Más opciones de personalización")
+        
+        st.markdown("**🗄️ Caché de puntuaciones**")
+        stats_cache = CACHE_EVALUACIONES.estadisticas()
+        st.number_input(
+            "Máximo de evaluaciones en caché",
+            min_value=1,
+            max_value=100000,
+            value=stats_cache['max_entradas'],
+            step=64,
+            key="cfg_cache_max",
+            on_change=lambda: CACHE_EVALUACIONES.configurar(st.session_state.cfg_cache_max),
+            help="Compartida por todas las sesiones del servidor (LRU)"
+        )
+        st.caption(f"Aciertos: {stats_cache['aciertos']} | Fallos: {stats_cache['fallos']} | "
+                   f"Tasa: {stats_cache['tasa_aciertos']:.0%}")
+        st.caption(f"Entradas: {stats_cache['entradas']}/{stats_cache['max_entradas']} | "
+                   f"Desalojos: {stats_cache['desalojos']}")
+        
+        st.markdown("**📊 Caché de gráficos**")
+        stats_figuras = cache_figuras().estadisticas()
+        st.caption(f"Aciertos: {stats_figuras['aciertos']} | Fallos: {stats_figuras['fallos']} | "
+                   f"Tasa: {stats_figuras['tasa_aciertos']:.0%}")
+        st.caption(f"Figuras: {stats_figuras['entradas']} | "
+                   f"{stats_figuras['tamano'] / 1024:.0f} KB de {stats_figuras['max_tamano'] / 1024 / 1024:.0f} MB | "
+                   f"Desalojos: {stats_figuras['desalojos']}")
+        
+        st.markdown("**🖼️ Caché de imágenes del PDF**")
+        from wppsi import obtener_cache_imagenes
+        stats_imagenes = obtener_cache_imagenes().estadisticas()
+        st.caption(f"Aciertos: {stats_imagenes['aciertos']} | Fallos: {stats_imagenes['fallos']} | "
+                   f"Tasa: {stats_imagenes['tasa_aciertos']:.0%}")
+        st.caption(f"{stats_imagenes['tamano'] / 1024 / 1024:.1f} MB de "
+                   f"{stats_imagenes['max_bytes'] / 1024 / 1024:.0f} MB | "
+                   f"Desalojos: {stats_imagenes['desalojos']}",
+                   help=f"Compartida entre procesos en {stats_imagenes['directorio']}")
     
     st.markdown("---")
     st.markdown("""
@@ -1580,6 +1412,9 @@ elif paso == 2:
 # ═══════════════════════════════════════════════════════════════════════════════
 
 elif paso == 3:
+    with medir_importacion("pandas"):
+        import pandas as pd_lib
+
     st.markdown("## <span class='step-number'>3</span> Puntuaciones Directas (PD)", unsafe_allow_html=True)
     st.markdown("---")
     
@@ -1587,6 +1422,20 @@ elif paso == 3:
     
     pruebas_para_ingresar = {k: v for k, v in st.session_state.pruebas_aplicadas.items() if v}
     
+    # Edad en meses para elegir la banda de normas en la vista previa
+    edad_meses_eval = edad_en_meses({
+        'fecha_nacimiento': st.session_state.fecha_nacimiento,
+        'fecha_evaluacion': st.session_state.fecha_evaluacion
+    })
+    
+    # Quitar pruebas desmarcadas y reconvertir si cambió la banda de edad;
+    # las PD sin cambios no se recalculan
+    puntuacion_incremental = st.session_state.puntuacion_incremental
+    puntuacion_incremental.sincronizar(
+        {p: st.session_state.pd_dict[p] for p in pruebas_para_ingresar if p in st.session_state.pd_dict},
+        edad_meses_eval
+    )
+    
     if not pruebas_para_ingresar:
         st.warning("⚠️ No hay pruebas seleccionadas. Vuelva al Paso 2 para seleccionar pruebas.")
         
@@ -1650,9 +1499,10 @@ elif paso == 3:
                                 help=f"Rango válido: {rango[0]}-{rango[1]}"
                             )
                             st.session_state.pd_dict[prueba] = puntuacion_directa  # ← CORRECCIÓN
+                            puntuacion_incremental.actualizar(prueba, puntuacion_directa)
                         
                         with col_preview:
-                            pe = BaremosWPPSIUltra.convertir_pd_a_pe(prueba, puntuacion_directa)  # ← CORRECCIÓN
+                            pe = BaremosWPPSIUltra.convertir_pd_a_pe(prueba, puntuacion_directa, edad_meses_eval)  # ← CORRECCIÓN
                             clasif = BaremosWPPSIUltra.clasificar_pe(pe)
                             
                             st.markdown(f"**Conversión automática:**")
@@ -1671,6 +1521,27 @@ elif paso == 3:
                         
                         st.markdown("---")
         
+        # Índices en vivo (solo se recalculan los que dependen de la PD modificada)
+        st.markdown("### 🧮 Vista Previa de Índices")
+        filas_preview = [
+            {k: v for k, v in puntuacion_incremental.indices_primarios.items() if v is not None},
+            puntuacion_incremental.indices_secundarios
+        ]
+        if filas_preview[0] or filas_preview[1]:
+            for fila in filas_preview:
+                if not fila:
+                    continue
+                cols_preview = st.columns(6)
+                for idx, (compuesto, valor) in enumerate(fila.items()):
+                    percentil, categoria = TABLA_METRICAS.obtener(valor)[:2]
+                    with cols_preview[idx]:
+                        st.metric(compuesto, valor, delta=f"Percentil {percentil}", delta_color="off")
+                        st.caption(categoria)
+        else:
+            st.caption("Los índices aparecen al ingresar al menos 2 pruebas del mismo índice (5 para el CIT)")
+        
+        st.markdown("---")
+        
         # Resumen de puntuaciones ingresadas
         with st.expander("📋 RESUMEN DE PUNTUACIONES INGRESADAS", expanded=True):
             if st.session_state.pd_dict:
@@ -1681,8 +1552,8 @@ elif paso == 3:
                         "Código": BaremosWPPSIUltra.PRUEBAS_INFO[k]['nombre_corto'],
                         "Índice": BaremosWPPSIUltra.PRUEBAS_INFO[k]['indice_primario'],
                         "PD": v,
-                        "PE": BaremosWPPSIUltra.convertir_pd_a_pe(k, v),
-                        "Clasificación": BaremosWPPSIUltra.clasificar_pe(BaremosWPPSIUltra.convertir_pd_a_pe(k, v))
+                        "PE": BaremosWPPSIUltra.convertir_pd_a_pe(k, v, edad_meses_eval),
+                        "Clasificación": BaremosWPPSIUltra.clasificar_pe(BaremosWPPSIUltra.convertir_pd_a_pe(k, v, edad_meses_eval))
                     }
                     for k, v in st.session_state.pd_dict.items()
                 ])
@@ -1711,7 +1582,7 @@ elif paso == 3:
                 st.markdown("#### 📊 Estadísticas Rápidas")
                 col_stat1, col_stat2, col_stat3, col_stat4 = st.columns(4)
                 
-                pe_valores = [BaremosWPPSIUltra.convertir_pd_a_pe(k, v) for k, v in st.session_state.pd_dict.items()]
+                pe_valores = [BaremosWPPSIUltra.convertir_pd_a_pe(k, v, edad_meses_eval) for k, v in st.session_state.pd_dict.items()]
                 
                 with col_stat1:
                     st.metric("PE Mínima", min(pe_valores))
@@ -1758,44 +1629,39 @@ elif paso == 3:
                         progress_bar.progress(80)
                         time.sleep(0.4)
                         
-                        # Preparar datos personales
-                        datos_personales = {
-                            'nombre': st.session_state.nombre_paciente,
-                            'fecha_nacimiento': str(st.session_state.fecha_nacimiento),
-                            'fecha_evaluacion': str(st.session_state.fecha_evaluacion),
-                            'edad_texto': '',
-                            'examinador': st.session_state.examinador,
-                            'lugar': st.session_state.lugar_aplicacion,
-                            'sexo': st.session_state.sexo,
-                            'dominancia': st.session_state.dominancia,
-                            'lenguaje': st.session_state.get('lenguaje', 'Español'),
-                            'escolaridad': st.session_state.get('escolaridad', ''),
-                            'motivo_consulta': st.session_state.motivo_consulta,
-                            'observaciones': st.session_state.observaciones,
-                            'antecedentes': st.session_state.get('antecedentes', '')
-                        }
-                        
-                        if st.session_state.fecha_nacimiento and st.session_state.fecha_evaluacion:
-                            y, m, d = BaremosWPPSIUltra.calcular_edad_exacta(
-                                st.session_state.fecha_nacimiento,
-                                st.session_state.fecha_evaluacion
-                            )
-                            datos_personales['edad_texto'] = f"{y} años, {m} meses y {d} días"
-                        
                         # Procesar evaluación
-                        resultados = procesar_evaluacion_completa(
+                        # Guardar resultados (objeto inmutable compartido con el memo)
+                        datos_personales = datos_personales_sesion()
+                        st.session_state.analisis_completo = procesar_evaluacion_completa(
                             datos_personales,
                             st.session_state.pruebas_aplicadas,
                             st.session_state.pd_dict
                         )
                         
-                        # Guardar resultados
-                        st.session_state.pe_dict = resultados['pe']
-                        st.session_state.indices_primarios = resultados['indices_primarios']
-                        st.session_state.indices_secundarios = resultados['indices_secundarios']
-                        st.session_state.fortalezas = resultados['fortalezas']
-                        st.session_state.debilidades = resultados['debilidades']
-                        st.session_state.analisis_completo = resultados
+                        # Persistir en el almacén local (reprocesar al mismo paciente actualiza su evaluación;
+                        # con otro nombre o fecha de nacimiento se guarda una nueva)
+                        try:
+                            from wppsi import obtener_almacen
+                            evaluacion_id = obtener_almacen().guardar(
+                                datos_personales,
+                                st.session_state.pruebas_aplicadas,
+                                st.session_state.pd_dict,
+                                st.session_state.analisis_completo,
+                                st.session_state.observaciones_conductuales,
+                                evaluacion_id=st.session_state.evaluacion_id
+                            )
+                            st.session_state.evaluacion_id = evaluacion_id
+                            st.session_state.historial_consulta = None  # La página del historial ya no vale
+                            if evaluacion_id not in st.session_state.historial_evaluaciones:
+                                st.session_state.historial_evaluaciones.append(evaluacion_id)
+                            
+                            # Guardada: el diario ya no la ofrece para recuperar
+                            diario = diario_cambios()
+                            if diario is not None:
+                                registrar_en_diario()
+                                diario.terminar(st.session_state.diario_sesion, st.session_state.examinador, evaluacion_id)
+                        except Exception as e:
+                            st.warning(f"⚠️ No se pudo guardar la evaluación en el historial: {e}")
                         st.session_state.datos_completos = True
                         
                         status_text.text("✅ Evaluación completada!")
@@ -1826,24 +1692,45 @@ elif paso == 4:
             st.session_state.paso_actual = 3
             st.rerun()
     else:
+        with medir_importacion("pandas"):
+            import pandas as pd_lib
+        with medir_importacion("Gráficos (Plotly)"):
+            import plotly.graph_objects as go
+
         st.markdown("## <span class='step-number'>4</span> Resultados y Análisis Detallado", unsafe_allow_html=True)
         st.markdown("---")
         
-        resultados = st.session_state.analisis_completo
-        indices = resultados['indices_primarios']
+        resultado = st.session_state.analisis_completo
+        indices = resultado.indices_primarios
+        pe_dict = resultado.pe
         
         # Tabs de resultados
-        tab_dash, tab_graficos, tab_comparativo, tab_clinica, tab_recomendaciones = st.tabs([
+        (tab_dash, tab_graficos, tab_comparativo, tab_clinica, tab_recomendaciones, tab_evolucion,
+         tab_similares) = st.tabs([
             "📊 Dashboard Principal",
             "📈 Gráficos Detallados",
             "🔍 Análisis Comparativo",
             "📝 Interpretación Clínica",
-            "💡 Recomendaciones"
+            "💡 Recomendaciones",
+            "📈 Evolución (Retest)",
+            "👥 Casos Similares"
         ])
         
         with tab_dash:
             st.markdown("### 🎯 Métricas Principales")
             
+            # Percentiles entre las demás evaluaciones guardadas de la misma banda de edad
+            from wppsi import MINIMO_NORMA_LOCAL
+            try:
+                from wppsi import obtener_almacen
+                percentiles_locales = {
+                    medida: f"{percentil} (n={n})" for medida, (percentil, n)
+                    in obtener_almacen().percentiles_locales(resultado, st.session_state.evaluacion_id).items()
+                    if n >= MINIMO_NORMA_LOCAL
+                }
+            except Exception:
+                percentiles_locales = {}
+            
             # Métricas de índices
             indices_mostrar = {k: v for k, v in indices.items() if v is not None}
             num_cols = min(len(indices_mostrar), 6)
@@ -1851,10 +1738,12 @@ elif paso == 4:
             
             for idx, (key, valor) in enumerate(list(indices_mostrar.items())[:num_cols]):
                 with cols_metricas[idx]:
-                    cat_info = resultados['categorias'][key]
-                    perc = resultados['percentiles'][key]
+                    cat_info = resultado.categoria(key)
+                    perc = resultado.percentil(key)
                     
                     st.metric(label=key, value=valor, delta=f"Percentil {perc}")
+                    if key in percentiles_locales:
+                        st.caption(f"Percentil local: {percentiles_locales[key]}")
                     
                     # Badge de categoría
                     badge_color = "#27ae60" if "Superior" in cat_info['categoria'] else "#f39c12" if "Medio" in cat_info['categoria'] else "#e74c3c"
@@ -1863,11 +1752,11 @@ elif paso == 4:
             st.markdown("---")
             
             # CIT destacado
-            if resultados.get('cit'):
-                cit = resultados['cit']
-                cat_cit = resultados['categorias']['CIT']
-                perc_cit = resultados['percentiles']['CIT']
-                ic_cit = resultados['intervalos_confianza']['CIT']
+            if resultado.cit:
+                cit = resultado.cit
+                cat_cit = resultado.categoria('CIT')
+                perc_cit = resultado.percentil('CIT')
+                ic_cit = resultado.intervalo('CIT')
                 
                 st.markdown(f"""
                 <div style="background: linear-gradient(135deg, {cat_cit['color']}15 0%, {cat_cit['color']}05 100%); 
@@ -1877,6 +1766,9 @@ elif paso == 4:
                     <p style="color: #2c3e50;"><b>Percentil:</b> {perc_cit} | <b>Intervalo Confianza (90%):</b> {ic_cit[0]} - {ic_cit[1]}</p>
                 </div>
                 """, unsafe_allow_html=True)
+                if 'CIT' in percentiles_locales:
+                    st.caption(f"Percentil local del CIT: {percentiles_locales['CIT']} (entre las demás "
+                               f"evaluaciones guardadas de su misma banda de edad)")
             
             # Tabla resumen
             st.markdown("### 📋 Resumen de Puntuaciones")
@@ -1884,55 +1776,117 @@ elif paso == 4:
                 {
                     "Prueba": BaremosWPPSIUltra.PRUEBAS_INFO[k]['nombre'],
                     "Índice": BaremosWPPSIUltra.PRUEBAS_INFO[k]['indice_primario'],
-                    "PD": resultados['pd'][k],
+                    "PD": pd_val,
                     "PE": v,
-                    "Clasificación": BaremosWPPSIUltra.clasificar_pe(v)
-                } for k, v in resultados['pe'].items()
+                    "Clasificación": BaremosWPPSIUltra.clasificar_pe(v),
+                    "Percentil local": percentiles_locales.get(k)
+                } for k, pd_val, v in zip(resultado.pruebas, resultado.valores_pd, resultado.valores_pe)
             ])
             st.dataframe(df_completo, use_container_width=True, hide_index=True)
+            st.caption(f"Percentil local: posición entre las demás evaluaciones guardadas de la misma banda "
+                       f"de edad; n no incluye esta evaluación (se muestra con al menos {MINIMO_NORMA_LOCAL} casos).")
         
         with tab_graficos:
             st.markdown("### 📊 Visualizaciones")
             # Gráfico de perfil escalar
-            fig_pe = crear_grafico_perfil_escalares_ultra(resultados['pe'])
+            fig_pe = grafico_memorizado('perfil', crear_grafico_perfil_escalares_ultra, pe_dict)
             if fig_pe:
                 st.plotly_chart(fig_pe, use_container_width=True, key="grafico_perfil_escalar_tab2")
             
             col_g1, col_g2 = st.columns(2)
             with col_g1:
-                fig_indices = crear_grafico_indices_compuestos_ultra(resultados['indices_primarios'])
+                fig_indices = grafico_memorizado('indices', crear_grafico_indices_compuestos_ultra, indices)
                 if fig_indices:
                     st.plotly_chart(fig_indices, use_container_width=True, key="grafico_indices_tab2")
             with col_g2:
-                fig_radar = crear_grafico_radar_cognitivo(resultados['indices_primarios'])
+                fig_radar = grafico_memorizado('radar', crear_grafico_radar_cognitivo, indices)
                 if fig_radar:
                     st.plotly_chart(fig_radar, use_container_width=True, key="grafico_radar_tab2")
 
         with tab_comparativo:
              # Gráfico comparativo
-            fig_comp = crear_grafico_comparacion_indices(resultados['indices_primarios'])
+            fig_comp = grafico_memorizado('comparacion', crear_grafico_comparacion_indices, indices)
             if fig_comp:
                 st.plotly_chart(fig_comp, use_container_width=True, key="grafico_comparativo_tab3")
             
             col1, col2 = st.columns(2)
             with col1:
                 st.info("##### Fortalezas (PE ≥ 13)")
-                for f in resultados['fortalezas']:
+                for f in resultado.fortalezas:
                     st.write(f"✅ **{f['prueba']}**: {f['descripcion']}")
             with col2:
                 st.warning("##### Debilidades (PE ≤ 7)")
-                for d in resultados['debilidades']:
+                for d in resultado.debilidades:
                     st.write(f"⚠️ **{d['prueba']}**: {d['descripcion']}")
 
         with tab_clinica:
             st.markdown("### Interpretación Narrativa")
-            if resultados.get('cit'):
-                st.write(f"El evaluado obtuvo un **CIT de {resultados['cit']}**, ubicándose en el rango **{resultados['categorias']['CIT']['categoria']}**.")
+            if resultado.cit:
+                st.write(f"El evaluado obtuvo un **CIT de {resultado.cit}**, ubicándose en el rango **{resultado.categoria('CIT')['categoria']}**.")
             
         with tab_recomendaciones:
-            if resultados.get('recomendaciones'):
-                for r in resultados['recomendaciones']:
+            recomendaciones = resultado.recomendaciones
+            if recomendaciones:
+                for r in recomendaciones:
                     st.write(f"• {r}")
+
+        with tab_evolucion:
+            st.markdown("### 📈 Evolución entre Evaluaciones")
+            analisis = None
+            try:
+                from wppsi import obtener_almacen, analizar_trayectoria
+                analisis = analizar_trayectoria(obtener_almacen().trayectoria(
+                    st.session_state.nombre_paciente, st.session_state.fecha_nacimiento))
+            except Exception as e:
+                st.warning(f"⚠️ No se pudo cargar el historial del paciente: {e}")
+
+            if analisis is None or analisis.n_evaluaciones < 2:
+                st.info("ℹ️ Se necesitan al menos dos evaluaciones guardadas del mismo paciente "
+                        "(mismo nombre y fecha de nacimiento) para analizar la evolución.")
+            else:
+                st.caption(f"{analisis.n_evaluaciones} evaluaciones. ◆ = cambio respecto a la evaluación anterior "
+                           f"mayor que el error de medida (90%).")
+                fig_compuestos = crear_grafico_trayectorias(analisis, compuestos=True)
+                if fig_compuestos:
+                    st.plotly_chart(fig_compuestos, use_container_width=True, key="grafico_evolucion_compuestos")
+                fig_escalares = crear_grafico_trayectorias(analisis, compuestos=False)
+                if fig_escalares:
+                    st.plotly_chart(fig_escalares, use_container_width=True, key="grafico_evolucion_pe")
+
+                tabla = analisis.tabla_cambios()
+                tabla['significativo'] = tabla['significativo'].map({True: '✅ Sí', False: 'No'})
+                st.dataframe(tabla.rename(columns={
+                    'fecha_evaluacion': 'Fecha', 'medida': 'Medida', 'valor': 'Valor',
+                    'cambio': 'Cambio', 'cambio_base': 'Cambio vs. inicial',
+                    'umbral': 'Cambio mínimo fiable', 'significativo': 'Significativo'
+                }), use_container_width=True, hide_index=True)
+
+        with tab_similares:
+            st.markdown("### 👥 Casos Guardados con Perfil Similar")
+            metrica = st.radio("Distancia entre perfiles", ["euclidea", "manhattan"], horizontal=True,
+                               format_func={"euclidea": "Euclídea (penaliza diferencias grandes)",
+                                            "manhattan": "Manhattan (diferencia media)"}.get,
+                               key="similares_metrica")
+            similares = []
+            try:
+                from wppsi import obtener_almacen
+                excluir = (st.session_state.evaluacion_id,) if st.session_state.evaluacion_id else ()
+                similares = obtener_almacen().similares(resultado, k=10, excluir=excluir, metrica=metrica)
+            except Exception as e:
+                st.warning(f"⚠️ No se pudieron buscar casos similares: {e}")
+
+            if not similares:
+                st.info("ℹ️ No hay evaluaciones guardadas que compartan suficientes subpruebas con esta.")
+            else:
+                st.caption("Distancia media por subprueba aplicada en ambos perfiles (en puntos escalares). "
+                           "Las subpruebas no aplicadas en alguno de los dos no cuentan.")
+                for i, caso in enumerate(similares, 1):
+                    mostrar_fila_evaluacion(caso, "similar", detalle=(
+                        f"#{i} · Distancia {caso['distancia']:.2f} · "
+                        f"{caso['pruebas_comunes']} subpruebas en común"))
+                    with st.expander("💡 Recomendaciones de este caso"):
+                        for r in caso['resultado'].recomendaciones:
+                            st.write(f"• {r}")
         
         st.markdown("---")
         col_nav1, col_nav2 = st.columns(2)
@@ -1955,20 +1909,58 @@ elif paso == 5:
             st.session_state.paso_actual = 1
             st.rerun()
     else:
+        with medir_importacion("Gráficos (Plotly)"):
+            import plotly.graph_objects as go
+        with medir_importacion("Informe PDF (ReportLab)"):
+            from reportlab.lib import colors
+            from reportlab.lib.pagesizes import A4
+            from reportlab.platypus import (SimpleDocTemplate, Table, TableStyle, Paragraph,
+                                            Spacer, PageBreak, Image as RLImage)
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib.units import cm
+
         st.markdown("## <span class='step-number'>5</span> Generación de Informe Profesional", unsafe_allow_html=True)
         st.markdown("---")
         st.success("✅ **Evaluación lista para exportar**")
         st.info("Generando informe profesional con diseño tabular rojo/blanco, gráficos incrustados y áreas de oportunidad.")
 
-        # --- FUNCIÓN PARA EXPORTAR GRÁFICOS (REQUIERE KALEIDO) ---
-        def get_chart_image(fig, width=500, height=250):
-            if fig is None: return None
-            try:
-                # Convertir a imagen en memoria
-                img_bytes = fig.to_image(format="png", width=width*2, height=height*2, scale=2)
-                return RLImage(io.BytesIO(img_bytes), width=width, height=height)
-            except Exception as e:
-                return None # Si falla kaleido, devuelve None y no rompe el PDF
+        # --- GRÁFICOS DEL INFORME: VECTORIALES (REPORTLAB) O IMÁGENES DE PLOTLY (KALEIDO) ---
+        formato_graficos = st.radio(
+            "Gráficos del informe", ["vectorial", "imagen"], horizontal=True, key="pdf_graficos",
+            format_func={"vectorial": "Vectoriales (rápido, PDF ligero)",
+                         "imagen": "Imágenes de Plotly (idénticas a la pantalla, requiere kaleido)"}.get
+        )
+        if formato_graficos == "imagen":
+            # Se piden ya para que los renderizadores arranquen mientras se revisa el paso
+            from wppsi import obtener_pool_renderizado
+            obtener_pool_renderizado()
+        
+        # Tamaño de cada gráfico en el PDF (puntos); el PNG es del doble con escala 2
+        TAMANOS_PDF = {'distribucion': (450, 200), 'perfil': (500, 250), 'indices': (450, 220)}
+        
+        def dibujar_graficos_pdf(res) -> Dict:
+            """Gráficos del informe como Drawing de ReportLab, sin rasterizar"""
+            from wppsi import dibujo_distribucion_normal, dibujo_perfil_escalares, dibujo_indices_compuestos
+            return {
+                'distribucion': dibujo_distribucion_normal(res.cit, *TAMANOS_PDF['distribucion']),
+                'perfil': dibujo_perfil_escalares(res.pe, *TAMANOS_PDF['perfil']),
+                'indices': dibujo_indices_compuestos(res.indices_primarios, *TAMANOS_PDF['indices']),
+            }
+        
+        def renderizar_graficos_pdf(figuras: Dict) -> Dict:
+            """Rasteriza todas las figuras del informe a la vez ({nombre: ImagenRenderizada})"""
+            from wppsi import obtener_pool_renderizado
+            return obtener_pool_renderizado().renderizar({
+                nombre: (fig, TAMANOS_PDF[nombre][0] * 2, TAMANOS_PDF[nombre][1] * 2, 2)
+                for nombre, fig in figuras.items()
+            })
+        
+        def get_chart_image(imagenes: Dict, nombre: str):
+            """Imagen de ReportLab de un gráfico ya rasterizado, o None si falló"""
+            imagen = imagenes.get(nombre)
+            if imagen is None or not imagen.ok: return None
+            width, height = TAMANOS_PDF[nombre]
+            return RLImage(io.BytesIO(imagen.png), width=width, height=height)
 
         if st.button("📥 GENERAR Y DESCARGAR INFORME COMPLETO", type="primary", use_container_width=True, key="btn_gen_final"):
             with st.spinner("⏳ Maquetando informe de alta calidad con gráficos..."):
@@ -1994,7 +1986,23 @@ elif paso == 5:
                     estilo_destacado = ParagraphStyle('D', parent=styles['Normal'], fontSize=10, leading=13, spaceAfter=4, fontName='Helvetica-Bold')
 
                     res = st.session_state.analisis_completo
-                    dp = res['datos_personales']
+                    dp = datos_personales_sesion()
+
+                    # Todos los gráficos se preparan antes de maquetar (las imágenes, en paralelo)
+                    inicio_graficos = time.perf_counter()
+                    imagenes = {}
+                    if formato_graficos == "vectorial":
+                        graficos_pdf = dibujar_graficos_pdf(res)
+                    else:
+                        imagenes = renderizar_graficos_pdf({
+                            'distribucion': grafico_memorizado('distribucion', crear_grafico_distribucion_normal,
+                                                               res.cit) if res.cit else None,
+                            'perfil': grafico_memorizado('perfil', crear_grafico_perfil_escalares_ultra, res.pe),
+                            'indices': grafico_memorizado('indices', crear_grafico_indices_compuestos_ultra,
+                                                          res.indices_primarios),
+                        })
+                        graficos_pdf = {nombre: get_chart_image(imagenes, nombre) for nombre in TAMANOS_PDF}
+                    ms_graficos = (time.perf_counter() - inicio_graficos) * 1000
 
                     # --- TÍTULO Y DATOS ---
                     elements.append(Paragraph("INFORME DE EVALUACIÓN WPPSI-IV", estilo_titulo))
@@ -2019,18 +2027,17 @@ elif paso == 5:
                     # --- SECCIÓN 1: CIT Y ANÁLISIS GENERAL (Imagen 1) ---
                     elements.append(Paragraph("ANÁLISIS DEL COEFICIENTE INTELECTUAL TOTAL (CIT)", estilo_seccion))
                     
-                    if res.get('cit'):
-                        cit = res['cit']
-                        cat = res['categorias']['CIT']['categoria']
-                        perc = res['percentiles']['CIT']
-                        ic = res['intervalos_confianza']['CIT']
+                    if res.cit:
+                        cit = res.cit
+                        cat = res.categoria('CIT')['categoria']
+                        perc = res.percentil('CIT')
+                        ic = res.intervalo('CIT')
                         
                         txt_cit = f"""El evaluado ha obtenido un CIT de <b>{cit}</b>. Este resultado lo sitúa en la categoría <b>{cat.upper()}</b> en comparación con su grupo de referencia por edad. Su rendimiento se encuentra en el percentil <b>{perc}</b>, lo que indica que supera al {perc}% de los niños de su misma edad cronológica. (IC 90%: {ic[0]}-{ic[1]})."""
                         elements.append(Paragraph(txt_cit, estilo_normal))
                         
                         # Gráfico Normal
-                        fig_dist = crear_grafico_distribucion_normal(cit)
-                        img_dist = get_chart_image(fig_dist, width=450, height=200)
+                        img_dist = graficos_pdf['distribucion']
                         if img_dist: elements.append(img_dist)
                     
                     elements.append(Spacer(1, 10))
@@ -2039,8 +2046,7 @@ elif paso == 5:
                     elements.append(Paragraph("1. PERFIL DE PUNTUACIONES ESCALARES", estilo_seccion))
                     
                     # Gráfico de Línea
-                    fig_pe = crear_grafico_perfil_escalares_ultra(res['pe'])
-                    img_pe = get_chart_image(fig_pe, width=500, height=250)
+                    img_pe = graficos_pdf['perfil']
                     if img_pe: 
                         elements.append(img_pe)
                         elements.append(Spacer(1, 10))
@@ -2052,9 +2058,8 @@ elif paso == 5:
                     areas_oportunidad = []
                     areas_fortaleza = []
                     
-                    for k, v in res['pe'].items():
+                    for k, pd_val, v in zip(res.pruebas, res.valores_pd, res.valores_pe):
                         nombre = BaremosWPPSIUltra.PRUEBAS_INFO[k]['nombre']
-                        pd_val = res['pd'][k]
                         clasif = BaremosWPPSIUltra.clasificar_pe(v)
                         
                         # Guardar para texto posterior
@@ -2108,8 +2113,7 @@ elif paso == 5:
                     elements.append(Paragraph("2. PERFIL DE ÍNDICES COMPUESTOS", estilo_seccion))
                     
                     # Gráficos de Índices
-                    fig_ind = crear_grafico_indices_compuestos_ultra(res['indices_primarios'])
-                    img_ind = get_chart_image(fig_ind, width=450, height=220)
+                    img_ind = graficos_pdf['indices']
                     if img_ind: elements.append(img_ind)
                     
                     elements.append(Spacer(1, 10))
@@ -2117,23 +2121,22 @@ elif paso == 5:
                     # Tabla Índices (Roja estilo manual)
                     data_indices = [["Índice", "Suma PE", "Puntuación", "Percentil", "Intervalo 90%", "Categoría"]]
                     
-                    for k, v in res['indices_primarios'].items():
-                        if k != 'CIT' and v is not None: # El CIT ya se mostró arriba o se puede incluir
-                            suma = res['sumas_indices'].get(k, '-')
-                            cat = res['categorias'][k]
-                            ic = res['intervalos_confianza'][k]
+                    sumas_indices = res.sumas_indices
+                    for k, v in res.indices:
+                        if v is not None: # El CIT ya se mostró arriba o se puede incluir
+                            suma = sumas_indices.get(k, '-')
+                            cat = res.categoria(k)
+                            ic = res.intervalo(k)
                             data_indices.append([
-                                k, str(suma), str(v), str(res['percentiles'][k]), 
+                                k, str(suma), str(v), str(res.percentil(k)), 
                                 f"{ic[0]}-{ic[1]}", cat['categoria']
                             ])
                     
                     # Añadir CIT al final de la tabla también
-                    if res.get('cit'):
-                        cat = res['categorias']['CIT']
-                        ic = res['intervalos_confianza']['CIT']
-                        # Suma total aproximada
-                        suma_total = sum(res['pe'].values())
-                        data_indices.append(["CIT (Total)", str(suma_total), str(res['cit']), str(res['percentiles']['CIT']), f"{ic[0]}-{ic[1]}", cat['categoria']])
+                    if res.cit:
+                        cat = res.categoria('CIT')
+                        ic = res.intervalo('CIT')
+                        data_indices.append(["CIT (Total)", str(res.suma_total), str(res.cit), str(res.percentil('CIT')), f"{ic[0]}-{ic[1]}", cat['categoria']])
 
                     t_indices = Table(data_indices, colWidths=[3*cm, 2*cm, 2.5*cm, 2.5*cm, 3.5*cm, 3.5*cm])
                     t_indices.setStyle(TableStyle([
@@ -2149,8 +2152,9 @@ elif paso == 5:
 
                     # --- SECCIÓN 4: RECOMENDACIONES ---
                     elements.append(Paragraph("RECOMENDACIONES SUGERIDAS", estilo_seccion))
-                    if res['recomendaciones']:
-                        for rec in res['recomendaciones']:
+                    recomendaciones = res.recomendaciones
+                    if recomendaciones:
+                        for rec in recomendaciones:
                             elements.append(Paragraph(f"• {rec}", estilo_normal))
                     else:
                         elements.append(Paragraph("Se sugiere continuar monitoreando el desarrollo y estimular las áreas de interés del niño.", estilo_normal))
@@ -2162,8 +2166,17 @@ elif paso == 5:
                     st.session_state.buffer_pdf = buffer
                     
                     st.success("✅ Informe PDF generado exitosamente.")
-                    if not img_pe: # Si no se generó imagen, avisar
-                        st.warning("⚠️ Nota: Los gráficos no se pudieron generar en el PDF. Asegúrate de tener instalada la librería 'kaleido'.")
+                    fallidas = [i for i in imagenes.values() if not i.ok]
+                    if fallidas:
+                        st.warning("⚠️ Algunos gráficos no se incluyeron en el PDF (¿está instalada la librería "
+                                   "'kaleido'?):\n\n" + "\n".join(f"- **{i.nombre}**: {i.error}" for i in fallidas))
+                    if imagenes:
+                        st.caption("⏱️ Gráficos: " + " | ".join(f"{i.nombre} {i.milisegundos:.0f} ms"
+                                                                + (" (caché)" if i.desde_cache else "")
+                                                                for i in imagenes.values())
+                                   + f" | lote en paralelo {ms_graficos:.0f} ms")
+                    else:
+                        st.caption(f"⏱️ Gráficos vectoriales: {ms_graficos:.0f} ms")
                     
                     st.balloons()
                     
@@ -2179,6 +2192,204 @@ elif paso == 5:
                 except Exception as e:
                     st.error(f"❌ Error al generar el PDF: {e}")
                     st.error("Detalle del error (para soporte): " + str(e))
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# HISTORIAL DE EVALUACIONES: EXPLORAR Y BUSCAR
+# ═══════════════════════════════════════════════════════════════════════════════
+
+elif paso == 6:
+    st.markdown("## 🗂️ Historial de Evaluaciones", unsafe_allow_html=True)
+    st.markdown("---")
+
+    tab_explorar, tab_buscar, tab_cohorte = st.tabs(["📋 Explorar", "🔎 Buscar en el texto clínico",
+                                                     "📊 Panel de Cohorte"])
+
+    with tab_explorar:
+        FILAS_POR_PAGINA = 25
+        ORDENES = {
+            'fecha_evaluacion': "Fecha de evaluación (recientes primero)",
+            'nombre': "Nombre (A-Z)",
+            'cit': "CIT (mayor primero)"
+        }
+        BANDAS_CIT = {
+            "Todas": (None, None),
+            "Muy Superior (≥130)": (130, None),
+            "Superior (120-129)": (120, 129),
+            "Medio Alto (110-119)": (110, 119),
+            "Medio (90-109)": (90, 109),
+            "Medio Bajo (80-89)": (80, 89),
+            "Límite (70-79)": (70, 79),
+            "Muy Bajo (<70)": (1, 69)
+        }
+
+        try:
+            from wppsi import obtener_almacen
+            almacen = obtener_almacen()
+            examinadores = almacen.valores_distintos('examinador')
+            lugares = almacen.valores_distintos('lugar')
+        except Exception as e:
+            almacen = None
+            st.error(f"❌ Historial no disponible: {e}")
+
+        if almacen is not None:
+            col_f1, col_f2, col_f3 = st.columns(3)
+            with col_f1:
+                examinador = st.selectbox("Examinador", ["Todos"] + examinadores, key="hist_examinador")
+                orden = st.selectbox("Ordenar por", list(ORDENES), format_func=ORDENES.get, key="hist_orden")
+            with col_f2:
+                lugar = st.selectbox("Lugar de aplicación", ["Todos"] + lugares, key="hist_lugar")
+                banda = st.selectbox("Rango de CIT", list(BANDAS_CIT), key="hist_banda")
+            with col_f3:
+                desde = st.date_input("Evaluadas desde", value=None, format="DD/MM/YYYY", key="hist_desde")
+                hasta = st.date_input("Evaluadas hasta", value=None, format="DD/MM/YYYY", key="hist_hasta")
+
+            filtros = {
+                'examinador': None if examinador == "Todos" else examinador,
+                'lugar': None if lugar == "Todos" else lugar,
+                'desde': desde,
+                'hasta': hasta,
+                'cit_min': BANDAS_CIT[banda][0],
+                'cit_max': BANDAS_CIT[banda][1]
+            }
+
+            # La página se consulta solo cuando cambian los filtros, el orden o la página
+            consulta = (orden, tuple(filtros.items()))
+            cargada = st.session_state.historial_consulta
+            if cargada is None or cargada[0] != consulta:
+                st.session_state.historial_cursores = []
+            cursores = st.session_state.historial_cursores
+            if cargada != (consulta, tuple(cursores)):
+                filas, siguiente = almacen.pagina(orden, cursores[-1] if cursores else None,
+                                                  FILAS_POR_PAGINA, **filtros)
+                if cargada is None or cargada[0] != consulta:
+                    st.session_state.historial_total = almacen.contar(**filtros)
+                st.session_state.historial_filas = filas
+                st.session_state.historial_siguiente = siguiente
+                st.session_state.historial_consulta = (consulta, tuple(cursores))
+
+            total = st.session_state.historial_total
+            paginas = max(1, -(-total // FILAS_POR_PAGINA))
+            col_total, col_actualizar = st.columns([5, 1])
+            with col_total:
+                st.caption(f"{total} evaluaciones · página {len(cursores) + 1} de {paginas}")
+            with col_actualizar:
+                if st.button("🔄 Actualizar", key="btn_historial_actualizar", use_container_width=True):
+                    st.session_state.historial_consulta = None
+                    st.rerun()
+
+            for ev in st.session_state.historial_filas:
+                mostrar_fila_evaluacion(ev, "historial")
+            if not st.session_state.historial_filas:
+                st.info("ℹ️ No hay evaluaciones guardadas con estos filtros.")
+
+            if paginas > 1:
+                col_ant, col_sig = st.columns(2)
+                with col_ant:
+                    if st.button("⬅️ Anteriores", key="btn_historial_anterior", use_container_width=True,
+                                 disabled=not cursores):
+                        cursores.pop()
+                        st.rerun()
+                with col_sig:
+                    if st.button("Siguientes ➡️", key="btn_historial_siguiente", use_container_width=True,
+                                 disabled=st.session_state.historial_siguiente is None):
+                        cursores.append(st.session_state.historial_siguiente)
+                        st.rerun()
+
+    with tab_buscar:
+        st.text_input(
+            "Motivo de consulta, observaciones, antecedentes y observaciones conductuales",
+            key="busqueda_texto",
+            placeholder='Ej: prematuro, "retraso del lenguaje", dislex',
+            on_change=lambda: st.session_state.update(busqueda_pagina=0),
+            help="Cada palabra encuentra también sus continuaciones (dislex → dislexia). "
+                 "Use comillas para buscar una frase exacta."
+        )
+
+        RESULTADOS_POR_PAGINA = 20
+        if st.session_state.busqueda_texto.strip():
+            try:
+                from wppsi import obtener_almacen
+                inicio = time.perf_counter()
+                resultados, total = obtener_almacen().buscar(
+                    st.session_state.busqueda_texto,
+                    limite=RESULTADOS_POR_PAGINA,
+                    desplazamiento=st.session_state.busqueda_pagina * RESULTADOS_POR_PAGINA
+                )
+                duracion_ms = (time.perf_counter() - inicio) * 1000
+            except Exception as e:
+                resultados, total = [], 0
+                st.error(f"❌ No se pudo realizar la búsqueda: {e}")
+
+            paginas = max(1, -(-total // RESULTADOS_POR_PAGINA))
+            if total:
+                st.caption(f"{total} evaluaciones encontradas · página {st.session_state.busqueda_pagina + 1} "
+                           f"de {paginas} · {duracion_ms:.0f} ms")
+            else:
+                st.info("ℹ️ Ninguna evaluación contiene esos términos.")
+
+            for ev in resultados:
+                mostrar_fila_evaluacion(ev, "busqueda", detalle=ev['fragmento'])
+
+            if paginas > 1:
+                col_ant, col_sig = st.columns(2)
+                with col_ant:
+                    if st.button("⬅️ Anteriores", key="btn_busqueda_anterior", use_container_width=True,
+                                 disabled=st.session_state.busqueda_pagina == 0):
+                        st.session_state.busqueda_pagina -= 1
+                        st.rerun()
+                with col_sig:
+                    if st.button("Siguientes ➡️", key="btn_busqueda_siguiente", use_container_width=True,
+                                 disabled=st.session_state.busqueda_pagina >= paginas - 1):
+                        st.session_state.busqueda_pagina += 1
+                        st.rerun()
+
+    with tab_cohorte:
+        with medir_importacion("pandas"):
+            import pandas as pd_lib
+        with medir_importacion("Gráficos (Plotly)"):
+            import plotly.graph_objects as go
+        try:
+            from wppsi import obtener_almacen
+            resumen = obtener_almacen().resumen_cohorte()
+        except Exception as e:
+            resumen = None
+            st.error(f"❌ Panel no disponible: {e}")
+
+        if resumen is not None and not resumen['total']['n']:
+            st.info("ℹ️ Aún no hay evaluaciones guardadas.")
+        elif resumen is not None:
+            total = resumen['total']
+            limite = BaremosWPPSIUltra.obtener_categoria_descriptiva(70)[0]
+            col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+            col_m1.metric("Evaluaciones", total['n'])
+            col_m2.metric("Con CIT", total['con_cit'])
+            col_m3.metric("CIT medio", f"{total['media_cit']:.1f}" if total['media_cit'] is not None else "-",
+                          delta=f"DE {total['de_cit']:.1f}" if total['de_cit'] is not None else None,
+                          delta_color="off")
+            col_m4.metric(f"Casos {limite}",
+                          f"{100 * total['categorias'][limite] / total['con_cit']:.1f}%" if total['con_cit'] else "-")
+
+            fig_categorias = crear_grafico_cohorte_categorias(resumen)
+            if fig_categorias:
+                st.plotly_chart(fig_categorias, use_container_width=True, key="grafico_cohorte_categorias")
+
+            st.markdown("### 🏫 Resumen por Lugar de Aplicación")
+            st.dataframe(pd_lib.DataFrame([
+                {
+                    "Lugar": lugar or "Sin lugar",
+                    "Evaluaciones": datos['n'],
+                    "Con CIT": datos['con_cit'],
+                    "CIT medio": round(datos['media_cit'], 1) if datos['media_cit'] is not None else None,
+                    "DE": round(datos['de_cit'], 1) if datos['de_cit'] is not None else None,
+                    f"% {limite}": round(100 * datos['categorias'][limite] / datos['con_cit'], 1)
+                    if datos['con_cit'] else None
+                } for lugar, datos in resumen['por_lugar'].items()
+            ]), use_container_width=True, hide_index=True)
+
+            fig_pe = crear_grafico_cohorte_pe(resumen)
+            if fig_pe:
+                st.plotly_chart(fig_pe, use_container_width=True, key="grafico_cohorte_pe")
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # FOOTER ULTRA PROFESIONAL
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -2236,6 +2447,11 @@ with st.sidebar:
         - ReportLab
         - SciPy
         """)
+
+        if REPORTE_IMPORTACION:
+            st.markdown("**⏱️ Tiempos de importación (proceso):**")
+            for etiqueta, ms in registro_importaciones().items():
+                st.caption(f"{etiqueta}: {ms:.1f} ms")
     
     with st.expander("📖 Guía de Uso Rápida"):
         st.markdown("""
@@ -2245,12 +2461,16 @@ with st.sidebar:
         4. **Paso 4**: Revise resultados y análisis
         5. **Paso 5**: Genere informe PDF
         
-        💡 **Tip**: Guarde la sesión para continuar después
+        🗂️ **Historial**: Busque evaluaciones anteriores por el texto clínico
+        
+        💡 **Tip**: Guarde la sesión (💾 en la barra lateral) para continuar después
         """)
 
 # Estado del sistema en sidebar
 if st.session_state.datos_completos:
     st.sidebar.success("✅ Sistema listo - Evaluación completa")
-else:
+elif st.session_state.paso_actual <= 5:
     st.sidebar.info(f"ℹ️ En proceso - Paso {st.session_state.paso_actual}/5")
 
+# Anexar al diario los campos modificados en este rerun (no bloquea: fsync por lotes)
+registrar_en_diario()
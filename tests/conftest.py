@@ -0,0 +1,32 @@
+"""Fixtures compartidas: almacén en un directorio temporal y evaluaciones de ejemplo"""
+
+import random
+from datetime import date
+
+import pytest
+
+from wppsi import AlmacenEvaluaciones, BaremosWPPSIUltra, procesar_evaluacion_completa
+
+PRUEBAS_PRINCIPALES = ('cubos', 'informacion', 'matrices', 'busqueda_animales', 'reconocimiento',
+                       'semejanzas', 'conceptos', 'localizacion', 'cancelacion', 'rompecabezas')
+
+
+def datos_evaluacion(nombre: str = 'Ana Perez', nacimiento: date = date(2020, 3, 14),
+                     evaluacion: date = date(2025, 6, 2), semilla: int = 0, **datos):
+    """Argumentos de AlmacenEvaluaciones.guardar para una evaluación con PD aleatorias reproducibles"""
+    azar = random.Random(semilla)
+    pruebas_aplicadas = {prueba: prueba in PRUEBAS_PRINCIPALES for prueba in BaremosWPPSIUltra.PRUEBAS_INFO}
+    pd_dict = {prueba: azar.randint(*BaremosWPPSIUltra.PRUEBAS_INFO[prueba]['rango_pd'])
+               for prueba in PRUEBAS_PRINCIPALES}
+    datos_personales = {'nombre': nombre, 'fecha_nacimiento': str(nacimiento),
+                        'fecha_evaluacion': str(evaluacion), 'examinador': 'Daniela', 'lugar': 'Consultorio',
+                        **datos}
+    resultado = procesar_evaluacion_completa(datos_personales, pruebas_aplicadas, pd_dict)
+    return datos_personales, pruebas_aplicadas, pd_dict, resultado
+
+
+@pytest.fixture
+def almacen(tmp_path):
+    almacen = AlmacenEvaluaciones(tmp_path / 'evaluaciones.db')
+    yield almacen
+    almacen.cerrar()
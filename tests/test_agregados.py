@@ -0,0 +1,103 @@
+"""Agregados y normas locales mantenidos por triggers frente a una reconstrucción completa"""
+
+import random
+from datetime import date, timedelta
+
+from wppsi.almacen import MESES_POR_BANDA_COHORTE
+
+from .conftest import datos_evaluacion
+
+TABLAS_AGREGADOS = {
+    'cohorte_cit': 'SELECT lugar, categoria, n, suma, suma_cuadrados FROM cohorte_cit WHERE n > 0',
+    'cohorte_pe': 'SELECT prueba, banda_edad, n, suma, suma_cuadrados FROM cohorte_pe WHERE n > 0',
+    'normas_locales': 'SELECT medida, banda_edad, valor, n FROM normas_locales WHERE n > 0',
+}
+
+
+def agregados(almacen):
+    with almacen.pool.conexion() as con:
+        return {tabla: sorted(tuple(f) for f in con.execute(consulta))
+                for tabla, consulta in TABLAS_AGREGADOS.items()}
+
+
+def poblar_al_azar(almacen, operaciones: int = 120, semilla: int = 7):
+    """Altas, reprocesados (cambiando edad, lugar y PD) y bajas mezclados"""
+    azar = random.Random(semilla)
+    pacientes = {}   # id -> (nombre, nacimiento)
+    for paso in range(operaciones):
+        accion = azar.random()
+        if pacientes and accion < 0.2:
+            evaluacion_id = azar.choice(list(pacientes))
+            assert almacen.eliminar(evaluacion_id)
+            del pacientes[evaluacion_id]
+            continue
+
+        if pacientes and accion < 0.5:
+            evaluacion_id = azar.choice(list(pacientes))
+            nombre, nacimiento = pacientes[evaluacion_id]
+        else:
+            evaluacion_id = None
+            nombre = f'Paciente {paso}'
+            nacimiento = date(2019, 1, 1) + timedelta(days=azar.randrange(900))
+        evaluacion = nacimiento + timedelta(days=azar.randrange(4 * 365, 7 * 365 + 200))
+        datos = datos_evaluacion(nombre, nacimiento, evaluacion, semilla=paso,
+                                 lugar=azar.choice(['Consultorio', 'Escuela', '']))
+        if azar.random() < 0.1:
+            datos[0]['fecha_evaluacion'] = None   # Sin edad: banda -1
+        pacientes[almacen.guardar(*datos, evaluacion_id=evaluacion_id)] = (nombre, nacimiento)
+    return pacientes
+
+
+def test_cohorte_incremental_igual_a_reconstruida(almacen):
+    pacientes = poblar_al_azar(almacen)
+    incremental = agregados(almacen)
+    almacen.reconstruir_cohorte()
+    assert agregados(almacen) == incremental
+    assert almacen.resumen_cohorte()['total']['n'] == len(pacientes)
+
+
+def test_borrar_todo_deja_los_agregados_vacios(almacen):
+    for evaluacion_id in poblar_al_azar(almacen, operaciones=30):
+        almacen.eliminar(evaluacion_id)
+    assert agregados(almacen) == {tabla: [] for tabla in TABLAS_AGREGADOS}
+
+
+def percentil_ingenuo(almacen, propia, evaluacion_id: int):
+    """Percentiles de rango medio recorriendo las demás evaluaciones de la misma banda"""
+    banda = propia.edad_meses // MESES_POR_BANDA_COHORTE
+    otras = [almacen.obtener(ev['id'])['resultado'] for ev in almacen.listar(limite=1000)
+             if ev['id'] != evaluacion_id]
+    otras = [r for r in otras if r.edad_meses is not None and r.edad_meses // MESES_POR_BANDA_COHORTE == banda]
+    esperados = {}
+    for medida, valor in (*propia.pe.items(), *propia.compuestos()):
+        valores = [dict((*r.pe.items(), *r.compuestos())).get(medida) for r in otras]
+        valores = [v for v in valores if v is not None]
+        if valores:
+            debajo = sum(v < valor for v in valores) + sum(v == valor for v in valores) / 2
+            esperados[medida] = (round(100 * debajo / len(valores), 1), len(valores))
+    return esperados
+
+
+def test_percentiles_locales_excluyen_la_propia_evaluacion(almacen):
+    pacientes = poblar_al_azar(almacen, operaciones=80)
+    comprobadas = 0
+    for evaluacion_id in sorted(pacientes)[:15]:
+        resultado = almacen.obtener(evaluacion_id)['resultado']
+        if resultado.edad_meses is None:
+            continue
+        esperados = percentil_ingenuo(almacen, resultado, evaluacion_id)
+        assert almacen.percentiles_locales(resultado, evaluacion_id) == esperados
+        comprobadas += bool(esperados)
+    assert comprobadas
+
+
+def test_unica_evaluacion_de_la_banda_no_tiene_percentil_local(almacen):
+    datos = datos_evaluacion()
+    evaluacion_id = almacen.guardar(*datos)
+    resultado = datos[3]
+    assert almacen.percentiles_locales(resultado, evaluacion_id) == {}
+    # Sin id (resultado aún sin guardar) se compara con todo lo guardado
+    assert set(almacen.percentiles_locales(resultado).values()) == {(50.0, 1)}
+
+    otra = datos_evaluacion('Bruno Gomez', semilla=5)
+    assert all(n == 1 for _, n in almacen.percentiles_locales(otra[3], almacen.guardar(*otra)).values())
@@ -0,0 +1,119 @@
+"""Almacén SQLite: guardar, reemplazar, borrar y migraciones"""
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+from wppsi import almacen as modulo_almacen
+from wppsi import AlmacenEvaluaciones
+
+from .conftest import datos_evaluacion
+
+
+def filas(almacen, consulta, *parametros):
+    with almacen.pool.conexion() as con:
+        return [tuple(f) for f in con.execute(consulta, parametros)]
+
+
+def test_guardar_y_obtener(almacen):
+    datos, aplicadas, pd_dict, resultado = datos_evaluacion(motivo_consulta='Dificultades de atención')
+    evaluacion_id = almacen.guardar(datos, aplicadas, pd_dict, resultado, {'atencion': 'Dispersa'})
+
+    guardada = almacen.obtener(evaluacion_id)
+    assert guardada['datos_personales']['nombre'] == 'Ana Perez'
+    assert guardada['datos_personales']['motivo_consulta'] == 'Dificultades de atención'
+    assert guardada['pruebas_aplicadas'] == aplicadas
+    assert guardada['pd_dict'] == pd_dict
+    assert guardada['observaciones_conductuales'] == {'atencion': 'Dispersa'}
+    assert guardada['resultado'] == resultado
+    assert almacen.obtener(evaluacion_id + 1) is None
+
+
+def test_reprocesar_el_mismo_paciente_reemplaza_la_evaluacion(almacen):
+    datos, aplicadas, pd_dict, resultado = datos_evaluacion(semilla=1)
+    evaluacion_id = almacen.guardar(datos, aplicadas, pd_dict, resultado)
+
+    datos, aplicadas, pd_dict, resultado = datos_evaluacion(nombre='ana perez', semilla=2)
+    assert almacen.guardar(datos, aplicadas, pd_dict, resultado, evaluacion_id=evaluacion_id) == evaluacion_id
+
+    assert filas(almacen, 'SELECT id FROM evaluaciones') == [(evaluacion_id,)]
+    assert almacen.obtener(evaluacion_id)['pd_dict'] == pd_dict
+    assert filas(almacen, 'SELECT count(*) FROM puntuaciones') == [(len(aplicadas),)]
+
+
+def test_otro_paciente_en_la_misma_sesion_no_reemplaza_al_anterior(almacen):
+    # La sesión conserva el id de la primera evaluación al procesar un segundo paciente
+    evaluacion_id = almacen.guardar(*datos_evaluacion('Ana Perez', semilla=1))
+    otro_id = almacen.guardar(*datos_evaluacion('Bruno Gomez', semilla=2), evaluacion_id=evaluacion_id)
+    mismo_nombre_id = almacen.guardar(*datos_evaluacion('Bruno Gomez', date(2021, 1, 1), semilla=3),
+                                      evaluacion_id=otro_id)
+
+    assert len({evaluacion_id, otro_id, mismo_nombre_id}) == 3
+    assert filas(almacen, 'SELECT id, nombre, fecha_nacimiento FROM evaluaciones ORDER BY id') == [
+        (evaluacion_id, 'Ana Perez', '2020-03-14'),
+        (otro_id, 'Bruno Gomez', '2020-03-14'),
+        (mismo_nombre_id, 'Bruno Gomez', '2021-01-01'),
+    ]
+
+
+def test_id_inexistente_crea_una_evaluacion(almacen):
+    evaluacion_id = almacen.guardar(*datos_evaluacion(), evaluacion_id=999)
+    assert filas(almacen, 'SELECT id FROM evaluaciones') == [(evaluacion_id,)]
+
+
+def test_eliminar_borra_puntuaciones_e_indices(almacen):
+    evaluacion_id = almacen.guardar(*datos_evaluacion(semilla=1, motivo_consulta='lenguaje'))
+    conservada = almacen.guardar(*datos_evaluacion('Bruno Gomez', semilla=2, motivo_consulta='lenguaje'))
+
+    assert almacen.eliminar(evaluacion_id)
+    assert not almacen.eliminar(evaluacion_id)
+    assert almacen.obtener(evaluacion_id) is None
+    for tabla in ('puntuaciones', 'indices'):
+        assert filas(almacen, f'SELECT DISTINCT evaluacion_id FROM {tabla}') == [(conservada,)]
+    assert [f['id'] for f in almacen.buscar('lenguaje')[0]] == [conservada]
+
+
+def test_migraciones_desde_la_primera_version(tmp_path, monkeypatch):
+    ruta = tmp_path / 'evaluaciones.db'
+    monkeypatch.setattr(modulo_almacen, 'MIGRACIONES', modulo_almacen.MIGRACIONES[:1])
+    antiguo = AlmacenEvaluaciones(ruta)
+    ids = [antiguo.guardar(*datos_evaluacion(f'Paciente {i}', semilla=i, motivo_consulta=f'motivo{i}'))
+           for i in range(5)]
+    antiguo.cerrar()
+    monkeypatch.undo()
+
+    actual = AlmacenEvaluaciones(ruta)
+    try:
+        assert filas(actual, 'PRAGMA user_version') == [(len(modulo_almacen.MIGRACIONES),)]
+        assert [ev['id'] for ev in actual.listar(limite=10)] == sorted(ids, reverse=True)
+        assert [f['id'] for f in actual.buscar('motivo3')[0]] == [ids[3]]
+        assert actual.resumen_cohorte()['total']['n'] == 5
+        assert sum(n for (n,) in filas(actual, "SELECT n FROM normas_locales WHERE medida = 'cubos'")) == 5
+    finally:
+        actual.cerrar()
+
+
+def test_reabrir_no_vuelve_a_migrar(tmp_path):
+    ruta = tmp_path / 'evaluaciones.db'
+    primero = AlmacenEvaluaciones(ruta)
+    evaluacion_id = primero.guardar(*datos_evaluacion())
+    primero.cerrar()
+
+    segundo = AlmacenEvaluaciones(ruta)
+    try:
+        assert segundo.obtener(evaluacion_id) is not None
+        assert filas(segundo, 'PRAGMA user_version') == [(len(modulo_almacen.MIGRACIONES),)]
+    finally:
+        segundo.cerrar()
+
+
+def test_transaccion_fallida_no_deja_cambios(almacen):
+    with pytest.raises(sqlite3.IntegrityError):
+        with almacen.pool.transaccion() as con:
+            con.execute("INSERT INTO evaluaciones (nombre, resultado) VALUES ('X', '[]')")
+            for orden in range(2):  # Prueba repetida: viola la clave primaria
+                con.execute('INSERT INTO puntuaciones (evaluacion_id, prueba, orden, aplicada) '
+                            "VALUES (last_insert_rowid(), 'cubos', ?, 1)", (orden,))
+    assert filas(almacen, 'SELECT count(*) FROM evaluaciones') == [(0,)]
+    assert almacen.resumen_cohorte()['total']['n'] == 0
@@ -0,0 +1,88 @@
+"""Tablas densas del motor de baremos frente a la conversión original sobre los diccionarios"""
+
+import numpy as np
+
+from wppsi.baremos import BaremosWPPSIUltra, INDICES_PRIMARIOS, MOTOR_BAREMOS, MOTOR_INDICES
+
+TABLAS_PE = BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE
+PD_PROBADAS = range(-3, MOTOR_BAREMOS.pd_maxima + 6)
+
+
+def pe_original(prueba: str, pd: int) -> int:
+    """Conversión PD -> PE tal como se hacía sobre TABLAS_CONVERSION_PD_PE"""
+    tabla = TABLAS_PE[prueba]
+    if pd not in tabla:
+        return 1 if pd <= 0 else max(tabla.values())
+    return tabla[pd]
+
+
+def test_conversion_de_una_pd_en_todo_el_rango():
+    for prueba in TABLAS_PE:
+        for pd in PD_PROBADAS:
+            assert MOTOR_BAREMOS.convertir_valor(prueba, pd) == pe_original(prueba, pd), (prueba, pd)
+            assert BaremosWPPSIUltra.convertir_pd_a_pe(prueba, pd) == pe_original(prueba, pd), (prueba, pd)
+
+
+def test_conversion_por_prueba_y_por_matriz():
+    pds = np.array(PD_PROBADAS)
+    esperada = np.array([[pe_original(prueba, pd) for prueba in TABLAS_PE] for pd in pds])
+    for j, prueba in enumerate(TABLAS_PE):
+        assert MOTOR_BAREMOS.convertir(prueba, pds).tolist() == esperada[:, j].tolist()
+
+    matriz = np.repeat(pds[:, None], len(TABLAS_PE), axis=1).astype(np.float64)
+    matriz[::4, ::3] = np.nan   # No aplicadas: PE 0
+    esperada[::4, ::3] = 0
+    assert MOTOR_BAREMOS.convertir_matriz(matriz).tolist() == esperada.tolist()
+
+    invertidas = list(reversed(TABLAS_PE))
+    assert MOTOR_BAREMOS.convertir_matriz(matriz[:, ::-1], invertidas).tolist() == esperada[:, ::-1].tolist()
+
+
+def test_pd_vacia_o_prueba_desconocida():
+    assert BaremosWPPSIUltra.convertir_pd_a_pe('cubos', None) is None
+    assert BaremosWPPSIUltra.convertir_pd_a_pe('cubos', '') is None
+    assert BaremosWPPSIUltra.convertir_pd_a_pe('cubos', '7') == pe_original('cubos', 7)
+    assert BaremosWPPSIUltra.convertir_pd_a_pe('inventada', 0) == 1
+    assert BaremosWPPSIUltra.convertir_pd_a_pe('inventada', 5) == 19
+
+
+TABLAS_SUMA = {
+    **BaremosWPPSIUltra.TABLA_SUMA_PE_A_INDICE,
+    'CIT': BaremosWPPSIUltra.TABLA_CIT,
+    **{nombre: config['tabla_conversion'] for nombre, config in BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG.items()},
+}
+
+
+def compuesto_original(tabla: dict, suma: int) -> int:
+    """Primera clave >= suma recorriendo las claves ordenadas; por encima, la última"""
+    claves = sorted(tabla)
+    for clave in claves:
+        if suma <= clave:
+            return tabla[clave]
+    return tabla[claves[-1]]
+
+
+def test_tablas_de_sumas_cubren_todos_los_compuestos():
+    assert set(MOTOR_INDICES.tablas) == set(TABLAS_SUMA)
+    assert set(INDICES_PRIMARIOS) <= set(TABLAS_SUMA)
+
+
+def test_conversion_de_sumas_en_todo_el_rango():
+    for nombre, tabla in TABLAS_SUMA.items():
+        sumas = range(-2, max(tabla) + 20)
+        esperados = [compuesto_original(tabla, suma) for suma in sumas]
+        assert [MOTOR_INDICES.convertir(nombre, suma) for suma in sumas] == esperados, nombre
+        assert MOTOR_INDICES.convertir_lote(nombre, np.array(sumas)).tolist() == esperados, nombre
+
+
+def test_indice_compuesto_y_cit_como_antes():
+    for nombre in INDICES_PRIMARIOS:
+        tabla = TABLAS_SUMA[nombre]
+        for suma in range(-2, max(tabla) + 20):
+            esperado = compuesto_original(tabla, suma) if suma > 0 else None
+            assert BaremosWPPSIUltra.calcular_indice_compuesto(suma, nombre) == esperado, (nombre, suma)
+    for suma in range(-2, max(TABLAS_SUMA['CIT']) + 20):
+        esperado = compuesto_original(TABLAS_SUMA['CIT'], suma) if suma > 0 else None
+        assert BaremosWPPSIUltra.calcular_cit_total(suma) == esperado, suma
+    assert BaremosWPPSIUltra.calcular_indice_compuesto(None, 'ICV') is None
+    assert BaremosWPPSIUltra.calcular_indice_compuesto(30, 'INVENTADO') == 100
@@ -0,0 +1,85 @@
+"""CacheLRU: desalojo por número de entradas y por tamaño; huella del código para claves de caché"""
+
+import functools
+
+from wppsi.cache import CacheLRU, huella_codigo
+
+
+def test_desaloja_la_menos_usada():
+    cache = CacheLRU(max_entradas=2)
+    cache.guardar('a', 1)
+    cache.guardar('b', 2)
+    assert cache.obtener('a') == (True, 1)
+    cache.guardar('c', 3)
+
+    assert cache.obtener('b') == (False, None)
+    assert cache.obtener('a') == (True, 1) and cache.obtener('c') == (True, 3)
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['entradas'], estadisticas['desalojos']) == (2, 1)
+    assert (estadisticas['aciertos'], estadisticas['fallos']) == (3, 1)
+
+
+def test_tope_de_tamano():
+    cache = CacheLRU(max_entradas=100, max_tamano=10)
+    for clave in 'abc':
+        cache.guardar(clave, 'x' * 4)
+    assert cache.tamano == 8 and cache.obtener('a') == (False, None)
+
+    cache.guardar('b', 'x' * 2)   # Reemplazar ajusta el tamaño en vez de sumarlo
+    assert cache.tamano == 6 and cache.estadisticas()['entradas'] == 2
+
+
+def test_valor_mayor_que_el_tope_se_conserva_solo():
+    cache = CacheLRU(max_entradas=100, max_tamano=10)
+    cache.guardar('a', 'x' * 3)
+    cache.guardar('grande', 'x' * 50)
+    assert cache.obtener('grande')[0] and not cache.obtener('a')[0]
+    assert cache.tamano == 50
+
+
+def test_configurar_reduce_y_desaloja():
+    cache = CacheLRU(max_entradas=10, max_tamano=100)
+    for i in range(10):
+        cache.guardar(i, 'x' * 10)
+    cache.configurar(5, max_tamano=30)
+    assert cache.estadisticas()['entradas'] == 3
+    assert [i for i in range(10) if cache.obtener(i)[0]] == [7, 8, 9]
+
+
+CONSTRUCTOR = """
+@cacheada
+def _plantilla():
+    return {'titulo': 'PERFIL', 'color': '#8B1538'}
+
+def constructor(datos):
+    figura = dict(_plantilla())
+    figura['y'] = [valor * 2 for valor in datos]
+    figura['alto'] = 550
+    return figura
+"""
+
+
+def cargar(fuente: str):
+    """El constructor tras (re)ejecutar el módulo, como en una recarga en caliente de Streamlit"""
+    def cacheada(funcion):
+        return functools.wraps(funcion)(lambda: funcion())
+    modulo = {'cacheada': cacheada}
+    exec(fuente, modulo)
+    return modulo['constructor']
+
+
+def test_huella_estable_al_recargar_el_mismo_codigo():
+    assert huella_codigo(cargar(CONSTRUCTOR)) == huella_codigo(cargar(CONSTRUCTOR))
+
+
+def test_huella_cambia_con_los_literales():
+    editado = cargar(CONSTRUCTOR.replace('550', '600'))
+    assert editado.__code__.co_code == cargar(CONSTRUCTOR).__code__.co_code   # Lo que veía la clave anterior
+    assert huella_codigo(editado) != huella_codigo(cargar(CONSTRUCTOR))
+    assert huella_codigo(cargar(CONSTRUCTOR.replace('* 2', '* 3'))) != huella_codigo(cargar(CONSTRUCTOR))
+
+
+def test_huella_cambia_con_las_funciones_que_usa():
+    # También a través de un decorador que conserva __wrapped__ (st.cache_resource)
+    for original, editado in (("'PERFIL'", "'PERFIL ESCALAR'"), ("'#8B1538'", "'#3498db'")):
+        assert huella_codigo(cargar(CONSTRUCTOR.replace(original, editado))) != huella_codigo(cargar(CONSTRUCTOR))
@@ -0,0 +1,103 @@
+"""Caché de imágenes en disco: claves, desalojo LRU, escritura atómica y uso desde el pool"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from wppsi import rasterizado
+from wppsi.cache_imagenes import CacheImagenesDisco
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CacheImagenesDisco(tmp_path / 'imagenes', max_bytes=10_000)
+
+
+def test_clave_depende_de_figura_y_tamano():
+    figura = {'data': [{'y': [1, 2]}], 'layout': {}}
+    clave = CacheImagenesDisco.clave(figura, 500, 250, 2)
+    assert clave == CacheImagenesDisco.clave({'layout': {}, 'data': [{'y': [1, 2]}]}, 500, 250, 2)
+    assert clave != CacheImagenesDisco.clave(figura, 500, 251, 2)
+    assert clave != CacheImagenesDisco.clave(figura, 500, 250, 1)
+    assert clave != CacheImagenesDisco.clave({'data': [{'y': [1, 3]}], 'layout': {}}, 500, 250, 2)
+
+
+def test_aciertos_y_fallos(cache):
+    clave = cache.clave({'data': []}, 10, 10, 1)
+    assert cache.obtener(clave) is None
+    cache.guardar(clave, b'PNG')
+    assert cache.obtener(clave) == b'PNG'
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['aciertos'], estadisticas['fallos'], estadisticas['escrituras']) == (1, 1, 1)
+    assert not list(cache.directorio.rglob('*.tmp'))
+
+
+def test_desalojo_conserva_las_usadas_recientemente(cache):
+    usada = cache.clave({'usada': True}, 1, 1, 1)
+    cache.guardar(usada, b'u' * 1000)
+    for i in range(20):
+        time.sleep(0.002)   # mtimes distintos
+        cache.guardar(cache.clave({'i': i}, 1, 1, 1), b'x' * 1000)
+        assert cache.obtener(usada) is not None
+
+    estadisticas = cache.estadisticas()
+    assert estadisticas['desalojos'] > 0
+    assert estadisticas['tamano'] <= cache.max_bytes
+    assert sum(f.stat().st_size for f in cache.directorio.rglob('*.png')) == estadisticas['tamano']
+
+
+def test_otra_instancia_ve_las_imagenes(cache):
+    clave = cache.clave({'data': []}, 10, 10, 1)
+    cache.guardar(clave, b'PNG')
+    otra = CacheImagenesDisco(cache.directorio, max_bytes=cache.max_bytes)
+    assert otra.tamano == 3 and otra.obtener(clave) == b'PNG'
+
+
+def _escribir_y_leer(directorio, proceso: int) -> int:
+    cache = CacheImagenesDisco(directorio, max_bytes=40_000)
+    lecturas_incompletas = 0
+    for i in range(40):
+        cache.guardar(cache.clave({'i': i}, 1, 1, 1), bytes([i]) * 2000)
+        leida = cache.obtener(cache.clave({'i': (i * 7 + proceso) % 40}, 1, 1, 1))
+        lecturas_incompletas += leida is not None and leida != bytes([(i * 7 + proceso) % 40]) * 2000
+    return lecturas_incompletas
+
+
+def test_varios_procesos_nunca_leen_imagenes_a_medias(tmp_path):
+    directorio = tmp_path / 'imagenes'
+    with ProcessPoolExecutor(4) as ejecutor:
+        assert sum(ejecutor.map(_escribir_y_leer, [directorio] * 4, range(4))) == 0
+    assert not list(directorio.rglob('*.tmp'))
+    # Cada proceso desaloja por su cuenta: como mucho una imagen de más por proceso
+    assert sum(f.stat().st_size for f in directorio.rglob('*.png')) <= 40_000 + 4 * 2000
+
+
+class _RenderizadorFalso:
+    llamadas = []
+
+    def png(self, figura, ancho, alto, escala):
+        self.llamadas.append(figura)
+        return b'PNG' + repr(sorted(figura.items())).encode()
+
+    def detener(self):
+        pass
+
+
+def test_segundo_lote_sale_entero_de_la_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(rasterizado, '_Renderizador', _RenderizadorFalso)
+    pool = rasterizado.PoolRenderizado(2, 5, cache=CacheImagenesDisco(tmp_path / 'imagenes'))
+    try:
+        trabajos = {'perfil': ({'a': 1}, 10, 10, 2), 'indices': ({'b': 2}, 10, 10, 2), 'vacio': (None, 1, 1, 1)}
+        primero = pool.renderizar(trabajos)
+        _RenderizadorFalso.llamadas.clear()
+        segundo = pool.renderizar(trabajos)
+
+        assert list(segundo) == ['perfil', 'indices']
+        assert all(imagen.desde_cache for imagen in segundo.values())
+        assert not any(imagen.desde_cache for imagen in primero.values())
+        assert {n: i.png for n, i in segundo.items()} == {n: i.png for n, i in primero.items()}
+        assert _RenderizadorFalso.llamadas == []
+        assert pool.estadisticas()['renderizadas'] == 2
+    finally:
+        pool.cerrar()
@@ -0,0 +1,159 @@
+"""Diario de cambios: recuperación tras caídas, sesiones terminadas, compactación y errores de disco"""
+
+import errno
+import os
+from datetime import date
+
+import pytest
+
+from wppsi import diario as modulo_diario
+from wppsi.diario import DiarioCambios
+
+
+@pytest.fixture
+def ruta(tmp_path):
+    return tmp_path / 'diario.log'
+
+
+def abrir(ruta) -> DiarioCambios:
+    return DiarioCambios(ruta, intervalo_sync=0)
+
+
+def escribir(ruta, *operaciones):
+    """Abre el diario, aplica (metodo, argumentos...) y lo cierra como un proceso que termina"""
+    diario = abrir(ruta)
+    for metodo, *argumentos in operaciones:
+        getattr(diario, metodo)(*argumentos)
+    assert diario.vaciar()
+    diario.cerrar()
+
+
+def test_recupera_los_campos_acumulados(ruta):
+    escribir(ruta,
+             ('registrar', 's1', 'Daniela', {'nombre_paciente': 'An', 'paso_actual': 1}),
+             ('registrar', 's1', 'Daniela', {'nombre_paciente': 'Ana', 'fecha_nacimiento': date(2020, 3, 14)}),
+             ('registrar', 's1', 'Daniela', {'pd_dict.cubos': 12, 'paso_actual': 3}))
+
+    pendiente = abrir(ruta).pendiente(' daniela ')
+    assert pendiente['sesion'] == 's1'
+    assert pendiente['campos'] == {'nombre_paciente': 'Ana', 'fecha_nacimiento': date(2020, 3, 14),
+                                   'pd_dict.cubos': 12, 'paso_actual': 3}
+
+
+def test_sesion_terminada_no_se_ofrece(ruta):
+    escribir(ruta,
+             ('registrar', 's1', 'Daniela', {'nombre_paciente': 'Ana'}),
+             ('registrar', 's2', 'Daniela', {'nombre_paciente': 'Bruno'}),
+             ('terminar', 's2', 'Daniela', 7))
+
+    diario = abrir(ruta)
+    assert diario.pendiente('Daniela')['sesion'] == 's1'
+    assert diario.pendiente('Daniela', excluir='s1') is None
+    assert diario.pendiente('Otra examinadora') is None
+
+
+def test_linea_cortada_por_una_caida(ruta):
+    escribir(ruta, ('registrar', 's1', 'Daniela', {'nombre_paciente': 'Ana'}))
+    completa = ruta.read_bytes()
+    escribir(ruta, ('registrar', 's1', 'Daniela', {'nombre_paciente': 'Ana Perez'}))
+    ruta.write_bytes(ruta.read_bytes()[:len(completa) + 20])  # La segunda línea quedó a medias
+
+    escribir(ruta, ('registrar', 's1', 'Daniela', {'paso_actual': 2}))
+    registros = list(abrir(ruta).leer())
+    assert [r['c'] for r in registros] == [{'nombre_paciente': 'Ana'}, {'paso_actual': 2}]
+
+
+def test_linea_con_crc_incorrecto_se_descarta(ruta):
+    escribir(ruta,
+             ('registrar', 's1', 'Daniela', {'nombre_paciente': 'Ana'}),
+             ('registrar', 's1', 'Daniela', {'paso_actual': 2}))
+    primera, segunda = ruta.read_bytes().splitlines(keepends=True)
+    ruta.write_bytes(primera.replace(b'Ana', b'Ama') + segunda)
+
+    assert abrir(ruta).pendiente('Daniela')['campos'] == {'paso_actual': 2}
+
+
+def test_compactar_conserva_solo_las_pendientes(ruta, monkeypatch):
+    escribir(ruta,
+             ('registrar', 's1', 'Daniela', {'nombre_paciente': 'Ana'}),
+             ('registrar', 's1', 'Daniela', {'paso_actual': 3}),
+             ('registrar', 's2', 'Daniela', {'nombre_paciente': 'Bruno'}),
+             ('terminar', 's2', 'Daniela', 7))
+    antes = abrir(ruta).pendiente('Daniela')
+
+    monkeypatch.setattr(modulo_diario, 'MAX_BYTES_ANTES_DE_COMPACTAR', 0)
+    diario = abrir(ruta)
+    assert len(ruta.read_bytes().splitlines()) == 1
+    assert diario.pendiente('Daniela') == antes
+    diario.cerrar()
+
+
+@pytest.fixture
+def disco_lleno(monkeypatch):
+    """Hace fallar las escrituras al diario indicado mientras `lleno` sea True"""
+    estado = {'diario': None, 'lleno': True}
+    escribir_real = os.write
+
+    def escribir_o_fallar(descriptor, datos):
+        if estado['lleno'] and estado['diario'] is not None and descriptor == estado['diario']._archivo:
+            raise OSError(errno.ENOSPC, 'No queda espacio en el dispositivo')
+        return escribir_real(descriptor, datos)
+
+    monkeypatch.setattr(modulo_diario.os, 'write', escribir_o_fallar)
+    monkeypatch.setattr(modulo_diario, 'INTERVALO_REINTENTO', 0.01)
+    return estado
+
+
+def test_error_de_escritura_se_informa_y_se_reintenta(ruta, disco_lleno):
+    diario = disco_lleno['diario'] = abrir(ruta)
+    diario.registrar('s1', 'Daniela', {'nombre_paciente': 'Ana'})
+    assert not diario.vaciar(espera=2)
+    assert diario.error.errno == errno.ENOSPC
+
+    diario.registrar('s1', 'Daniela', {'paso_actual': 2})
+    disco_lleno['lleno'] = False
+    assert diario.vaciar(espera=2)
+    assert diario.error is None and diario.descartados == 0
+    diario.cerrar()
+
+    assert [r['c'] for r in abrir(ruta).leer()] == [{'nombre_paciente': 'Ana'}, {'paso_actual': 2}]
+
+
+def test_lo_pendiente_tiene_tope_mientras_falla_el_disco(ruta, disco_lleno, monkeypatch):
+    monkeypatch.setattr(modulo_diario, 'MAX_PENDIENTES', 10)
+    diario = disco_lleno['diario'] = abrir(ruta)
+    for paso in range(15):
+        diario.registrar('s1', 'Daniela', {'paso_actual': paso})
+    assert diario.descartados == 5
+
+    disco_lleno['lleno'] = False
+    assert diario.vaciar(espera=2)
+    assert len(list(diario.leer())) == 10
+    diario.cerrar()
+
+
+def test_otro_proceso_compacta_mientras_se_anexa(ruta, monkeypatch):
+    primero = abrir(ruta)
+    primero.registrar('s1', 'Daniela', {'nombre_paciente': 'Ana'})
+    primero.terminar('s1', 'Daniela', 1)
+    primero.registrar('s2', 'Daniela', {'nombre_paciente': 'Bruno'})
+    assert primero.vaciar()
+
+    monkeypatch.setattr(modulo_diario, 'MAX_BYTES_ANTES_DE_COMPACTAR', 0)
+    segundo = abrir(ruta)   # Reemplaza el archivo que el primero tiene abierto
+    assert len(ruta.read_bytes().splitlines()) == 1
+
+    primero.registrar('s2', 'Daniela', {'paso_actual': 3})
+    assert primero.vaciar()
+    assert segundo.pendiente('Daniela')['campos'] == {'nombre_paciente': 'Bruno', 'paso_actual': 3}
+    primero.cerrar()
+    segundo.cerrar()
+
+
+def test_solo_el_usuario_puede_leer_el_diario(ruta, monkeypatch):
+    escribir(ruta, ('registrar', 's1', 'Daniela', {'observaciones': 'texto clínico'}))
+    assert ruta.stat().st_mode & 0o777 == 0o600
+
+    monkeypatch.setattr(modulo_diario, 'MAX_BYTES_ANTES_DE_COMPACTAR', 0)
+    abrir(ruta).cerrar()
+    assert ruta.stat().st_mode & 0o777 == 0o600
@@ -0,0 +1,65 @@
+"""PuntuacionIncremental frente a procesar_evaluacion_completa tras cada cambio de PD"""
+
+import random
+from datetime import date
+
+from wppsi import BaremosWPPSIUltra, PuntuacionIncremental, procesar_evaluacion_completa
+from wppsi.incremental import COMPUESTOS, GRAFO_DEPENDENCIAS
+
+PRUEBAS = tuple(BaremosWPPSIUltra.PRUEBAS_INFO)
+
+
+def puntuar(pd_dict, edad_meses):
+    datos_personales = {}
+    if edad_meses is not None:
+        datos_personales = {'fecha_nacimiento': '2018-01-01',
+                            'fecha_evaluacion': str(date(2018 + edad_meses // 12, edad_meses % 12 + 1, 1))}
+    resultado = procesar_evaluacion_completa(datos_personales, dict.fromkeys(pd_dict, True), pd_dict)
+    assert resultado.edad_meses == edad_meses
+    return resultado
+
+
+def valores(estado):
+    return {**estado.indices_primarios, **estado.indices_secundarios}
+
+
+def test_incremental_igual_a_completo_tras_cada_cambio():
+    azar = random.Random(3)
+    estado = PuntuacionIncremental()
+    pd_dict, edad = {}, None
+    for paso in range(3000):
+        antes = valores(estado)
+        accion = azar.random()
+        if accion < 0.6:
+            prueba = azar.choice(PRUEBAS)
+            pd_dict[prueba] = azar.randint(-1, 32)
+            recalculados = estado.actualizar(prueba, pd_dict[prueba])
+        elif accion < 0.8:
+            prueba = azar.choice(PRUEBAS)
+            pd_dict.pop(prueba, None)
+            recalculados = estado.quitar(prueba)
+        elif accion < 0.85:
+            edad = azar.choice([None, 50, 60, 80, 90])
+            recalculados = estado.sincronizar(dict(pd_dict), edad)
+        else:
+            recalculados = estado.sincronizar(dict(pd_dict), edad)
+
+        resultado = puntuar(pd_dict, edad)
+        assert estado.pe == resultado.pe, paso
+        assert estado.sumas_indices == resultado.sumas_indices, paso
+        assert estado.indices_primarios == resultado.indices_primarios, paso
+        assert estado.indices_secundarios == resultado.indices_secundarios, paso
+        assert estado.cit == resultado.cit, paso
+        # Lo que cambió está entre lo recalculado
+        despues = valores(estado)
+        assert {c for c in COMPUESTOS if antes.get(c) != despues.get(c)} <= set(recalculados), paso
+
+
+def test_actualizar_solo_recalcula_los_compuestos_de_la_prueba():
+    estado = PuntuacionIncremental()
+    estado.sincronizar({prueba: 10 for prueba in PRUEBAS})
+    for prueba in PRUEBAS:
+        assert estado.actualizar(prueba, 3) == GRAFO_DEPENDENCIAS[prueba]
+        assert estado.actualizar(prueba, 3) == ()
+    assert estado.actualizar('cubos', None) == GRAFO_DEPENDENCIAS['cubos']
+    assert 'cubos' not in estado.pe
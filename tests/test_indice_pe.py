@@ -0,0 +1,133 @@
+"""Índice columnar de PE: altas incrementales frente a reconstrucción y detección de desfase"""
+
+import random
+import time
+
+from wppsi import AlmacenEvaluaciones
+
+from .conftest import datos_evaluacion
+from .test_agregados import poblar_al_azar
+
+
+def contenido(indice):
+    """{id: (PE, compuestos, edad)} de las filas activas"""
+    vista = indice.vista()
+    return {int(i): (tuple(pe), tuple(compuestos), int(edad))
+            for i, pe, compuestos, edad, activa in zip(vista.ids, vista.pe, vista.compuestos,
+                                                       vista.edad_meses, vista.activa) if activa}
+
+
+def test_incremental_igual_a_reconstruido(almacen):
+    pacientes = poblar_al_azar(almacen)
+    incremental = contenido(almacen.indice_pe())
+    assert set(incremental) == set(pacientes)
+
+    reconstruido = almacen.reconstruir_indice_pe()
+    assert contenido(reconstruido) == incremental
+    assert len(reconstruido.vista()) == len(pacientes)   # Sin las filas inactivas
+
+
+def test_fila_refleja_la_evaluacion_guardada(almacen):
+    datos = datos_evaluacion()
+    evaluacion_id = almacen.guardar(*datos)
+    pe, compuestos, edad = contenido(almacen.indice_pe())[evaluacion_id]
+    resultado = datos[3]
+    assert sorted(v for v in pe if v) == sorted(resultado.valores_pe)
+    assert sorted(v for v in compuestos if v) == sorted(v for _, v in resultado.compuestos())
+    assert edad == resultado.edad_meses
+
+
+def test_reabrir_usa_el_indice_sincronizado(almacen):
+    poblar_al_azar(almacen, operaciones=40)
+    esperado = contenido(almacen.indice_pe())
+    marca = (almacen.indice_pe().directorio / 'pe.i1').stat().st_mtime_ns
+
+    reabierto = AlmacenEvaluaciones(almacen.ruta)
+    try:
+        assert contenido(reabierto.indice_pe()) == esperado
+        assert (reabierto.indice_pe().directorio / 'pe.i1').stat().st_mtime_ns == marca
+    finally:
+        reabierto.cerrar()
+
+
+def test_base_modificada_por_fuera_reconstruye_al_abrir(almacen):
+    pacientes = poblar_al_azar(almacen, operaciones=40)
+    borrada = min(pacientes)
+    with almacen.pool.transaccion() as con:
+        con.execute('DELETE FROM evaluaciones WHERE id = ?', (borrada,))
+
+    reabierto = AlmacenEvaluaciones(almacen.ruta)
+    try:
+        assert set(contenido(reabierto.indice_pe())) == set(pacientes) - {borrada}
+    finally:
+        reabierto.cerrar()
+
+
+def test_columna_truncada_reconstruye_al_abrir(almacen):
+    pacientes = poblar_al_azar(almacen, operaciones=40)
+    esperado = contenido(almacen.indice_pe())
+    columna = almacen.indice_pe().directorio / 'compuestos.i2'
+    columna.write_bytes(columna.read_bytes()[:10])
+
+    reabierto = AlmacenEvaluaciones(almacen.ruta)
+    try:
+        assert contenido(reabierto.indice_pe()) == esperado
+        assert set(esperado) == set(pacientes)
+    finally:
+        reabierto.cerrar()
+
+
+def test_pool_de_una_conexion_no_se_bloquea_al_guardar(tmp_path):
+    almacen = AlmacenEvaluaciones(tmp_path / 'evaluaciones.db', max_conexiones=1)
+    almacen.pool.espera = 2   # Si se pidiera una segunda conexión, guardar tardaría esto
+    try:
+        inicio = time.perf_counter()
+        ids = [almacen.guardar(*datos_evaluacion(f'Paciente {i}', semilla=i)) for i in range(3)]
+        assert almacen.eliminar(ids[0])
+        assert time.perf_counter() - inicio < 1
+
+        indice = almacen.indice_pe()
+        assert not indice.desfasado
+        assert set(contenido(indice)) == set(ids[1:])
+    finally:
+        almacen.cerrar()
+
+
+def test_dos_procesos_con_la_misma_base(almacen):
+    # Cada almacén lleva su propio estado del índice, como dos procesos de la aplicación
+    otro = AlmacenEvaluaciones(almacen.ruta)
+    try:
+        azar = random.Random(3)
+        pacientes = {}
+        for paso in range(60):
+            quien = azar.choice([almacen, otro])
+            accion = azar.random()
+            if pacientes and accion < 0.2:
+                evaluacion_id = azar.choice(list(pacientes))
+                assert quien.eliminar(evaluacion_id)
+                del pacientes[evaluacion_id]
+            elif pacientes and accion < 0.4:
+                evaluacion_id = azar.choice(list(pacientes))
+                datos = datos_evaluacion(pacientes[evaluacion_id], semilla=paso)
+                assert quien.guardar(*datos, evaluacion_id=evaluacion_id) == evaluacion_id
+            else:
+                nombre = f'Paciente {paso}'
+                pacientes[quien.guardar(*datos_evaluacion(nombre, semilla=paso))] = nombre
+
+        esperado = contenido(almacen.indice_pe())
+        assert set(esperado) == set(pacientes)
+        assert contenido(otro.indice_pe()) == esperado
+        assert contenido(almacen.reconstruir_indice_pe()) == esperado
+    finally:
+        otro.cerrar()
+
+
+def test_base_modificada_por_fuera_no_se_escribe_encima(almacen):
+    pacientes = poblar_al_azar(almacen, operaciones=40)
+    borrada = min(pacientes)
+    with almacen.pool.transaccion() as con:
+        con.execute('DELETE FROM evaluaciones WHERE id = ?', (borrada,))
+
+    nueva = almacen.guardar(*datos_evaluacion('Paciente nuevo', semilla=99))
+    assert almacen.indice_pe().desfasado is False
+    assert set(contenido(almacen.indice_pe())) == set(pacientes) - {borrada} | {nueva}
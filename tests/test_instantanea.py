@@ -0,0 +1,148 @@
+"""Instantáneas de sesión: ida y vuelta y rechazo de archivos dañados o manipulados"""
+
+import json
+import struct
+import zlib
+from datetime import date
+
+import pytest
+
+from wppsi import BaremosWPPSIUltra, procesar_evaluacion_completa
+from wppsi.instantanea import (CABECERA, MAGIC, PREFIJO_GRAFICO, ErrorInstantanea, Instantanea,
+                               crear_instantanea, leer_instantanea)
+
+from .conftest import datos_evaluacion
+
+
+@pytest.fixture
+def instantanea():
+    datos, aplicadas, pd_dict, resultado = datos_evaluacion()
+    campos = {'paso_actual': 4, 'nombre_paciente': datos['nombre'],
+              'fecha_nacimiento': date(2020, 3, 14), 'fecha_evaluacion': date(2025, 6, 2),
+              'pruebas_aplicadas': aplicadas, 'pd_dict': pd_dict, 'observaciones_conductuales': {'atencion': 'ok'}}
+    return Instantanea(campos=campos, resultado=resultado, graficos={'perfil': '{"data":[],"layout":{}}'})
+
+
+def reempaquetar(estado, graficos=None, version: int = 1) -> bytes:
+    """Instantánea con checksum válido a partir de una sección 'estado' arbitraria"""
+    secciones = [('estado', json.dumps(estado))]
+    secciones += [(PREFIJO_GRAFICO + nombre, grafico) for nombre, grafico in (graficos or {}).items()]
+    cuerpo = b''
+    for nombre, datos in secciones:
+        nombre, datos = nombre.encode('utf-8'), datos.encode('utf-8')
+        cuerpo += struct.pack('<H', len(nombre)) + nombre + struct.pack('<I', len(datos)) + datos
+    comprimido = zlib.compress(cuerpo)
+    return CABECERA.pack(MAGIC, version, len(cuerpo), zlib.crc32(comprimido)) + comprimido
+
+
+def estado_de(instantanea) -> dict:
+    datos = crear_instantanea(instantanea)
+    cuerpo = zlib.decompress(datos[CABECERA.size:])
+    (n,) = struct.unpack_from('<H', cuerpo, 0)
+    (longitud,) = struct.unpack_from('<I', cuerpo, 2 + n)
+    return json.loads(cuerpo[6 + n:6 + n + longitud])
+
+
+def test_ida_y_vuelta(instantanea):
+    assert leer_instantanea(crear_instantanea(instantanea)) == instantanea
+
+
+def test_sin_resultado():
+    vacia = Instantanea(campos={'paso_actual': 1, 'fecha_nacimiento': None})
+    assert leer_instantanea(crear_instantanea(vacia)) == vacia
+
+
+@pytest.mark.parametrize('danar', [
+    lambda datos: datos[:10],
+    lambda datos: b'OTRACOSA' + datos[8:],
+    lambda datos: datos[:-1] + bytes([datos[-1] ^ 1]),
+    lambda datos: datos[:8] + struct.pack('<H', 99) + datos[10:],
+])
+def test_archivo_danado(instantanea, danar):
+    with pytest.raises(ErrorInstantanea):
+        leer_instantanea(danar(crear_instantanea(instantanea)))
+
+
+def test_estado_reempaquetado_sin_cambios_se_acepta(instantanea):
+    leida = leer_instantanea(reempaquetar(estado_de(instantanea), instantanea.graficos))
+    assert leida.resultado == instantanea.resultado and leida.graficos == instantanea.graficos
+
+
+@pytest.mark.parametrize('version', [0, 2])
+def test_version_desconocida(instantanea, version):
+    with pytest.raises(ErrorInstantanea):
+        leer_instantanea(reempaquetar(estado_de(instantanea), version=version))
+
+
+def test_resultado_que_no_sale_de_las_pd_se_vuelve_a_puntuar(instantanea):
+    # PD mínimas con PE 19 y CIT 160: valores en rango, pero no los que dan esas PD
+    estado = estado_de(instantanea)
+    pd_dict = estado['campos']['pd_dict']
+    for prueba in pd_dict:
+        pd_dict[prueba] = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]['rango_pd'][0]
+    estado['resultado'][1] = [pd_dict[prueba] for prueba in estado['resultado'][0]]
+    estado['resultado'][2] = [19] * len(estado['resultado'][0])
+    estado['resultado'][5] = 160
+
+    leida = leer_instantanea(reempaquetar(estado, instantanea.graficos))
+    esperado = procesar_evaluacion_completa(
+        {'fecha_nacimiento': '2020-03-14', 'fecha_evaluacion': '2025-06-02'},
+        instantanea.campos['pruebas_aplicadas'], pd_dict)
+    assert leida.resultado == esperado and leida.resultado.cit != 160
+    assert leida.graficos == {}
+
+
+def _prueba_desconocida(estado):
+    estado['resultado'][0][0] = 'prueba_inventada'
+
+def _pe_fuera_de_rango(estado):
+    estado['resultado'][2][0] = 25
+
+def _pd_negativa(estado):
+    estado['resultado'][1][0] = -3
+
+def _pe_no_entera(estado):
+    estado['resultado'][2][0] = 10.5
+
+def _longitudes_distintas(estado):
+    estado['resultado'][2].pop()
+
+def _sumas_incompletas(estado):
+    estado['resultado'][3].pop()
+
+def _indice_desconocido(estado):
+    estado['resultado'][4].append(['XYZ', 100])
+
+def _cit_fuera_de_rango(estado):
+    estado['resultado'][5] = 400
+
+def _tupla_corta(estado):
+    estado['resultado'] = estado['resultado'][:5]
+
+def _pd_de_campos_fuera_de_rango(estado):
+    estado['campos']['pd_dict']['cubos'] = 99
+
+def _prueba_desconocida_en_campos(estado):
+    estado['campos']['pruebas_aplicadas']['prueba_inventada'] = True
+
+def _campos_no_diccionario(estado):
+    estado['campos'] = []
+
+def _grafico_no_json(estado):
+    return {'perfil': 'no es JSON'}
+
+def _grafico_no_objeto(estado):
+    return {'perfil': '[1, 2]'}
+
+
+@pytest.mark.parametrize('manipular', [
+    _prueba_desconocida, _pe_fuera_de_rango, _pd_negativa, _pe_no_entera, _longitudes_distintas,
+    _sumas_incompletas, _indice_desconocido, _cit_fuera_de_rango, _tupla_corta,
+    _pd_de_campos_fuera_de_rango, _prueba_desconocida_en_campos, _campos_no_diccionario,
+    _grafico_no_json, _grafico_no_objeto,
+])
+def test_contenido_manipulado_con_checksum_valido(instantanea, manipular):
+    estado = estado_de(instantanea)
+    graficos = manipular(estado)
+    with pytest.raises(ErrorInstantanea):
+        leer_instantanea(reempaquetar(estado, graficos))
@@ -0,0 +1,87 @@
+"""procesar_lote frente a procesar_evaluacion_completa caso por caso"""
+
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from wppsi import BaremosWPPSIUltra, procesar_evaluacion_completa, procesar_lote
+from wppsi.baremos import INDICES_PRIMARIOS
+
+PRUEBAS = tuple(BaremosWPPSIUltra.PRUEBAS_INFO)
+COMPUESTOS = (*INDICES_PRIMARIOS, 'CIT', *BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG)
+
+
+def casos_al_azar(n: int, semilla: int):
+    """PD (también fuera de rango) de un subconjunto de pruebas; algunas filas sin fechas"""
+    azar = random.Random(semilla)
+    casos = []
+    for _ in range(n):
+        pd_dict = {p: azar.randint(-1, 32) for p in PRUEBAS if azar.random() < 0.6}
+        nacimiento = evaluacion = None
+        if azar.random() < 0.9:
+            nacimiento = date(2015, 1, 1) + timedelta(days=azar.randrange(3000))
+            evaluacion = nacimiento + timedelta(days=azar.randrange(4000))
+        casos.append((pd_dict, nacimiento, evaluacion))
+    return casos
+
+
+def valor(v):
+    return None if v is None or v is pd.NA or (isinstance(v, float) and v != v) else v
+
+
+@pytest.fixture(scope='module')
+def casos_y_lote():
+    casos = casos_al_azar(3000, semilla=2)
+    df = pd.DataFrame([{**pd_dict, 'fecha_nacimiento': nacimiento, 'fecha_evaluacion': evaluacion}
+                       for pd_dict, nacimiento, evaluacion in casos])
+    return casos, procesar_lote(df).to_dict('records')
+
+
+def test_lote_igual_que_caso_a_caso(casos_y_lote):
+    casos, filas = casos_y_lote
+    for (pd_dict, nacimiento, evaluacion), fila in zip(casos, filas):
+        datos_personales = ({'fecha_nacimiento': str(nacimiento), 'fecha_evaluacion': str(evaluacion)}
+                            if nacimiento else {})
+        resultado = procesar_evaluacion_completa(datos_personales, dict.fromkeys(pd_dict, True), pd_dict)
+        caso = (pd_dict, nacimiento, evaluacion)
+
+        if nacimiento:
+            edad = BaremosWPPSIUltra.calcular_edad_exacta(nacimiento, evaluacion)
+            assert (fila['edad_anios'], fila['edad_meses'], fila['edad_dias']) == edad, caso
+        else:
+            assert valor(fila['edad_anios']) is None, caso
+
+        pe = resultado.pe
+        fortalezas = {f['prueba'] for f in resultado.fortalezas}
+        debilidades = {d['prueba'] for d in resultado.debilidades}
+        for prueba in PRUEBAS:
+            nombre = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]['nombre']
+            assert valor(fila[f'pe_{prueba}']) == pe.get(prueba), (caso, prueba)
+            assert fila[f'fortaleza_{prueba}'] == (nombre in fortalezas), (caso, prueba)
+            assert fila[f'debilidad_{prueba}'] == (nombre in debilidades), (caso, prueba)
+
+        for indice, suma in resultado.sumas_indices.items():
+            assert fila[f'suma_{indice}'] == suma, (caso, indice)
+        assert fila['suma_total'] == resultado.suma_total, caso
+
+        for indice in COMPUESTOS:
+            compuesto = resultado.valor(indice)
+            assert valor(fila[indice]) == compuesto, (caso, indice)
+            if compuesto is None:
+                assert valor(fila[f'percentil_{indice}']) is None and valor(fila[f'categoria_{indice}']) is None
+                continue
+            assert fila[f'percentil_{indice}'] == resultado.percentil(indice), (caso, indice)
+            assert fila[f'categoria_{indice}'] == resultado.categoria(indice)['categoria'], (caso, indice)
+            assert (fila[f'ic_inf_{indice}'], fila[f'ic_sup_{indice}']) == resultado.intervalo(indice), (caso, indice)
+
+
+def test_lote_sin_columnas_de_fecha_usa_el_baremo_general():
+    casos = casos_al_azar(200, semilla=4)
+    filas = procesar_lote(pd.DataFrame([pd_dict for pd_dict, _, _ in casos])).to_dict('records')
+    for (pd_dict, _, _), fila in zip(casos, filas):
+        assert 'edad_anios' not in fila
+        resultado = procesar_evaluacion_completa({}, dict.fromkeys(pd_dict, True), pd_dict)
+        assert {p: valor(fila[f'pe_{p}']) for p in PRUEBAS if valor(fila[f'pe_{p}']) is not None} == resultado.pe
+        assert valor(fila['CIT']) == resultado.cit
@@ -0,0 +1,70 @@
+"""Archivo binario de normas por edad: generación, validación y coherencia con los baremos"""
+
+import copy
+
+import pytest
+
+from wppsi import normas
+from wppsi.baremos import BaremosWPPSIUltra, MOTOR_BAREMOS
+from wppsi.normas import ErrorArchivoNormas, NormasPorEdad
+
+
+@pytest.fixture
+def archivo(tmp_path):
+    return normas.generar_archivo_por_defecto(tmp_path / 'normas.bin')
+
+
+def test_archivo_incluido_coincide_con_los_baremos():
+    incluido = NormasPorEdad(normas.RUTA_POR_DEFECTO)
+    try:
+        assert incluido.coincide_con(normas.tablas_por_defecto()), \
+            "Regenere el archivo con: python -m wppsi.normas generar"
+    finally:
+        incluido.cerrar()
+
+
+def test_archivo_generado_convierte_igual_que_el_motor(archivo):
+    generado = NormasPorEdad(archivo)
+    for prueba in BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE:
+        for pd in range(-1, MOTOR_BAREMOS.pd_maxima + 5):
+            esperado = 1 if pd < 0 else MOTOR_BAREMOS.convertir_valor(prueba, pd)
+            for edad in (30, normas.EDAD_MIN_MESES, 70, normas.EDAD_MAX_MESES, 120):
+                assert generado.convertir_valor(prueba, pd, edad) == esperado
+    generado.cerrar()
+
+
+def test_tablas_editadas_no_coinciden(archivo):
+    tablas = copy.deepcopy(BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE)
+    prueba = next(iter(tablas))
+    pd = next(iter(tablas[prueba]))
+    tablas[prueba][pd] = 19 if tablas[prueba][pd] != 19 else 1
+
+    generado = NormasPorEdad(archivo)
+    assert generado.coincide_con(normas.tablas_por_defecto())
+    assert not generado.coincide_con([tablas] * generado.n_bandas)
+    generado.cerrar()
+
+
+def test_obtener_normas_rechaza_archivo_incluido_desactualizado(archivo, monkeypatch):
+    desactualizado = [copy.deepcopy(BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE)] * 15
+    prueba = next(iter(desactualizado[0]))
+    desactualizado[0][prueba] = {pd: 19 for pd in desactualizado[0][prueba]}
+    normas.escribir_archivo_normas(archivo, desactualizado)
+
+    monkeypatch.delenv('WPPSI_ARCHIVO_NORMAS', raising=False)
+    monkeypatch.setattr(normas, 'RUTA_POR_DEFECTO', archivo)
+    monkeypatch.setattr(normas, '_normas', None)
+    monkeypatch.setattr(normas, '_normas_cargadas', False)
+    with pytest.raises(ErrorArchivoNormas, match='no coincide'):
+        normas.obtener_normas()
+
+
+@pytest.mark.parametrize('danar', [
+    lambda datos: datos[:-1],
+    lambda datos: b'XXXXXXXX' + datos[8:],
+    lambda datos: datos[:-1] + bytes([datos[-1] ^ 0xFF]),
+])
+def test_archivo_danado(archivo, danar):
+    archivo.write_bytes(danar(archivo.read_bytes()))
+    with pytest.raises(ErrorArchivoNormas):
+        NormasPorEdad(archivo)
@@ -0,0 +1,121 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+NÚCLEO DE PUNTUACIÓN WPPSI-IV (SIN STREAMLIT)
+Importable desde la app, workers y trabajos de línea de comandos
+═══════════════════════════════════════════════════════════════════════════════
+La importación del paquete solo usa la biblioteca estándar. NumPy se carga
+al calcular estadísticas o conversiones por lotes, y pandas solo con
+procesar_lote. El presupuesto de importación se verifica con:
+
+    python -m wppsi.tiempo_importacion
+"""
+
+from .baremos import (
+    BaremosWPPSIUltra,
+    MotorBaremosPE,
+    MotorIndicesCompuestos,
+    TablaMetricasCompuestas,
+    MOTOR_BAREMOS,
+    MOTOR_INDICES,
+    TABLA_METRICAS,
+    INDICES_PRIMARIOS,
+)
+from .cache import CacheLRU, huella_codigo
+from .resultado import ResultadoEvaluacion
+from .incremental import PuntuacionIncremental, GRAFO_DEPENDENCIAS
+from .evaluacion import (
+    procesar_evaluacion_completa,
+    generar_recomendaciones,
+    edad_en_meses,
+    CACHE_EVALUACIONES,
+)
+
+
+# Nombres que se importan solo cuando se piden (procesar_lote arrastra pandas,
+# el almacén sqlite3; las normas se pueden ejecutar como módulo con python -m wppsi.normas)
+_DIFERIDOS = {
+    'procesar_lote': 'lote',
+    'NormasPorEdad': 'normas',
+    'ErrorArchivoNormas': 'normas',
+    'obtener_normas': 'normas',
+    'AlmacenEvaluaciones': 'almacen',
+    'obtener_almacen': 'almacen',
+    'UMBRALES_CIT': 'almacen',
+    'etiqueta_banda_edad': 'almacen',
+    'MINIMO_NORMA_LOCAL': 'almacen',
+    'IndicePE': 'indice_pe',
+    'VistaIndicePE': 'indice_pe',
+    'buscar_similares': 'similares',
+    'PoolRenderizado': 'rasterizado',
+    'ImagenRenderizada': 'rasterizado',
+    'obtener_pool_renderizado': 'rasterizado',
+    'CacheImagenesDisco': 'cache_imagenes',
+    'obtener_cache_imagenes': 'cache_imagenes',
+    'dibujo_perfil_escalares': 'graficos_pdf',
+    'dibujo_indices_compuestos': 'graficos_pdf',
+    'dibujo_distribucion_normal': 'graficos_pdf',
+    'DiarioCambios': 'diario',
+    'obtener_diario': 'diario',
+    'Instantanea': 'instantanea',
+    'ErrorInstantanea': 'instantanea',
+    'crear_instantanea': 'instantanea',
+    'leer_instantanea': 'instantanea',
+    'AnalisisRetest': 'longitudinal',
+    'analizar_trayectoria': 'longitudinal',
+}
+
+
+def __getattr__(nombre):
+    if nombre in _DIFERIDOS:
+        import importlib
+        return getattr(importlib.import_module(f'.{_DIFERIDOS[nombre]}', __name__), nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+__all__ = [
+    'BaremosWPPSIUltra',
+    'MotorBaremosPE',
+    'MotorIndicesCompuestos',
+    'TablaMetricasCompuestas',
+    'MOTOR_BAREMOS',
+    'MOTOR_INDICES',
+    'TABLA_METRICAS',
+    'INDICES_PRIMARIOS',
+    'CacheLRU',
+    'huella_codigo',
+    'ResultadoEvaluacion',
+    'PuntuacionIncremental',
+    'GRAFO_DEPENDENCIAS',
+    'NormasPorEdad',
+    'ErrorArchivoNormas',
+    'obtener_normas',
+    'procesar_evaluacion_completa',
+    'generar_recomendaciones',
+    'edad_en_meses',
+    'CACHE_EVALUACIONES',
+    'procesar_lote',
+    'AlmacenEvaluaciones',
+    'obtener_almacen',
+    'UMBRALES_CIT',
+    'etiqueta_banda_edad',
+    'MINIMO_NORMA_LOCAL',
+    'IndicePE',
+    'VistaIndicePE',
+    'buscar_similares',
+    'PoolRenderizado',
+    'ImagenRenderizada',
+    'obtener_pool_renderizado',
+    'CacheImagenesDisco',
+    'obtener_cache_imagenes',
+    'dibujo_perfil_escalares',
+    'dibujo_indices_compuestos',
+    'dibujo_distribucion_normal',
+    'DiarioCambios',
+    'obtener_diario',
+    'Instantanea',
+    'ErrorInstantanea',
+    'crear_instantanea',
+    'leer_instantanea',
+    'AnalisisRetest',
+    'analizar_trayectoria',
+]
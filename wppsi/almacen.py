@@ -0,0 +1,884 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+ALMACÉN PERSISTENTE DE EVALUACIONES (SQLITE EN MODO WAL)
+Entrada completa (datos, pruebas, PD) y puntuaciones derivadas de cada evaluación
+═══════════════════════════════════════════════════════════════════════════════
+Las conexiones salen de un pool compartido por todas las sesiones del proceso:
+en WAL las lecturas no bloquean y cada escritura es una transacción
+BEGIN IMMEDIATE, así que dos sesiones nunca mezclan sus cambios. La ruta se
+puede fijar con WPPSI_BASE_DATOS.
+"""
+
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from .baremos import BaremosWPPSIUltra
+from .resultado import ResultadoEvaluacion
+
+if TYPE_CHECKING:
+    from .indice_pe import IndicePE
+
+RUTA_POR_DEFECTO = Path.home() / '.wppsi' / 'evaluaciones.db'
+
+CAMPOS_PERSONALES = (
+    'nombre', 'fecha_nacimiento', 'fecha_evaluacion', 'edad_texto', 'examinador', 'lugar',
+    'sexo', 'dominancia', 'lenguaje', 'escolaridad', 'motivo_consulta', 'observaciones', 'antecedentes'
+)
+
+# Categorías del CIT para los agregados de cohorte: límite inferior de cada una en
+# BaremosWPPSIUltra.obtener_categoria_descriptiva, de mayor a menor
+UMBRALES_CIT = (130, 120, 110, 90, 80, 70, 0)
+CATEGORIAS_CIT = tuple(BaremosWPPSIUltra.obtener_categoria_descriptiva(u)[0] for u in UMBRALES_CIT)
+SIN_CIT = BaremosWPPSIUltra.obtener_categoria_descriptiva(None)[0]
+MESES_POR_BANDA_COHORTE = 6
+# Evaluaciones de la misma banda necesarias para mostrar un percentil local
+MINIMO_NORMA_LOCAL = 20
+
+
+def _categoria_sql(cit: str) -> str:
+    casos = ' '.join(f"WHEN {cit} >= {u} THEN '{c}'" for u, c in zip(UMBRALES_CIT[:-1], CATEGORIAS_CIT))
+    return f"CASE WHEN {cit} IS NULL THEN '{SIN_CIT}' {casos} ELSE '{CATEGORIAS_CIT[-1]}' END"
+
+def _banda_sql(edad_meses: str) -> str:
+    return f"ifnull({edad_meses} / {MESES_POR_BANDA_COHORTE}, -1)"
+
+def _sumar_cit_sql(fila: str) -> str:
+    return f"""
+        INSERT INTO cohorte_cit (lugar, categoria, n, suma, suma_cuadrados)
+        VALUES (ifnull({fila}.lugar, ''), {_categoria_sql(fila + '.cit')}, 1,
+                ifnull({fila}.cit, 0), ifnull({fila}.cit * {fila}.cit, 0))
+        ON CONFLICT (lugar, categoria) DO UPDATE SET
+            n = n + 1, suma = suma + excluded.suma, suma_cuadrados = suma_cuadrados + excluded.suma_cuadrados;"""
+
+def _restar_cit_sql(fila: str) -> str:
+    return f"""
+        UPDATE cohorte_cit SET n = n - 1, suma = suma - ifnull({fila}.cit, 0),
+               suma_cuadrados = suma_cuadrados - ifnull({fila}.cit * {fila}.cit, 0)
+        WHERE lugar = ifnull({fila}.lugar, '') AND categoria = {_categoria_sql(fila + '.cit')};"""
+
+def _sumar_pe_sql(puntuaciones: str, edad_meses: str) -> str:
+    """Suma las PE de las filas de `puntuaciones` (una expresión FROM ... WHERE ...) a su banda"""
+    return f"""
+        INSERT INTO cohorte_pe (prueba, banda_edad, n, suma, suma_cuadrados)
+        SELECT p.prueba, {_banda_sql(edad_meses)}, 1, p.pe, p.pe * p.pe {puntuaciones} AND p.pe IS NOT NULL
+        ON CONFLICT (prueba, banda_edad) DO UPDATE SET
+            n = n + 1, suma = suma + excluded.suma, suma_cuadrados = suma_cuadrados + excluded.suma_cuadrados;"""
+
+def _restar_pe_sql(prueba: str, pe: str, edad_meses: str) -> str:
+    return f"""
+        UPDATE cohorte_pe SET n = n - 1, suma = suma - {pe}, suma_cuadrados = suma_cuadrados - {pe} * {pe}
+        WHERE {pe} IS NOT NULL AND prueba = {prueba} AND banda_edad = {_banda_sql(edad_meses)};"""
+
+# Recalcula los agregados de cohorte desde cero (migración y AlmacenEvaluaciones.reconstruir_cohorte)
+RECONSTRUIR_COHORTE = f"""
+    DELETE FROM cohorte_cit;
+    INSERT INTO cohorte_cit (lugar, categoria, n, suma, suma_cuadrados)
+        SELECT ifnull(lugar, ''), {_categoria_sql('cit')}, count(*), ifnull(sum(cit), 0), ifnull(sum(cit * cit), 0)
+        FROM evaluaciones GROUP BY 1, 2;
+    DELETE FROM cohorte_pe;
+    INSERT INTO cohorte_pe (prueba, banda_edad, n, suma, suma_cuadrados)
+        SELECT p.prueba, {_banda_sql('e.edad_meses')}, count(*), sum(p.pe), sum(p.pe * p.pe)
+        FROM puntuaciones p JOIN evaluaciones e ON e.id = p.evaluacion_id
+        WHERE p.pe IS NOT NULL GROUP BY 1, 2;
+"""
+
+def _sumar_norma_sql(medidas: str, edad_meses: str) -> str:
+    """Cuenta las filas (medida, valor) de `medidas` (una expresión FROM ... WHERE ...) en su banda"""
+    return f"""
+        INSERT INTO normas_locales (medida, banda_edad, valor, n)
+        SELECT m.medida, {_banda_sql(edad_meses)}, m.valor, 1 {medidas} AND m.valor IS NOT NULL
+        ON CONFLICT (medida, banda_edad, valor) DO UPDATE SET n = n + 1;"""
+
+def _restar_norma_sql(medida: str, valor: str, edad_meses: str) -> str:
+    return f"""
+        UPDATE normas_locales SET n = n - 1
+        WHERE {valor} IS NOT NULL AND medida = {medida} AND banda_edad = {_banda_sql(edad_meses)} AND valor = {valor};"""
+
+# PE y compuestos de una evaluación como filas (medida, valor)
+_MEDIDAS_EVALUACION = """
+    SELECT prueba AS medida, pe AS valor FROM puntuaciones WHERE evaluacion_id = {id} AND pe IS NOT NULL
+    UNION ALL SELECT indice, valor FROM indices WHERE evaluacion_id = {id}"""
+
+RECONSTRUIR_NORMAS_LOCALES = f"""
+    DELETE FROM normas_locales;
+    INSERT INTO normas_locales (medida, banda_edad, valor, n)
+        SELECT m.medida, {_banda_sql('e.edad_meses')}, m.valor, count(*)
+        FROM (SELECT evaluacion_id, prueba AS medida, pe AS valor FROM puntuaciones WHERE pe IS NOT NULL
+              UNION ALL SELECT evaluacion_id, indice, valor FROM indices) m
+        JOIN evaluaciones e ON e.id = m.evaluacion_id
+        GROUP BY 1, 2, 3;
+"""
+
+# Cada entrada lleva el esquema de la versión anterior a la siguiente (PRAGMA user_version)
+MIGRACIONES = [
+    """
+    CREATE TABLE evaluaciones (
+        id INTEGER PRIMARY KEY,
+        creada TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        actualizada TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now')),
+        nombre TEXT NOT NULL DEFAULT '',
+        fecha_nacimiento TEXT,
+        fecha_evaluacion TEXT,
+        edad_texto TEXT,
+        examinador TEXT,
+        lugar TEXT,
+        sexo TEXT,
+        dominancia TEXT,
+        lenguaje TEXT,
+        escolaridad TEXT,
+        motivo_consulta TEXT,
+        observaciones TEXT,
+        antecedentes TEXT,
+        observaciones_conductuales TEXT,   -- JSON
+        edad_meses INTEGER,
+        cit INTEGER,
+        resultado TEXT NOT NULL            -- JSON de ResultadoEvaluacion.a_tupla()
+    );
+    CREATE TABLE puntuaciones (
+        evaluacion_id INTEGER NOT NULL REFERENCES evaluaciones(id) ON DELETE CASCADE,
+        prueba TEXT NOT NULL,
+        orden INTEGER NOT NULL,
+        aplicada INTEGER NOT NULL,
+        pd INTEGER,
+        pe INTEGER,
+        PRIMARY KEY (evaluacion_id, prueba)
+    ) WITHOUT ROWID;
+    CREATE TABLE indices (
+        evaluacion_id INTEGER NOT NULL REFERENCES evaluaciones(id) ON DELETE CASCADE,
+        indice TEXT NOT NULL,
+        valor INTEGER NOT NULL,
+        PRIMARY KEY (evaluacion_id, indice)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_evaluaciones_nombre ON evaluaciones(nombre COLLATE NOCASE);
+    CREATE INDEX idx_evaluaciones_nacimiento ON evaluaciones(fecha_nacimiento);
+    CREATE INDEX idx_evaluaciones_fecha ON evaluaciones(fecha_evaluacion);
+    CREATE INDEX idx_evaluaciones_examinador ON evaluaciones(examinador);
+    """,
+    # v2: historial por paciente (nombre + fecha de nacimiento) ya ordenado por fecha;
+    # cubre también las búsquedas solo por nombre
+    """
+    CREATE INDEX idx_evaluaciones_paciente
+        ON evaluaciones(nombre COLLATE NOCASE, fecha_nacimiento, fecha_evaluacion);
+    DROP INDEX idx_evaluaciones_nombre;
+    """,
+    # v3: índice de texto completo de los campos narrativos (rowid = id de la evaluación).
+    # Las observaciones conductuales se indexan juntas en una columna; los triggers
+    # mantienen el índice en la misma transacción que la evaluación
+    """
+    CREATE VIRTUAL TABLE busqueda USING fts5(
+        motivo_consulta, observaciones, antecedentes, conductuales,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );
+    INSERT INTO busqueda(busqueda, rank) VALUES ('rank', 'bm25(2.0, 1.0, 1.0, 1.0)');
+    INSERT INTO busqueda(rowid, motivo_consulta, observaciones, antecedentes, conductuales)
+        SELECT id, motivo_consulta, observaciones, antecedentes,
+               (SELECT group_concat(value, ' ') FROM json_each(observaciones_conductuales))
+        FROM evaluaciones;
+    CREATE TRIGGER evaluaciones_busqueda_alta AFTER INSERT ON evaluaciones BEGIN
+        INSERT INTO busqueda(rowid, motivo_consulta, observaciones, antecedentes, conductuales)
+        VALUES (new.id, new.motivo_consulta, new.observaciones, new.antecedentes,
+                (SELECT group_concat(value, ' ') FROM json_each(new.observaciones_conductuales)));
+    END;
+    CREATE TRIGGER evaluaciones_busqueda_cambio
+    AFTER UPDATE OF motivo_consulta, observaciones, antecedentes, observaciones_conductuales ON evaluaciones BEGIN
+        UPDATE busqueda SET motivo_consulta = new.motivo_consulta, observaciones = new.observaciones,
+               antecedentes = new.antecedentes,
+               conductuales = (SELECT group_concat(value, ' ') FROM json_each(new.observaciones_conductuales))
+        WHERE rowid = new.id;
+    END;
+    CREATE TRIGGER evaluaciones_busqueda_baja AFTER DELETE ON evaluaciones BEGIN
+        DELETE FROM busqueda WHERE rowid = old.id;
+    END;
+    """,
+    # v4: un índice por cada orden del historial, con el id (rowid) como desempate implícito
+    # para la paginación por clave; las claves no admiten NULL para que el orden sea total.
+    # Examinador y lugar se combinan con la fecha, el orden por defecto
+    """
+    CREATE INDEX idx_evaluaciones_orden_fecha ON evaluaciones(ifnull(fecha_evaluacion, ''));
+    CREATE INDEX idx_evaluaciones_orden_nombre ON evaluaciones(nombre COLLATE NOCASE);
+    CREATE INDEX idx_evaluaciones_orden_cit ON evaluaciones(ifnull(cit, 0));
+    CREATE INDEX idx_evaluaciones_examinador_fecha ON evaluaciones(examinador, ifnull(fecha_evaluacion, ''));
+    CREATE INDEX idx_evaluaciones_lugar_fecha ON evaluaciones(lugar, ifnull(fecha_evaluacion, ''));
+    DROP INDEX idx_evaluaciones_fecha;
+    DROP INDEX idx_evaluaciones_examinador;
+    """,
+    # v5: agregados de cohorte (n, suma y suma de cuadrados) por lugar y categoría del CIT y
+    # por prueba y banda de edad, mantenidos por triggers: el panel lee unas decenas de
+    # filas sin importar el tamaño del archivo. Las puntuaciones se borran antes que su
+    # evaluación para que sus triggers todavía encuentren la edad (el borrado en cascada
+    # llega después de borrar la fila padre)
+    f"""
+    CREATE TABLE cohorte_cit (
+        lugar TEXT NOT NULL,
+        categoria TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        suma INTEGER NOT NULL,
+        suma_cuadrados INTEGER NOT NULL,
+        PRIMARY KEY (lugar, categoria)
+    ) WITHOUT ROWID;
+    CREATE TABLE cohorte_pe (
+        prueba TEXT NOT NULL,
+        banda_edad INTEGER NOT NULL,      -- edad_meses / MESES_POR_BANDA_COHORTE (-1 sin edad)
+        n INTEGER NOT NULL,
+        suma INTEGER NOT NULL,
+        suma_cuadrados INTEGER NOT NULL,
+        PRIMARY KEY (prueba, banda_edad)
+    ) WITHOUT ROWID;
+    {RECONSTRUIR_COHORTE}
+    CREATE TRIGGER evaluaciones_cohorte_alta AFTER INSERT ON evaluaciones BEGIN
+        {_sumar_cit_sql('new')}
+    END;
+    CREATE TRIGGER evaluaciones_cohorte_cambio AFTER UPDATE OF cit, lugar ON evaluaciones BEGIN
+        {_restar_cit_sql('old')}
+        {_sumar_cit_sql('new')}
+    END;
+    CREATE TRIGGER evaluaciones_cohorte_edad AFTER UPDATE OF edad_meses ON evaluaciones
+    WHEN {_banda_sql('old.edad_meses')} != {_banda_sql('new.edad_meses')} BEGIN
+        UPDATE cohorte_pe SET
+            n = n - 1,
+            suma = suma - (SELECT pe FROM puntuaciones WHERE evaluacion_id = new.id AND prueba = cohorte_pe.prueba),
+            suma_cuadrados = suma_cuadrados - (SELECT pe * pe FROM puntuaciones
+                                               WHERE evaluacion_id = new.id AND prueba = cohorte_pe.prueba)
+        WHERE banda_edad = {_banda_sql('old.edad_meses')}
+          AND prueba IN (SELECT prueba FROM puntuaciones WHERE evaluacion_id = new.id AND pe IS NOT NULL);
+        {_sumar_pe_sql('FROM puntuaciones p WHERE p.evaluacion_id = new.id', 'new.edad_meses')}
+    END;
+    CREATE TRIGGER evaluaciones_cohorte_baja BEFORE DELETE ON evaluaciones BEGIN
+        DELETE FROM puntuaciones WHERE evaluacion_id = old.id;
+        {_restar_cit_sql('old')}
+    END;
+    CREATE TRIGGER puntuaciones_cohorte_alta AFTER INSERT ON puntuaciones WHEN new.pe IS NOT NULL BEGIN
+        {_sumar_pe_sql('FROM (SELECT new.prueba AS prueba, new.pe AS pe) p, evaluaciones e WHERE e.id = new.evaluacion_id',
+                       'e.edad_meses')}
+    END;
+    CREATE TRIGGER puntuaciones_cohorte_baja AFTER DELETE ON puntuaciones WHEN old.pe IS NOT NULL BEGIN
+        {_restar_pe_sql('old.prueba', 'old.pe',
+                        '(SELECT edad_meses FROM evaluaciones WHERE id = old.evaluacion_id)')}
+    END;
+    CREATE TRIGGER puntuaciones_cohorte_cambio AFTER UPDATE OF prueba, pe, evaluacion_id ON puntuaciones BEGIN
+        {_restar_pe_sql('old.prueba', 'old.pe',
+                        '(SELECT edad_meses FROM evaluaciones WHERE id = old.evaluacion_id)')}
+        {_sumar_pe_sql('FROM (SELECT new.prueba AS prueba, new.pe AS pe) p, evaluaciones e WHERE e.id = new.evaluacion_id',
+                       'e.edad_meses')}
+    END;
+    """,
+    # v6: normas locales. Cuántas evaluaciones obtuvieron cada valor de cada PE y compuesto por
+    # banda de edad: las puntuaciones son enteros de rango corto, así que el histograma exacto
+    # ocupa menos que un resumen aproximado de cuantiles y admite bajas. Los índices también
+    # se borran antes que su evaluación, como las puntuaciones en v5
+    f"""
+    CREATE TABLE normas_locales (
+        medida TEXT NOT NULL,             -- prueba o compuesto
+        banda_edad INTEGER NOT NULL,      -- como en cohorte_pe
+        valor INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (medida, banda_edad, valor)
+    ) WITHOUT ROWID;
+    {RECONSTRUIR_NORMAS_LOCALES}
+    CREATE TRIGGER evaluaciones_normas_edad AFTER UPDATE OF edad_meses ON evaluaciones
+    WHEN {_banda_sql('old.edad_meses')} != {_banda_sql('new.edad_meses')} BEGIN
+        UPDATE normas_locales SET n = n - 1
+        WHERE banda_edad = {_banda_sql('old.edad_meses')}
+          AND (medida, valor) IN ({_MEDIDAS_EVALUACION.format(id='new.id')});
+        {_sumar_norma_sql(f"FROM ({_MEDIDAS_EVALUACION.format(id='new.id')}) m WHERE 1", 'new.edad_meses')}
+    END;
+    CREATE TRIGGER evaluaciones_normas_baja BEFORE DELETE ON evaluaciones BEGIN
+        DELETE FROM indices WHERE evaluacion_id = old.id;
+    END;
+    CREATE TRIGGER puntuaciones_normas_alta AFTER INSERT ON puntuaciones WHEN new.pe IS NOT NULL BEGIN
+        {_sumar_norma_sql('FROM (SELECT new.prueba AS medida, new.pe AS valor) m, evaluaciones e '
+                          'WHERE e.id = new.evaluacion_id', 'e.edad_meses')}
+    END;
+    CREATE TRIGGER puntuaciones_normas_baja AFTER DELETE ON puntuaciones WHEN old.pe IS NOT NULL BEGIN
+        {_restar_norma_sql('old.prueba', 'old.pe', '(SELECT edad_meses FROM evaluaciones WHERE id = old.evaluacion_id)')}
+    END;
+    CREATE TRIGGER puntuaciones_normas_cambio AFTER UPDATE OF prueba, pe, evaluacion_id ON puntuaciones BEGIN
+        {_restar_norma_sql('old.prueba', 'old.pe', '(SELECT edad_meses FROM evaluaciones WHERE id = old.evaluacion_id)')}
+        {_sumar_norma_sql('FROM (SELECT new.prueba AS medida, new.pe AS valor) m, evaluaciones e '
+                          'WHERE e.id = new.evaluacion_id', 'e.edad_meses')}
+    END;
+    CREATE TRIGGER indices_normas_alta AFTER INSERT ON indices BEGIN
+        {_sumar_norma_sql('FROM (SELECT new.indice AS medida, new.valor AS valor) m, evaluaciones e '
+                          'WHERE e.id = new.evaluacion_id', 'e.edad_meses')}
+    END;
+    CREATE TRIGGER indices_normas_baja AFTER DELETE ON indices BEGIN
+        {_restar_norma_sql('old.indice', 'old.valor', '(SELECT edad_meses FROM evaluaciones WHERE id = old.evaluacion_id)')}
+    END;
+    CREATE TRIGGER indices_normas_cambio AFTER UPDATE OF indice, valor, evaluacion_id ON indices BEGIN
+        {_restar_norma_sql('old.indice', 'old.valor', '(SELECT edad_meses FROM evaluaciones WHERE id = old.evaluacion_id)')}
+        {_sumar_norma_sql('FROM (SELECT new.indice AS medida, new.valor AS valor) m, evaluaciones e '
+                          'WHERE e.id = new.evaluacion_id', 'e.edad_meses')}
+    END;
+    """,
+]
+
+# Órdenes del historial: expresión de la clave (la misma que su índice) y sentido
+ORDENES_HISTORIAL = {
+    'fecha_evaluacion': ("ifnull(fecha_evaluacion, '')", 'DESC'),
+    'nombre': ('nombre COLLATE NOCASE', 'ASC'),
+    'cit': ('ifnull(cit, 0)', 'DESC'),
+}
+COLUMNAS_HISTORIAL = 'id, nombre, fecha_nacimiento, fecha_evaluacion, examinador, lugar, cit'
+
+
+class PoolConexiones:
+    """
+    Pool de conexiones SQLite reutilizables entre hilos. Cada hilo toma una
+    conexión propia mientras la usa; si todas están ocupadas se espera hasta
+    `espera` segundos
+    """
+
+    def __init__(self, ruta, max_conexiones: int = 8, espera: float = 30.0):
+        self.ruta = str(ruta)
+        self.espera = espera
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(max_conexiones)
+        self._abiertas: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _abrir(self) -> sqlite3.Connection:
+        # isolation_level=None: las transacciones se abren explícitamente
+        con = sqlite3.connect(self.ruta, timeout=self.espera, isolation_level=None, check_same_thread=False)
+        con.row_factory = sqlite3.Row
+        con.execute('PRAGMA journal_mode=WAL')
+        con.execute('PRAGMA synchronous=NORMAL')
+        con.execute('PRAGMA foreign_keys=ON')
+        with self._lock:
+            self._abiertas.append(con)
+        return con
+
+    @contextmanager
+    def conexion(self) -> Iterator[sqlite3.Connection]:
+        if not self._cupos.acquire(timeout=self.espera):
+            raise TimeoutError(f"{self.ruta}: no hay conexiones libres tras {self.espera} s")
+        try:
+            try:
+                con = self._libres.get_nowait()
+            except queue.Empty:
+                con = self._abrir()
+            try:
+                yield con
+            finally:
+                if con.in_transaction:
+                    con.rollback()
+                self._libres.put(con)
+        finally:
+            self._cupos.release()
+
+    @contextmanager
+    def transaccion(self) -> Iterator[sqlite3.Connection]:
+        """Transacción de escritura: toma el bloqueo de escritura al empezar"""
+        with self.conexion() as con:
+            con.execute('BEGIN IMMEDIATE')
+            try:
+                yield con
+            except BaseException:
+                con.execute('ROLLBACK')
+                raise
+            con.execute('COMMIT')
+
+    def cerrar(self):
+        with self._lock:
+            for con in self._abiertas:
+                con.close()
+            self._abiertas.clear()
+        while not self._libres.empty():
+            self._libres.get_nowait()
+
+
+def _sentencias(script: str) -> Iterator[str]:
+    """Divide un script en sentencias completas (executescript haría COMMIT por su cuenta)"""
+    pendiente = ''
+    for linea in script.splitlines(keepends=True):
+        pendiente += linea
+        if sqlite3.complete_statement(pendiente):
+            yield pendiente.strip()
+            pendiente = ''
+    if pendiente.strip():
+        yield pendiente.strip()
+
+def _fecha_texto(valor) -> Optional[str]:
+    """Fechas como 'AAAA-MM-DD' (acepta date o str; 'None' y '' se guardan como NULL)"""
+    if valor in (None, '', 'None'):
+        return None
+    return str(valor)
+
+
+def _estadisticas(n: int, suma: int, suma_cuadrados: int) -> Tuple[Optional[float], Optional[float]]:
+    """Media y desviación típica muestral a partir de los agregados"""
+    if n <= 0:
+        return None, None
+    media = suma / n
+    if n == 1:
+        return media, None
+    return media, max(suma_cuadrados - n * media * media, 0.0) ** 0.5 / (n - 1) ** 0.5
+
+def etiqueta_banda_edad(banda: int) -> str:
+    """Banda de cohorte como 'años:meses-años:meses' ('Sin edad' para -1)"""
+    if banda < 0:
+        return 'Sin edad'
+    inicio = banda * MESES_POR_BANDA_COHORTE
+    fin = inicio + MESES_POR_BANDA_COHORTE - 1
+    return f"{inicio // 12}:{inicio % 12}-{fin // 12}:{fin % 12}"
+
+
+def _condiciones(nombre: Optional[str] = None, examinador: Optional[str] = None, lugar: Optional[str] = None,
+                 desde=None, hasta=None, cit_min: Optional[int] = None,
+                 cit_max: Optional[int] = None) -> Tuple[List[str], List]:
+    """Filtros del historial escritos sobre las mismas expresiones que los índices"""
+    condiciones, parametros = [], []
+    if nombre:
+        condiciones.append('nombre = ? COLLATE NOCASE')
+        parametros.append(nombre)
+    if examinador:
+        condiciones.append('examinador = ?')
+        parametros.append(examinador)
+    if lugar:
+        condiciones.append('lugar = ?')
+        parametros.append(lugar)
+    if desde or hasta:
+        # '' (sin fecha) queda fuera de cualquier rango
+        condiciones.append("ifnull(fecha_evaluacion, '') BETWEEN ? AND ?")
+        parametros += [_fecha_texto(desde) or '0', _fecha_texto(hasta) or '9']
+    if cit_min is not None or cit_max is not None:
+        condiciones.append('ifnull(cit, 0) BETWEEN ? AND ?')
+        parametros += [max(cit_min or 1, 1), cit_max if cit_max is not None else 999]
+    return condiciones, parametros
+
+
+_TERMINO_BUSQUEDA = re.compile(r'"([^"]*)"|([\w-]+)(\*?)')
+
+def _consulta_fts(texto: str) -> Optional[str]:
+    """
+    Traduce el texto del usuario a una consulta FTS5 segura: cada palabra busca
+    también sus continuaciones (prematur -> prematuro, prematuros) y el texto entre
+    comillas se busca como frase. Todos los términos deben aparecer
+    """
+    terminos = []
+    for frase, palabra, _ in _TERMINO_BUSQUEDA.findall(texto or ''):
+        if frase.strip():
+            terminos.append('"%s"' % frase.strip())
+        elif palabra.strip('-'):
+            terminos.append('"%s"*' % palabra.strip('-'))
+    return ' '.join(terminos) or None
+
+
+class AlmacenEvaluaciones:
+    """Guarda, recupera y lista evaluaciones completas"""
+
+    def __init__(self, ruta=None, max_conexiones: int = 8):
+        self.ruta = Path(ruta or os.environ.get('WPPSI_BASE_DATOS', RUTA_POR_DEFECTO))
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.pool = PoolConexiones(self.ruta, max_conexiones)
+        self._migrar()
+        self._indice_pe = None
+        self._lock_indice = threading.Lock()
+
+    def _migrar(self):
+        with self.pool.transaccion() as con:
+            version = con.execute('PRAGMA user_version').fetchone()[0]
+            for numero, script in enumerate(MIGRACIONES[version:], start=version + 1):
+                for sentencia in _sentencias(script):
+                    con.execute(sentencia)
+                con.execute(f'PRAGMA user_version = {numero}')
+
+    def guardar(self, datos_personales: Dict, pruebas_aplicadas: Dict, pd_dict: Dict,
+                resultado: ResultadoEvaluacion, observaciones_conductuales: Optional[Dict] = None,
+                evaluacion_id: Optional[int] = None) -> int:
+        """
+        Guarda una evaluación en una sola transacción
+
+        Args:
+            evaluacion_id: Si se indica y es del mismo paciente (nombre y fecha de nacimiento),
+                reemplaza esa evaluación; si no, se crea otra
+
+        Returns:
+            id de la evaluación
+        """
+        fila = {campo: datos_personales.get(campo) for campo in CAMPOS_PERSONALES}
+        fila['nombre'] = fila['nombre'] or ''
+        fila['fecha_nacimiento'] = _fecha_texto(fila['fecha_nacimiento'])
+        fila['fecha_evaluacion'] = _fecha_texto(fila['fecha_evaluacion'])
+        fila['observaciones_conductuales'] = json.dumps(observaciones_conductuales or {}, ensure_ascii=False)
+        fila['edad_meses'] = resultado.edad_meses
+        fila['cit'] = resultado.cit
+        fila['resultado'] = json.dumps(resultado.a_tupla())
+        columnas = tuple(fila)
+
+        indice = self._abrir_indice_pe()
+        with self.pool.transaccion() as con:
+            previo = con.execute('SELECT count(*), max(actualizada) FROM evaluaciones').fetchone()
+            if evaluacion_id is not None and con.execute(
+                    'SELECT 1 FROM evaluaciones WHERE id = ? AND nombre = ? COLLATE NOCASE '
+                    'AND fecha_nacimiento IS ?',
+                    (evaluacion_id, fila['nombre'], fila['fecha_nacimiento'])).fetchone():
+                asignaciones = ', '.join(f'{c} = :{c}' for c in columnas)
+                con.execute(f"UPDATE evaluaciones SET {asignaciones}, "
+                            f"actualizada = strftime('%Y-%m-%dT%H:%M:%f', 'now') WHERE id = :id",
+                            {**fila, 'id': evaluacion_id})
+                con.execute('DELETE FROM puntuaciones WHERE evaluacion_id = ?', (evaluacion_id,))
+                con.execute('DELETE FROM indices WHERE evaluacion_id = ?', (evaluacion_id,))
+            else:
+                cursor = con.execute(f"INSERT INTO evaluaciones ({', '.join(columnas)}) "
+                                     f"VALUES ({', '.join(':' + c for c in columnas)})", fila)
+                evaluacion_id = cursor.lastrowid
+
+            pe_dict = resultado.pe
+            pruebas = list(pruebas_aplicadas) + [p for p in pd_dict if p not in pruebas_aplicadas]
+            con.executemany(
+                'INSERT INTO puntuaciones (evaluacion_id, prueba, orden, aplicada, pd, pe) VALUES (?, ?, ?, ?, ?, ?)',
+                [(evaluacion_id, prueba, orden, int(bool(pruebas_aplicadas.get(prueba))),
+                  pd_dict.get(prueba), pe_dict.get(prueba)) for orden, prueba in enumerate(pruebas)]
+            )
+            con.executemany(
+                'INSERT INTO indices (evaluacion_id, indice, valor) VALUES (?, ?, ?)',
+                [(evaluacion_id, indice, valor) for indice, valor in resultado.compuestos() if valor is not None]
+            )
+            # Dentro de la transacción: el bloqueo de escritura ordena las altas del índice
+            actualizada = con.execute('SELECT actualizada FROM evaluaciones WHERE id = ?',
+                                      (evaluacion_id,)).fetchone()[0]
+            self._al_indice_pe(indice, previo, lambda indice: indice.agregar(evaluacion_id, resultado, actualizada))
+        return evaluacion_id
+
+    def obtener(self, evaluacion_id: int) -> Optional[Dict]:
+        """Evaluación completa (None si no existe)"""
+        with self.pool.conexion() as con:
+            fila = con.execute('SELECT * FROM evaluaciones WHERE id = ?', (evaluacion_id,)).fetchone()
+            if fila is None:
+                return None
+            puntuaciones = con.execute(
+                'SELECT prueba, aplicada, pd FROM puntuaciones WHERE evaluacion_id = ? ORDER BY orden',
+                (evaluacion_id,)).fetchall()
+
+        return {
+            'id': fila['id'],
+            'creada': fila['creada'],
+            'actualizada': fila['actualizada'],
+            'datos_personales': {campo: fila[campo] for campo in CAMPOS_PERSONALES},
+            'pruebas_aplicadas': {p['prueba']: bool(p['aplicada']) for p in puntuaciones},
+            'pd_dict': {p['prueba']: p['pd'] for p in puntuaciones if p['pd'] is not None},
+            'observaciones_conductuales': json.loads(fila['observaciones_conductuales'] or '{}'),
+            'resultado': ResultadoEvaluacion.desde_tupla(json.loads(fila['resultado'])),
+        }
+
+    def listar(self, nombre: Optional[str] = None, examinador: Optional[str] = None,
+               desde: Optional[str] = None, hasta: Optional[str] = None, limite: int = 50) -> List[Dict]:
+        """Resumen de evaluaciones (más recientes primero) con filtros opcionales"""
+        return self.pagina(limite=limite, nombre=nombre, examinador=examinador, desde=desde, hasta=hasta)[0]
+
+    def pagina(self, orden: str = 'fecha_evaluacion', despues: Optional[Tuple] = None,
+               limite: int = 25, **filtros) -> Tuple[List[Dict], Optional[Tuple]]:
+        """
+        Una página del historial con paginación por clave: cuesta lo mismo la
+        primera página que la milésima
+
+        Args:
+            orden: Clave de ORDENES_HISTORIAL
+            despues: Cursor devuelto por la página anterior (None para la primera)
+            filtros: nombre, examinador, lugar, desde, hasta, cit_min, cit_max
+
+        Returns:
+            (filas, cursor de la página siguiente o None si es la última)
+        """
+        clave, sentido = ORDENES_HISTORIAL[orden]
+        condiciones, parametros = _condiciones(**filtros)
+        if despues is not None:
+            # Equivale a (clave, id) < cursor, pero así SQLite busca en el índice en vez de recorrerlo
+            comparacion = '<' if sentido == 'DESC' else '>'
+            condiciones.append(f'{clave} {comparacion}= ? AND ({clave} {comparacion} ? OR id {comparacion} ?)')
+            parametros += [despues[0], despues[0], despues[1]]
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+
+        with self.pool.conexion() as con:
+            filas = con.execute(
+                f'SELECT {COLUMNAS_HISTORIAL}, {clave} AS clave FROM evaluaciones {where} '
+                f'ORDER BY {clave} {sentido}, id {sentido} LIMIT ?', (*parametros, limite + 1)).fetchall()
+
+        filas = [dict(f) for f in filas]
+        siguiente = None
+        if len(filas) > limite:
+            del filas[limite:]
+            siguiente = (filas[-1]['clave'], filas[-1]['id'])
+        for fila in filas:
+            del fila['clave']
+        return filas, siguiente
+
+    def contar(self, **filtros) -> int:
+        """Número de evaluaciones que cumplen los filtros de pagina()"""
+        condiciones, parametros = _condiciones(**filtros)
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        with self.pool.conexion() as con:
+            return con.execute(f'SELECT count(*) FROM evaluaciones {where}', parametros).fetchone()[0]
+
+    def valores_distintos(self, campo: str) -> List[str]:
+        """Examinadores o lugares registrados (para los filtros del historial)"""
+        if campo not in ('examinador', 'lugar'):
+            raise ValueError(f"Campo sin índice para valores distintos: {campo}")
+        with self.pool.conexion() as con:
+            return [f[0] for f in con.execute(
+                f"SELECT DISTINCT {campo} FROM evaluaciones WHERE {campo} IS NOT NULL AND {campo} != '' "
+                f"ORDER BY {campo}")]
+
+    def buscar(self, texto: str, limite: int = 20, desplazamiento: int = 0) -> Tuple[List[Dict], int]:
+        """
+        Búsqueda de texto completo en motivo de consulta, observaciones, antecedentes
+        y observaciones conductuales, ordenada por relevancia (BM25, el motivo pesa doble)
+
+        Returns:
+            (página de resultados con un fragmento resaltado con **, total de coincidencias)
+        """
+        consulta = _consulta_fts(texto)
+        if consulta is None:
+            return [], 0
+        with self.pool.conexion() as con:
+            total = con.execute('SELECT count(*) FROM busqueda WHERE busqueda MATCH ?', (consulta,)).fetchone()[0]
+            filas = con.execute(
+                """
+                SELECT e.id, e.nombre, e.fecha_nacimiento, e.fecha_evaluacion, e.examinador, e.cit,
+                       snippet(busqueda, -1, '**', '**', '…', 16) AS fragmento
+                FROM busqueda JOIN evaluaciones e ON e.id = busqueda.rowid
+                WHERE busqueda MATCH ?
+                ORDER BY busqueda.rank
+                LIMIT ? OFFSET ?
+                """, (consulta, limite, desplazamiento)).fetchall()
+        return [dict(f) for f in filas], total
+
+    def resumen_cohorte(self) -> Dict:
+        """
+        Estadísticas del archivo completo leídas de los agregados (coste constante)
+
+        Returns:
+            {'total': {...}, 'por_lugar': {lugar ('' sin lugar): {...}}, 'pe_por_edad': [...]}, donde cada
+            resumen de CIT es {'n', 'con_cit', 'media_cit', 'de_cit', 'categorias': {categoría: n}}
+            y cada fila de PE es {'prueba', 'banda_edad', 'n', 'media', 'de'}
+        """
+        with self.pool.conexion() as con:
+            filas_cit = con.execute('SELECT lugar, categoria, n, suma, suma_cuadrados FROM cohorte_cit '
+                                    'WHERE n > 0').fetchall()
+            filas_pe = con.execute('SELECT prueba, banda_edad, n, suma, suma_cuadrados FROM cohorte_pe '
+                                   'WHERE n > 0 ORDER BY banda_edad, prueba').fetchall()
+
+        acumulados = {}
+        for lugar, categoria, n, suma, suma_cuadrados in filas_cit:
+            for clave in (None, lugar):
+                acumulado = acumulados.setdefault(clave, {'categorias': dict.fromkeys(CATEGORIAS_CIT + (SIN_CIT,), 0),
+                                                          'sumas': [0, 0, 0]})
+                acumulado['categorias'][categoria] += n
+                if categoria != SIN_CIT:
+                    acumulado['sumas'][0] += n
+                    acumulado['sumas'][1] += suma
+                    acumulado['sumas'][2] += suma_cuadrados
+
+        def resumen(acumulado: Dict) -> Dict:
+            media, de = _estadisticas(*acumulado['sumas'])
+            return {'n': sum(acumulado['categorias'].values()), 'con_cit': acumulado['sumas'][0],
+                    'media_cit': media, 'de_cit': de, 'categorias': acumulado['categorias']}
+
+        vacio = {'categorias': dict.fromkeys(CATEGORIAS_CIT + (SIN_CIT,), 0), 'sumas': [0, 0, 0]}
+        return {
+            'total': resumen(acumulados.pop(None, vacio)),
+            'por_lugar': {lugar: resumen(acumulado) for lugar, acumulado in sorted(acumulados.items())},
+            'pe_por_edad': [dict(zip(('prueba', 'banda_edad', 'n', 'media', 'de'),
+                                     (prueba, banda, n, *_estadisticas(n, suma, suma_cuadrados))))
+                            for prueba, banda, n, suma, suma_cuadrados in filas_pe],
+        }
+
+    def reconstruir_cohorte(self):
+        """
+        Recalcula los agregados de cohorte y las normas locales desde las evaluaciones
+        (p. ej. tras editar la base a mano)
+        """
+        with self.pool.transaccion() as con:
+            for sentencia in _sentencias(RECONSTRUIR_COHORTE + RECONSTRUIR_NORMAS_LOCALES):
+                con.execute(sentencia)
+
+    def percentiles_locales(self, resultado: ResultadoEvaluacion,
+                            evaluacion_id: Optional[int] = None) -> Dict[str, Tuple[float, int]]:
+        """
+        Percentil de cada PE y compuesto de `resultado` entre las evaluaciones guardadas de
+        su misma banda de edad (rango medio: los empates cuentan la mitad)
+
+        Args:
+            evaluacion_id: Evaluación guardada de `resultado`; su propio aporte a las normas
+                se descuenta para no compararla consigo misma
+
+        Returns:
+            {medida: (percentil, n de la banda sin la propia evaluación)}; las medidas sin
+            ninguna otra referencia no aparecen
+        """
+        medidas = [(prueba, pe) for prueba, pe in resultado.pe.items() if pe is not None]
+        medidas += [(indice, valor) for indice, valor in resultado.compuestos() if valor is not None]
+        if not medidas:
+            return {}
+        banda = -1 if resultado.edad_meses is None else resultado.edad_meses // MESES_POR_BANDA_COHORTE
+        with self.pool.conexion() as con:
+            filas = con.execute(f"""
+                WITH consulta(medida, valor) AS (
+                    VALUES {', '.join(f'(?{2 * i + 3}, ?{2 * i + 4})' for i in range(len(medidas)))}
+                ),
+                propia(medida, valor) AS (
+                    SELECT medida, valor FROM ({_MEDIDAS_EVALUACION.format(id='?1')})
+                    WHERE (SELECT {_banda_sql('edad_meses')} FROM evaluaciones WHERE id = ?1) = ?2
+                ),
+                histograma(medida, debajo, n) AS (
+                    SELECT c.medida, sum(CASE WHEN nl.valor < c.valor THEN nl.n
+                                              WHEN nl.valor = c.valor THEN nl.n / 2.0 ELSE 0 END),
+                           sum(nl.n)
+                    FROM consulta c JOIN normas_locales nl ON nl.medida = c.medida AND nl.banda_edad = ?2
+                    GROUP BY c.medida
+                )
+                SELECT * FROM (
+                    SELECT h.medida,
+                           h.debajo - ifnull((SELECT sum(CASE WHEN p.valor < c.valor THEN 1
+                                                              WHEN p.valor = c.valor THEN 0.5 ELSE 0 END)
+                                              FROM propia p JOIN consulta c USING (medida)
+                                              WHERE p.medida = h.medida), 0) AS debajo,
+                           h.n - (SELECT count(*) FROM propia p WHERE p.medida = h.medida) AS n
+                    FROM histograma h
+                ) WHERE n > 0
+                """, [evaluacion_id, banda] + [v for medida in medidas for v in medida]).fetchall()
+        return {medida: (round(100 * debajo / n, 1), n) for medida, debajo, n in filas}
+
+    def trayectoria(self, nombre: str, fecha_nacimiento) -> List[Tuple]:
+        """
+        PE y compuestos de todas las evaluaciones de un paciente en una sola consulta
+
+        Returns:
+            Filas (evaluacion_id, fecha_evaluacion, edad_meses, es_compuesto, medida, valor)
+            en orden cronológico
+        """
+        with self.pool.conexion() as con:
+            return [tuple(f) for f in con.execute(
+                """
+                WITH ev AS (
+                    SELECT id, fecha_evaluacion, edad_meses FROM evaluaciones
+                    WHERE nombre = ? COLLATE NOCASE AND fecha_nacimiento IS ?
+                )
+                SELECT ev.id, ev.fecha_evaluacion, ev.edad_meses, 0, p.prueba, p.pe
+                FROM ev JOIN puntuaciones p ON p.evaluacion_id = ev.id
+                WHERE p.pe IS NOT NULL
+                UNION ALL
+                SELECT ev.id, ev.fecha_evaluacion, ev.edad_meses, 1, i.indice, i.valor
+                FROM ev JOIN indices i ON i.evaluacion_id = ev.id
+                ORDER BY 2, 1
+                """, (nombre, _fecha_texto(fecha_nacimiento))).fetchall()]
+
+    def eliminar(self, evaluacion_id: int) -> bool:
+        indice = self._abrir_indice_pe()
+        with self.pool.transaccion() as con:
+            previo = con.execute('SELECT count(*), max(actualizada) FROM evaluaciones').fetchone()
+            if not con.execute('DELETE FROM evaluaciones WHERE id = ?', (evaluacion_id,)).rowcount:
+                return False
+            actualizada = con.execute('SELECT max(actualizada) FROM evaluaciones').fetchone()[0]
+            self._al_indice_pe(indice, previo, lambda indice: indice.quitar(evaluacion_id, actualizada))
+            return True
+
+    def similares(self, resultado: ResultadoEvaluacion, k: int = 10, excluir: Tuple[int, ...] = (),
+                  metrica: str = 'euclidea') -> List[Dict]:
+        """
+        Las k evaluaciones guardadas con el perfil de PE más parecido (ver wppsi.similares)
+
+        Returns:
+            Resumen de cada una con 'distancia', 'pruebas_comunes' y su 'resultado'
+        """
+        from .similares import buscar_similares
+        vecinos = buscar_similares(self.indice_pe().vista(), resultado.pe, k=k, excluir=excluir, metrica=metrica)
+        if not vecinos:
+            return []
+        with self.pool.conexion() as con:
+            filas = {f['id']: f for f in con.execute(
+                f"SELECT {COLUMNAS_HISTORIAL}, resultado FROM evaluaciones "
+                f"WHERE id IN ({', '.join('?' * len(vecinos))})", [v[0] for v in vecinos])}
+        return [{**{c: filas[eid][c] for c in filas[eid].keys() if c != 'resultado'},
+                 'distancia': distancia, 'pruebas_comunes': comunes,
+                 'resultado': ResultadoEvaluacion.desde_tupla(json.loads(filas[eid]['resultado']))}
+                for eid, distancia, comunes in vecinos if eid in filas]
+
+    # ───────────── Índice columnar de PE ─────────────
+
+    def indice_pe(self) -> 'IndicePE':
+        """
+        Índice columnar de PE del almacén (directorio '<base>.pe' junto a la base),
+        reconstruido al abrirlo si no coincide con la base o si se desfasó al escribirlo
+        """
+        with self._lock_indice:
+            if self._indice_pe is None or self._indice_pe.desfasado:
+                from .indice_pe import IndicePE
+                indice = IndicePE(self.ruta.with_suffix('.pe'))
+                with self.pool.conexion() as con:
+                    activas, actualizada = con.execute(
+                        'SELECT count(*), max(actualizada) FROM evaluaciones').fetchone()
+                if not indice.sincronizado(activas, actualizada):
+                    self._reconstruir_indice_pe(indice)
+                self._indice_pe = indice
+            return self._indice_pe
+
+    def reconstruir_indice_pe(self) -> 'IndicePE':
+        """Vuelve a generar el índice columnar completo desde la base"""
+        indice = self.indice_pe()
+        with self._lock_indice:
+            self._reconstruir_indice_pe(indice)
+        return indice
+
+    def _reconstruir_indice_pe(self, indice: 'IndicePE'):
+        # Con el bloqueo de escritura: las lecturas ven la misma versión de la base y
+        # ningún otro proceso escribe el índice mientras se reemplazan sus archivos
+        with self.pool.transaccion() as con:
+            evaluaciones = con.execute('SELECT id, edad_meses FROM evaluaciones ORDER BY id').fetchall()
+            puntuaciones = con.execute('SELECT evaluacion_id, prueba, pe FROM puntuaciones '
+                                       'WHERE pe IS NOT NULL').fetchall()
+            compuestos = con.execute('SELECT evaluacion_id, indice, valor FROM indices').fetchall()
+            actualizada = con.execute('SELECT max(actualizada) FROM evaluaciones').fetchone()[0]
+            indice.reconstruir(evaluaciones, puntuaciones, compuestos, actualizada)
+
+    def _abrir_indice_pe(self) -> Optional['IndicePE']:
+        """
+        indice_pe() antes de entrar en la transacción de escritura: abrirlo o
+        reconstruirlo toma su propia conexión del pool. None si no se puede abrir
+        """
+        try:
+            return self.indice_pe()
+        except (OSError, ValueError):
+            return None
+
+    def _al_indice_pe(self, indice: Optional['IndicePE'], previo: Tuple, operacion):
+        """
+        Aplica una alta o baja al índice columnar dentro de la transacción de
+        escritura, que también ordena a los demás procesos con la misma base.
+        Antes se vuelve a leer la cabecera, que debe reflejar la base previa
+        (`previo`: activas y última 'actualizada'); si otro proceso dejó el índice
+        desfasado no se escribe. El índice es derivado: si falla, la evaluación se
+        guarda igual y el índice se reconstruye la próxima vez que se pida
+        """
+        if indice is None:
+            return
+        try:
+            indice.recargar()
+            if not indice.sincronizado(*previo):
+                raise ValueError(f"{indice.directorio}: índice desfasado respecto de la base")
+            operacion(indice)
+        except (OSError, ValueError):
+            indice.desfasado = True   # Sin _lock_indice: quien lo tenga puede estar esperando esta transacción
+
+    def cerrar(self):
+        self.pool.cerrar()
+
+
+_almacen = None
+_lock_almacen = threading.Lock()
+
+def obtener_almacen() -> AlmacenEvaluaciones:
+    """Almacén del proceso, abierto una sola vez (ruta configurable con WPPSI_BASE_DATOS)"""
+    global _almacen
+    if _almacen is None:
+        with _lock_almacen:
+            if _almacen is None:
+                _almacen = AlmacenEvaluaciones()
+    return _almacen
@@ -0,0 +1,669 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+BAREMOS WPPSI-IV Y MOTORES DE CONVERSIÓN COMPILADOS
+Tablas oficiales PD -> PE y Suma PE -> Índice, más sus versiones densas
+═══════════════════════════════════════════════════════════════════════════════
+Este módulo solo depende de la biblioteca estándar al importarse. Las tablas
+densas se guardan como tuplas para la ruta de un solo caso; NumPy se importa
+de forma diferida la primera vez que se usa una conversión por lotes.
+"""
+
+import math
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, List, Tuple, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd_lib
+
+
+def _cdf_normal(z: float) -> float:
+    """Función de distribución normal estándar (equivalente a scipy.stats.norm.cdf)"""
+    return 0.5 * math.erfc(-z / math.sqrt(2))
+
+
+INDICES_PRIMARIOS = ('ICV', 'IVE', 'IRF', 'IMT', 'IVP')
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLASE DE BAREMOS WPPSI-IV ULTRA COMPLETA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class BaremosWPPSIUltra:
+    """
+    Clase que contiene TODOS los baremos oficiales del WPPSI-IV
+    Basado en el manual técnico oficial de Pearson
+    Incluye baremos para edad 4:0-7:7 años
+    """
+    
+    # Tablas de conversión PD a PE (Puntuación Directa a Puntuación Escalar)
+    TABLAS_CONVERSION_PD_PE = {
+        'cubos': {
+            0:1, 1:1, 2:1, 3:1, 4:1, 5:2, 6:3, 7:4, 8:5, 9:6, 10:7, 11:8, 12:9,
+            13:10, 14:11, 15:12, 16:13, 17:14, 18:15, 19:16, 20:16, 21:17, 22:17,
+            23:18, 24:18, 25:19, 26:19, 27:19, 28:19, 29:19, 30:19
+        },
+        'informacion': {
+            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
+            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:17, 20:17, 21:18, 22:18,
+            23:19, 24:19, 25:19, 26:19
+        },
+        'matrices': {
+            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
+            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
+        },
+        'busqueda_animales': {
+            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
+            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:17, 20:18, 21:19
+        },
+        'reconocimiento': {
+            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
+            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:17, 20:18
+        },
+        'semejanzas': {
+            0:1, 1:1, 2:1, 3:1, 4:2, 5:3, 6:4, 7:5, 8:6, 9:7, 10:8, 11:9, 12:10,
+            13:11, 14:12, 15:13, 16:14, 17:15, 18:16, 19:16, 20:17, 21:17, 22:18,
+            23:18, 24:19, 25:19, 26:19, 27:19, 28:19, 29:19, 30:19
+        },
+        'conceptos': {
+            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
+            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
+        },
+        'localizacion': {
+            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
+            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
+        },
+        'cancelacion': {
+            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
+            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19, 21:19
+        },
+        'rompecabezas': {
+            0:1, 1:1, 2:1, 3:2, 4:3, 5:4, 6:5, 7:6, 8:7, 9:8, 10:9, 11:10, 12:11,
+            13:12, 14:13, 15:14, 16:15, 17:16, 18:17, 19:18, 20:19
+        },
+        'vocabulario': {
+            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
+            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
+        },
+        'nombres': {
+            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
+            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
+        },
+        'clave_figuras': {
+            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
+            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
+        },
+        'comprension': {
+            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
+            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
+        },
+        'dibujos': {
+            0:1, 1:1, 2:2, 3:3, 4:4, 5:5, 6:6, 7:7, 8:8, 9:9, 10:10, 11:11, 12:12,
+            13:13, 14:14, 15:15, 16:16, 17:17, 18:18, 19:19
+        }
+    }
+    
+    # Información detallada de cada prueba
+    PRUEBAS_INFO = {
+        'cubos': {
+            'nombre': 'Cubos',
+            'nombre_corto': 'C',
+            'indice_primario': 'IVE',
+            'descripcion': 'Razonamiento visoespacial y construcción',
+            'que_mide': 'Análisis y síntesis visoespacial, coordinación visomotora',
+            'icono': '🧩',
+            'rango_pd': (0, 30),
+            'complementaria': False,
+            'habilidades': ['Percepción visual', 'Organización perceptiva', 'Coordinación motora fina']
+        },
+        'informacion': {
+            'nombre': 'Información',
+            'nombre_corto': 'I',
+            'indice_primario': 'ICV',
+            'descripcion': 'Conocimientos adquiridos',
+            'que_mide': 'Inteligencia cristalizada, conocimiento general',
+            'icono': '📚',
+            'rango_pd': (0, 26),
+            'complementaria': False,
+            'habilidades': ['Memoria a largo plazo', 'Aprendizaje escolar', 'Conocimiento del entorno']
+        },
+        'matrices': {
+            'nombre': 'Matrices',
+            'nombre_corto': 'M',
+            'indice_primario': 'IRF',
+            'descripcion': 'Razonamiento fluido visual',
+            'que_mide': 'Razonamiento fluido no verbal, procesamiento simultáneo',
+            'icono': '🔲',
+            'rango_pd': (0, 20),
+            'complementaria': False,
+            'habilidades': ['Razonamiento abstracto', 'Procesamiento visual', 'Solución de problemas']
+        },
+        'busqueda_animales': {
+            'nombre': 'Búsqueda de Animales',
+            'nombre_corto': 'BA',
+            'indice_primario': 'IVP',
+            'descripcion': 'Velocidad de procesamiento visual',
+            'que_mide': 'Velocidad perceptiva, atención selectiva',
+            'icono': '🐾',
+            'rango_pd': (0, 21),
+            'complementaria': False,
+            'habilidades': ['Velocidad perceptiva', 'Atención selectiva', 'Discriminación visual']
+        },
+        'reconocimiento': {
+            'nombre': 'Reconocimiento',
+            'nombre_corto': 'R',
+            'indice_primario': 'IMT',
+            'descripcion': 'Memoria de trabajo visual',
+            'que_mide': 'Memoria visual a corto plazo',
+            'icono': '👁️',
+            'rango_pd': (0, 20),
+            'complementaria': False,
+            'habilidades': ['Memoria visual', 'Atención', 'Codificación visual']
+        },
+        'semejanzas': {
+            'nombre': 'Semejanzas',
+            'nombre_corto': 'S',
+            'indice_primario': 'ICV',
+            'descripcion': 'Razonamiento verbal abstracto',
+            'que_mide': 'Formación de conceptos verbales, razonamiento categorial',
+            'icono': '💭',
+            'rango_pd': (0, 30),
+            'complementaria': False,
+            'habilidades': ['Razonamiento verbal', 'Formación de conceptos', 'Pensamiento abstracto']
+        },
+        'conceptos': {
+            'nombre': 'Conceptos',
+            'nombre_corto': 'CON',
+            'indice_primario': 'IRF',
+            'descripcion': 'Razonamiento categorial',
+            'que_mide': 'Razonamiento abstracto categorial',
+            'icono': '🎯',
+            'rango_pd': (0, 20),
+            'complementaria': False,
+            'habilidades': ['Clasificación', 'Razonamiento inductivo', 'Flexibilidad cognitiva']
+        },
+        'localizacion': {
+            'nombre': 'Localización',
+            'nombre_corto': 'L',
+            'indice_primario': 'IMT',
+            'descripcion': 'Memoria espacial de trabajo',
+            'que_mide': 'Memoria de trabajo visual-espacial',
+            'icono': '📍',
+            'rango_pd': (0, 20),
+            'complementaria': False,
+            'habilidades': ['Memoria espacial', 'Organización visoespacial', 'Atención']
+        },
+        'cancelacion': {
+            'nombre': 'Cancelación',
+            'nombre_corto': 'CA',
+            'indice_primario': 'IVP',
+            'descripcion': 'Atención y velocidad perceptiva',
+            'que_mide': 'Velocidad de procesamiento, atención sostenida',
+            'icono': '✓',
+            'rango_pd': (0, 21),
+            'complementaria': False,
+            'habilidades': ['Atención sostenida', 'Velocidad psicomotora', 'Rastreo visual']
+        },
+        'rompecabezas': {
+            'nombre': 'Rompecabezas',
+            'nombre_corto': 'RO',
+            'indice_primario': 'IVE',
+            'descripcion': 'Análisis y síntesis visual',
+            'que_mide': 'Integración visomotora, análisis parte-todo',
+            'icono': '🧩',
+            'rango_pd': (0, 20),
+            'complementaria': False,
+            'habilidades': ['Análisis visual', 'Síntesis perceptiva', 'Planificación']
+        },
+        'vocabulario': {
+            'nombre': 'Vocabulario',
+            'nombre_corto': 'V',
+            'indice_primario': 'ICV',
+            'descripcion': 'Conocimiento léxico',
+            'que_mide': 'Desarrollo del lenguaje, formación de conceptos verbales',
+            'icono': '📖',
+            'rango_pd': (0, 19),
+            'complementaria': True,
+            'habilidades': ['Vocabulario expresivo', 'Conocimiento semántico', 'Desarrollo del lenguaje']
+        },
+        'nombres': {
+            'nombre': 'Nombres',
+            'nombre_corto': 'N',
+            'indice_primario': 'ICV',
+            'descripcion': 'Denominación y recuperación léxica',
+            'que_mide': 'Vocabulario expresivo, recuperación de palabras',
+            'icono': '🗣️',
+            'rango_pd': (0, 19),
+            'complementaria': True,
+            'habilidades': ['Denominación', 'Recuperación léxica', 'Procesamiento semántico']
+        },
+        'clave_figuras': {
+            'nombre': 'Clave de Figuras',
+            'nombre_corto': 'CF',
+            'indice_primario': 'IVP',
+            'descripcion': 'Velocidad de codificación',
+            'que_mide': 'Velocidad de procesamiento, memoria asociativa',
+            'icono': '🔑',
+            'rango_pd': (0, 19),
+            'complementaria': True,
+            'habilidades': ['Aprendizaje asociativo', 'Velocidad grafomotora', 'Memoria a corto plazo']
+        },
+        'comprension': {
+            'nombre': 'Comprensión',
+            'nombre_corto': 'CO',
+            'indice_primario': 'ICV',
+            'descripcion': 'Razonamiento social',
+            'que_mide': 'Comprensión de normas sociales, juicio práctico',
+            'icono': '🧐',
+            'rango_pd': (0, 19),
+            'complementaria': True,
+            'habilidades': ['Razonamiento social', 'Juicio práctico', 'Conocimiento de normas']
+        },
+        'dibujos': {
+            'nombre': 'Dibujos',
+            'nombre_corto': 'D',
+            'indice_primario': 'ICV',
+            'descripcion': 'Vocabulario receptivo',
+            'que_mide': 'Comprensión de vocabulario, conocimiento léxico',
+            'icono': '🖼️',
+            'rango_pd': (0, 19),
+            'complementaria': True,
+            'habilidades': ['Vocabulario receptivo', 'Comprensión auditiva', 'Conocimiento conceptual']
+        }
+    }
+    
+    # Tablas de conversión Suma PE a Índice Compuesto
+    TABLA_SUMA_PE_A_INDICE = {
+        'ICV': {
+            4:50, 5:53, 6:55, 7:58, 8:61, 9:64, 10:67, 11:69, 12:72, 13:75,
+            14:78, 15:81, 16:83, 17:86, 18:89, 19:92, 20:94, 21:97, 22:100,
+            23:103, 24:106, 25:108, 26:111, 27:114, 28:117, 29:119, 30:122,
+            31:125, 32:128, 33:131, 34:133, 35:136, 36:139, 37:142, 38:145
+        },
+        'IVE': {
+            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:68, 11:70, 12:73, 13:76,
+            14:79, 15:82, 16:85, 17:88, 18:90, 19:93, 20:96, 21:99, 22:102,
+            23:105, 24:108, 25:110, 26:113, 27:116, 28:119, 29:122, 30:125,
+            31:128, 32:131, 33:133, 34:136, 35:139, 36:142, 37:145, 38:148
+        },
+        'IRF': {
+            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:68, 11:71, 12:74, 13:76,
+            14:79, 15:82, 16:85, 17:88, 18:91, 19:94, 20:97, 21:100, 22:103,
+            23:106, 24:109, 25:112, 26:115, 27:118, 28:121, 29:124, 30:127,
+            31:130, 32:133, 33:136, 34:139, 35:142, 36:145, 37:148, 38:151
+        },
+        'IMT': {
+            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:67, 11:70, 12:73, 13:76,
+            14:79, 15:82, 16:85, 17:88, 18:91, 19:94, 20:97, 21:100, 22:103,
+            23:106, 24:109, 25:112, 26:115, 27:118, 28:121, 29:124, 30:127,
+            31:130, 32:133, 33:136, 34:139, 35:142, 36:145, 37:148, 38:151
+        },
+        'IVP': {
+            4:50, 5:53, 6:56, 7:59, 8:62, 9:65, 10:68, 11:71, 12:73, 13:76,
+            14:79, 15:82, 16:85, 17:88, 18:91, 19:94, 20:97, 21:100, 22:103,
+            23:106, 24:109, 25:112, 26:115, 27:118, 28:121, 29:124, 30:127,
+            31:130, 32:133, 33:136, 34:139, 35:142, 36:145, 37:148, 38:151
+        }
+    }
+    
+    # Tabla de conversión a CIT
+    TABLA_CIT = {
+        10:40, 12:42, 14:44, 16:46, 18:48, 20:50, 22:52, 24:54, 26:56, 28:58,
+        30:60, 32:62, 34:64, 36:66, 38:68, 40:70, 42:72, 44:74, 46:76, 48:78,
+        50:80, 52:82, 54:84, 56:86, 58:88, 60:90, 62:92, 63:93, 64:94, 65:95,
+        66:96, 67:97, 68:98, 69:99, 70:100, 71:101, 72:102, 73:103, 74:104,
+        75:105, 76:106, 77:107, 78:108, 79:109, 80:110, 82:112, 84:114, 86:116,
+        88:118, 90:120, 92:122, 94:124, 95:125, 96:126, 97:127, 98:128, 99:129,
+        100:130, 102:132, 104:134, 106:136, 108:138, 110:140, 112:142, 114:144,
+        115:145, 116:146, 117:147, 118:148, 119:149, 120:150
+    }
+    
+    # Configuración de índices secundarios
+    INDICES_SECUNDARIOS_CONFIG = {
+        'IAV': {
+            'nombre': 'Adquisición de Vocabulario',
+            'nombre_corto': 'IAV',
+            'pruebas': ['dibujos', 'nombres'],
+            'descripcion': 'Rendimiento en vocabulario receptivo y expresivo',
+            'tabla_conversion': {
+                2:50, 3:55, 4:60, 5:65, 6:70, 7:74, 8:79, 9:84, 10:89, 11:94,
+                12:99, 13:103, 14:108, 15:113, 16:118, 17:123, 18:128, 19:133,
+                20:137, 21:142, 22:147, 23:152, 24:157, 25:160
+            }
+        },
+        'INV': {
+            'nombre': 'No Verbal',
+            'nombre_corto': 'INV',
+            'pruebas': ['cubos', 'matrices', 'conceptos', 'reconocimiento', 'busqueda_animales'],
+            'descripcion': 'Aptitud intelectual sin lenguaje expresivo',
+            'tabla_conversion': {
+                10:40, 15:50, 20:60, 25:70, 30:80, 35:90, 40:95, 45:100, 50:105,
+                55:110, 60:115, 65:120, 70:125, 75:130, 80:135, 85:140, 90:145,
+                95:150
+            }
+        },
+        'ICG': {
+            'nombre': 'Capacidad General',
+            'nombre_corto': 'ICG',
+            'pruebas': ['informacion', 'semejanzas', 'cubos', 'matrices'],
+            'descripcion': 'Aptitud intelectual menos dependiente de MT y VP',
+            'tabla_conversion': {
+                10:47, 15:57, 20:67, 25:77, 30:87, 35:97, 40:107, 45:117, 50:128,
+                55:138, 60:148, 65:153, 70:158, 76:160
+            }
+        },
+        'ICC': {
+            'nombre': 'Competencia Cognitiva',
+            'nombre_corto': 'ICC',
+            'pruebas': ['reconocimiento', 'localizacion', 'busqueda_animales', 'cancelacion'],
+            'descripcion': 'Eficacia en procesamiento cognitivo',
+            'tabla_conversion': {
+                10:47, 15:57, 20:67, 25:77, 30:87, 35:97, 40:107, 45:117, 50:127,
+                55:137, 60:147, 65:153, 70:158, 76:160
+            }
+        }
+    }
+    
+    @staticmethod
+    def calcular_edad_exacta(fecha_nac: date, fecha_eval: date) -> Tuple[int, int, int]:
+        """Calcula edad cronológica exacta en años, meses y días"""
+        years = fecha_eval.year - fecha_nac.year
+        months = fecha_eval.month - fecha_nac.month
+        days = fecha_eval.day - fecha_nac.day
+        
+        if days < 0:
+            months -= 1
+            # Calcular días del mes anterior
+            mes_anterior = fecha_eval.month - 1 if fecha_eval.month > 1 else 12
+            año_mes_anterior = fecha_eval.year if fecha_eval.month > 1 else fecha_eval.year - 1
+            
+            if mes_anterior in [1, 3, 5, 7, 8, 10, 12]:
+                days_in_prev_month = 31
+            elif mes_anterior in [4, 6, 9, 11]:
+                days_in_prev_month = 30
+            else:  # Febrero
+                if (año_mes_anterior % 4 == 0 and año_mes_anterior % 100 != 0) or (año_mes_anterior % 400 == 0):
+                    days_in_prev_month = 29
+                else:
+                    days_in_prev_month = 28
+            
+            days += days_in_prev_month
+        
+        if months < 0:
+            years -= 1
+            months += 12
+        
+        return years, months, days
+    
+    @staticmethod
+    def convertir_pd_a_pe(prueba: str, puntuacion_directa: int, edad_meses: Optional[int] = None) -> Optional[int]:
+        """Convierte PD a PE usando tablas oficiales (por banda de edad si se conoce la edad)"""
+        if puntuacion_directa is None or puntuacion_directa == '':
+            return None
+        
+        puntuacion_directa = int(puntuacion_directa)
+
+        if prueba not in MOTOR_BAREMOS.posicion:
+            return 1 if puntuacion_directa <= 0 else 19
+
+        if edad_meses is not None:
+            from .normas import obtener_normas
+            normas = obtener_normas()
+            if normas is not None:
+                return normas.convertir_valor(prueba, puntuacion_directa, edad_meses)
+
+        return MOTOR_BAREMOS.convertir_valor(prueba, puntuacion_directa)
+    
+    @staticmethod
+    def calcular_indice_compuesto(suma_pe: int, tipo_indice: str) -> Optional[int]:
+        """Calcula índice compuesto a partir de suma de PE"""
+        if suma_pe is None or suma_pe <= 0:
+            return None
+        
+        if tipo_indice not in MOTOR_INDICES.tablas:
+            return 100
+
+        return MOTOR_INDICES.convertir(tipo_indice, suma_pe)
+    
+    @staticmethod
+    def calcular_cit_total(suma_total_pe: int) -> Optional[int]:
+        """Calcula CIT a partir de suma total de PE"""
+        if suma_total_pe is None or suma_total_pe <= 0:
+            return None
+        
+        return MOTOR_INDICES.convertir('CIT', suma_total_pe)
+    
+    @staticmethod
+    def obtener_percentil_exacto(ci: int) -> str:
+        """Calcula percentil exacto usando distribución normal"""
+        if ci is None:
+            return None
+        
+        percentil = _cdf_normal((ci - 100) / 15) * 100
+        
+        if percentil > 99.9:
+            return ">99.9"
+        elif percentil < 0.1:
+            return "<0.1"
+        else:
+            return round(percentil, 1)
+    
+    @staticmethod
+    def obtener_categoria_descriptiva(ci: int) -> Tuple[str, str, str]:
+        """Retorna categoría descriptiva, color y descripción según CI"""
+        if ci is None:
+            return "No calculado", "#95a5a6", "Datos insuficientes"
+        
+        if ci >= 130:
+            return "Muy Superior", "#27ae60", "Capacidades intelectuales excepcionales (2.2% superior)"
+        elif ci >= 120:
+            return "Superior", "#2ecc71", "Rendimiento significativamente por encima del promedio (6.7%)"
+        elif ci >= 110:
+            return "Medio Alto", "#3498db", "Rendimiento por encima del promedio (16.1%)"
+        elif ci >= 90:
+            return "Medio", "#f39c12", "Rendimiento dentro del rango promedio esperado (50%)"
+        elif ci >= 80:
+            return "Medio Bajo", "#e67e22", "Rendimiento ligeramente por debajo del promedio (16.1%)"
+        elif ci >= 70:
+            return "Límite", "#e74c3c", "Requiere atención y posible intervención (6.7%)"
+        else:
+            return "Muy Bajo", "#c0392b", "Requiere intervención especializada (2.2%)"
+    
+    @staticmethod
+    def obtener_intervalo_confianza_90(ci: int) -> Tuple[Optional[int], Optional[int]]:
+        """Calcula intervalo de confianza al 90%"""
+        if ci is None:
+            return None, None
+        
+        # Margen de error para 90% de confianza (SEM * 1.645)
+        margen = 6  # Aproximado según manual WPPSI-IV
+        return ci - margen, ci + margen
+    
+    @staticmethod
+    def clasificar_pe(pe: int) -> str:
+        """Clasifica una PE como Fortaleza, Promedio o Debilidad"""
+        if pe is None:
+            return "No evaluado"
+        elif pe >= 13:
+            return "Fortaleza"
+        elif pe <= 7:
+            return "Debilidad"
+        else:
+            return "Promedio"
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MOTOR DE BAREMOS COMPILADO (TABLAS DENSAS)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class MotorBaremosPE:
+    """
+    Compila TABLAS_CONVERSION_PD_PE en tablas densas (prueba x PD) una sola vez.
+    Las PD fuera de rango se recortan igual que en el baremo original:
+    PD <= 0 -> PE 1, PD por encima de la tabla -> PE máxima de la prueba
+    """
+
+    def __init__(self, tablas: Dict[str, Dict[int, int]]):
+        self.pruebas = tuple(tablas.keys())
+        self.posicion = {prueba: i for i, prueba in enumerate(self.pruebas)}
+        self.pd_maxima = max(max(tabla) for tabla in tablas.values())
+
+        filas = []
+        for tabla in tablas.values():
+            fila = [max(tabla.values())] * (self.pd_maxima + 1)
+            fila[0] = tabla.get(0, 1)
+            for pd_val, pe in tabla.items():
+                if 0 <= pd_val <= self.pd_maxima:
+                    fila[pd_val] = pe
+            filas.append(tuple(fila))
+        self.filas = tuple(filas)
+        self._matriz = None
+
+    @property
+    def matriz(self) -> 'np.ndarray':
+        """Matriz NumPy int16 (prueba x PD), construida en el primer uso por lotes"""
+        if self._matriz is None:
+            import numpy as np
+            matriz = np.array(self.filas, dtype=np.int16)
+            matriz.setflags(write=False)
+            self._matriz = matriz
+        return self._matriz
+
+    def convertir_valor(self, prueba: str, puntuacion_directa: int) -> int:
+        """Conversión de una sola PD (ruta rápida para la interfaz)"""
+        if puntuacion_directa < 0:
+            return 1
+        return self.filas[self.posicion[prueba]][min(puntuacion_directa, self.pd_maxima)]
+
+    def convertir(self, prueba: str, puntuaciones) -> 'np.ndarray':
+        """Convierte un array de PD de una misma prueba a PE"""
+        import numpy as np
+        pd_arr = np.asarray(puntuaciones, dtype=np.int64)
+        pe = self.matriz[self.posicion[prueba], np.clip(pd_arr, 0, self.pd_maxima)]
+        return np.where(pd_arr < 0, 1, pe).astype(np.int16)
+
+    def convertir_matriz(self, pd_matriz, pruebas: Optional[List[str]] = None) -> 'np.ndarray':
+        """
+        Convierte una matriz de PD (filas = evaluaciones, columnas = pruebas) en una llamada
+
+        Args:
+            pd_matriz: Array 2D de PD; NaN indica prueba no aplicada
+            pruebas: Nombre de prueba de cada columna (por defecto las 15 en orden de tabla)
+
+        Returns:
+            Array int16 de PE con la misma forma; 0 indica prueba no aplicada
+        """
+        import numpy as np
+        pruebas = self.pruebas if pruebas is None else tuple(pruebas)
+        valores = np.asarray(pd_matriz, dtype=np.float64)
+        faltantes = np.isnan(valores)
+        pd_int = np.where(faltantes, 0, valores).astype(np.int64)
+
+        filas = np.array([self.posicion[p] for p in pruebas], dtype=np.intp)
+        pe = self.matriz[filas, np.clip(pd_int, 0, self.pd_maxima)]
+        pe = np.where(pd_int < 0, 1, pe).astype(np.int16)
+        pe[faltantes] = 0
+        return pe
+
+    def convertir_dataframe(self, df: 'pd_lib.DataFrame') -> 'pd_lib.DataFrame':
+        """Convierte todas las columnas de PD reconocidas de un DataFrame a PE"""
+        import numpy as np
+        import pandas as pd_lib
+        columnas = [c for c in df.columns if c in self.posicion]
+        valores = df[columnas].to_numpy(dtype=np.float64, na_value=np.nan)
+        pe = pd_lib.DataFrame(self.convertir_matriz(valores, columnas), index=df.index, columns=columnas)
+        return pe.astype('Int16').mask(pe == 0)
+
+MOTOR_BAREMOS = MotorBaremosPE(BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE)
+
+
+class MotorIndicesCompuestos:
+    """
+    Compila las tablas Suma PE -> Índice (primarios, CIT y secundarios) en tablas
+    densas indexadas por la suma. Cada posición guarda el valor de la primera clave
+    >= suma, y las sumas por encima de la tabla toman el último valor
+    """
+
+    def __init__(self, tablas: Dict[str, Dict[int, int]]):
+        self.tablas = {nombre: self._compilar(tabla) for nombre, tabla in tablas.items() if tabla}
+        self._arrays = {}
+
+    @staticmethod
+    def _compilar(tabla: Dict[int, int]) -> Tuple[int, ...]:
+        claves = sorted(tabla)
+        return tuple(tabla[claves[bisect_left(claves, suma)]] for suma in range(claves[-1] + 1))
+
+    def array(self, tipo_indice: str) -> 'np.ndarray':
+        """Tabla densa como array NumPy int16, construida en el primer uso por lotes"""
+        if tipo_indice not in self._arrays:
+            import numpy as np
+            denso = np.array(self.tablas[tipo_indice], dtype=np.int16)
+            denso.setflags(write=False)
+            self._arrays[tipo_indice] = denso
+        return self._arrays[tipo_indice]
+
+    def convertir(self, tipo_indice: str, suma_pe: int) -> int:
+        """Conversión de una sola suma de PE"""
+        tabla = self.tablas[tipo_indice]
+        return tabla[min(max(suma_pe, 0), len(tabla) - 1)]
+
+    def convertir_lote(self, tipo_indice: str, sumas) -> 'np.ndarray':
+        """Convierte una columna completa de sumas de PE en una llamada"""
+        import numpy as np
+        tabla = self.array(tipo_indice)
+        return tabla[np.clip(np.asarray(sumas, dtype=np.int64), 0, len(tabla) - 1)]
+
+    def rango(self) -> Tuple[int, int]:
+        """Valor compuesto mínimo y máximo que puede producir cualquier tabla"""
+        return (min(min(tabla) for tabla in self.tablas.values()),
+                max(max(tabla) for tabla in self.tablas.values()))
+
+MOTOR_INDICES = MotorIndicesCompuestos({
+    **BaremosWPPSIUltra.TABLA_SUMA_PE_A_INDICE,
+    'CIT': BaremosWPPSIUltra.TABLA_CIT,
+    **{nombre: config.get('tabla_conversion', {})
+       for nombre, config in BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG.items()}
+})
+
+
+class TablaMetricasCompuestas:
+    """
+    Métricas derivadas precalculadas por puntuación compuesta: percentil, categoría,
+    color, descripción e intervalo de confianza al 90%. Cada consulta es un único
+    acceso por índice en lugar de llamar a las cuatro funciones de BaremosWPPSIUltra
+    """
+
+    CAMPOS = ('percentil', 'categoria', 'color', 'descripcion', 'ic_inf', 'ic_sup')
+
+    def __init__(self, minimo: int, maximo: int):
+        self.minimo = minimo
+        self.maximo = maximo
+        self.filas = tuple(self._calcular(ci) for ci in range(minimo, maximo + 1))
+        self._columnas = {}
+
+    @staticmethod
+    def _calcular(ci: int) -> Tuple:
+        categoria, color, descripcion = BaremosWPPSIUltra.obtener_categoria_descriptiva(ci)
+        ic_inf, ic_sup = BaremosWPPSIUltra.obtener_intervalo_confianza_90(ci)
+        return (BaremosWPPSIUltra.obtener_percentil_exacto(ci), categoria, color, descripcion, ic_inf, ic_sup)
+
+    def obtener(self, ci: int) -> Tuple:
+        """(percentil, categoria, color, descripcion, ic_inf, ic_sup) de una puntuación compuesta"""
+        if ci is not None and self.minimo <= ci <= self.maximo:
+            return self.filas[ci - self.minimo]
+        return self._calcular(ci)
+
+    def columna(self, campo: str, valores) -> 'np.ndarray':
+        """Consulta vectorizada de un campo para un array de puntuaciones compuestas"""
+        import numpy as np
+        if campo not in self._columnas:
+            j = self.CAMPOS.index(campo)
+            tipo = np.int16 if campo in ('ic_inf', 'ic_sup') else object
+            columna = np.empty(len(self.filas), dtype=tipo)
+            columna[:] = [fila[j] for fila in self.filas]
+            columna.setflags(write=False)
+            self._columnas[campo] = columna
+        posiciones = np.clip(np.asarray(valores, dtype=np.int64), self.minimo, self.maximo) - self.minimo
+        return self._columnas[campo][posiciones]
+
+TABLA_METRICAS = TablaMetricasCompuestas(*MOTOR_INDICES.rango())
@@ -0,0 +1,115 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+CACHÉ LRU ACOTADA Y SEGURA ENTRE HILOS
+Compartida por todas las sesiones de un mismo proceso de Streamlit
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import hashlib
+import threading
+import types
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class CacheLRU:
+    """
+    Caché con número máximo de entradas, desalojo LRU y contadores de aciertos/fallos.
+    Con `max_tamano` también limita la suma de len() de los valores (p. ej. bytes de JSON)
+    """
+
+    def __init__(self, max_entradas: int = 256, max_tamano: Optional[int] = None):
+        self._datos = OrderedDict()
+        self._tamanos = {}
+        self._lock = threading.Lock()
+        self.max_entradas = max(1, int(max_entradas))
+        self.max_tamano = None if max_tamano is None else max(1, int(max_tamano))
+        self.tamano = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def obtener(self, clave: Hashable) -> Tuple[bool, Any]:
+        """Devuelve (encontrado, valor) y marca la entrada como usada recientemente"""
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.aciertos += 1
+                return True, self._datos[clave]
+            self.fallos += 1
+            return False, None
+
+    def guardar(self, clave: Hashable, valor: Any):
+        with self._lock:
+            if self.max_tamano is not None:
+                self.tamano += len(valor) - self._tamanos.get(clave, 0)
+                self._tamanos[clave] = len(valor)
+            self._datos[clave] = valor
+            self._datos.move_to_end(clave)
+            self._desalojar()
+
+    def configurar(self, max_entradas: int, max_tamano: Optional[int] = None):
+        """Cambia los límites y desaloja lo que sobre (el de tamaño solo en cachés creadas con max_tamano)"""
+        with self._lock:
+            self.max_entradas = max(1, int(max_entradas))
+            if max_tamano is not None and self.max_tamano is not None:
+                self.max_tamano = max(1, int(max_tamano))
+            self._desalojar()
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._tamanos.clear()
+            self.tamano = 0
+            self.aciertos = self.fallos = self.desalojos = 0
+
+    def _desalojar(self):
+        # La entrada recién guardada se conserva aunque sola supere max_tamano
+        while len(self._datos) > self.max_entradas or (
+                self.max_tamano is not None and self.tamano > self.max_tamano and len(self._datos) > 1):
+            clave, _ = self._datos.popitem(last=False)
+            self.tamano -= self._tamanos.pop(clave, 0)
+            self.desalojos += 1
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'max_entradas': self.max_entradas,
+                'tamano': self.tamano,
+                'max_tamano': self.max_tamano,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0
+            }
+
+
+def huella_codigo(funcion: Callable) -> str:
+    """
+    Hash del código de una función para usarlo en claves de caché: bytecode,
+    constantes (títulos, colores y demás literales no están en co_code) y nombres,
+    también de sus funciones anidadas y de las funciones de su módulo a las que
+    llama, así que cambia si se edita cualquiera de ellas en caliente
+    """
+    partes = []
+    vistas = set()
+
+    def recorrer(codigo: types.CodeType, modulo: Dict):
+        partes.extend((codigo.co_code, repr(codigo.co_names).encode('utf-8')))
+        for constante in codigo.co_consts:
+            if isinstance(constante, types.CodeType):
+                recorrer(constante, modulo)
+            else:
+                partes.append(repr(constante).encode('utf-8'))
+        for nombre in codigo.co_names:
+            llamada = getattr(modulo.get(nombre), '__wrapped__', modulo.get(nombre))   # p. ej. st.cache_resource
+            if isinstance(llamada, types.FunctionType) and llamada.__globals__ is modulo and llamada not in vistas:
+                vistas.add(llamada)
+                recorrer(llamada.__code__, modulo)
+
+    funcion = getattr(funcion, '__wrapped__', funcion)
+    vistas.add(funcion)
+    recorrer(funcion.__code__, funcion.__globals__)
+    return hashlib.blake2b(b'\0'.join(partes), digest_size=16).hexdigest()
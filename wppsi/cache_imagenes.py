@@ -0,0 +1,157 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+CACHÉ EN DISCO DE GRÁFICOS RASTERIZADOS
+PNG por hash del contenido de la figura y tamaño de salida, con tope y desalojo LRU
+═══════════════════════════════════════════════════════════════════════════════
+Un archivo por imagen en <directorio>/<2 primeros hex>/<hash>.png. Se escriben
+en un temporal del mismo directorio y se publican con os.replace, así que otro
+proceso ve la imagen completa o no la ve. La fecha de modificación es la del
+último uso (un acierto la actualiza); al pasar del tope se vuelve a medir el
+directorio, que puede compartirse entre procesos, y se borran las menos
+usadas hasta quedar en el 90% del tope.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Cambiarla invalida las imágenes guardadas (p. ej. si cambia el motor de render)
+VERSION_CACHE = 1
+RUTA_POR_DEFECTO = Path.home() / '.wppsi' / 'imagenes'
+
+
+def _json_figura(figura: Any) -> str:
+    if hasattr(figura, 'to_json'):
+        return figura.to_json()
+    return json.dumps(figura, sort_keys=True, default=str)
+
+
+class CacheImagenesDisco:
+    """Caché de PNG en disco, compartible entre procesos"""
+
+    def __init__(self, directorio=None, max_bytes: int = 256 * 1024 * 1024):
+        self.directorio = Path(directorio or os.environ.get('WPPSI_CACHE_IMAGENES', RUTA_POR_DEFECTO))
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max(1, int(max_bytes))
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.escrituras = 0
+        self.desalojos = 0
+        self.tamano = sum(tamano for _, _, tamano in self._archivos())
+
+    @staticmethod
+    def clave(figura: Any, ancho: int, alto: int, escala: float) -> str:
+        """Hash del JSON de la figura y del tamaño de salida"""
+        datos = f"{VERSION_CACHE}|{ancho}x{alto}@{escala}|{_json_figura(figura)}".encode('utf-8')
+        return hashlib.blake2b(datos, digest_size=20).hexdigest()
+
+    def _ruta(self, clave: str) -> Path:
+        return self.directorio / clave[:2] / f"{clave}.png"
+
+    def obtener(self, clave: str) -> Optional[bytes]:
+        """PNG guardado (y marcado como usado ahora), o None"""
+        ruta = self._ruta(clave)
+        try:
+            datos = ruta.read_bytes()
+        except OSError:
+            datos = None
+        else:
+            try:
+                os.utime(ruta)
+            except OSError:
+                pass  # Lo desalojó otro proceso justo después de leerlo
+        with self._lock:
+            if datos is None:
+                self.fallos += 1
+            else:
+                self.aciertos += 1
+        return datos
+
+    def guardar(self, clave: str, png: bytes):
+        ruta = self._ruta(clave)
+        ruta.parent.mkdir(exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(png)
+            os.replace(temporal, ruta)
+        except OSError:
+            try:
+                os.unlink(temporal)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self.escrituras += 1
+            self.tamano += len(png)
+            if self.tamano > self.max_bytes:
+                self._desalojar()
+
+    def _archivos(self) -> List[Tuple[float, Path, int]]:
+        """(último uso, ruta, bytes) de cada imagen guardada"""
+        archivos = []
+        for ruta in self.directorio.glob('??/*.png'):
+            try:
+                estado = ruta.stat()
+            except OSError:
+                continue
+            archivos.append((estado.st_mtime, ruta, estado.st_size))
+        return archivos
+
+    def _desalojar(self):
+        """Borra las imágenes menos usadas hasta el 90% del tope (con el lock tomado)"""
+        archivos = sorted(self._archivos())
+        self.tamano = sum(tamano for _, _, tamano in archivos)
+        objetivo = self.max_bytes * 0.9
+        for _, ruta, tamano in archivos:
+            if self.tamano <= objetivo:
+                break
+            try:
+                ruta.unlink()
+            except OSError:
+                continue
+            self.tamano -= tamano
+            self.desalojos += 1
+
+    def limpiar(self):
+        with self._lock:
+            for _, ruta, _ in self._archivos():
+                try:
+                    ruta.unlink()
+                except OSError:
+                    pass
+            self.tamano = 0
+            self.aciertos = self.fallos = self.escrituras = self.desalojos = 0
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'directorio': str(self.directorio),
+                'tamano': self.tamano,
+                'max_bytes': self.max_bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'escrituras': self.escrituras,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0
+            }
+
+
+_cache = None
+_lock_cache = threading.Lock()
+
+def obtener_cache_imagenes() -> CacheImagenesDisco:
+    """Caché del proceso (WPPSI_CACHE_IMAGENES: directorio, WPPSI_CACHE_IMAGENES_MB: tope)"""
+    global _cache
+    if _cache is None:
+        with _lock_cache:
+            if _cache is None:
+                megas = float(os.environ.get('WPPSI_CACHE_IMAGENES_MB', 256))
+                _cache = CacheImagenesDisco(max_bytes=int(megas * 1024 * 1024))
+    return _cache
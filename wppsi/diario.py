@@ -0,0 +1,287 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+DIARIO DE CAMBIOS DE EVALUACIONES EN CURSO (SOLO ANEXAR)
+Cada cambio de campo se anexa al diario; fsync por lotes en un hilo de fondo
+═══════════════════════════════════════════════════════════════════════════════
+Formato: una línea por registro, `<crc32 en 8 hex> <json>\\n`
+
+    {"s": sesión, "e": examinador, "t": epoch, "c": {campo: valor, ...}}   cambios
+    {"s": sesión, "e": examinador, "t": epoch, "fin": evaluacion_id}       terminada
+
+Una línea cortada por una caída (CRC incorrecto o JSON incompleto) se descarta
+al leer. registrar() solo serializa y encola: la escritura, el flush y el
+fsync ocurren en el hilo del diario como mucho cada `intervalo_sync` segundos,
+así que el ciclo de rerun de Streamlit nunca espera al disco. La ruta se puede
+fijar con WPPSI_DIARIO.
+
+Si el disco falla (lleno, permisos) el lote se conserva y se reintenta; mientras
+tanto `error` indica el fallo y, pasadas MAX_PENDIENTES líneas sin escribir, las
+nuevas se descartan (`descartados`). El diario contiene texto clínico: se crea
+con permisos 0o600.
+
+Varios procesos pueden compartir el diario: cada lote se anexa con un bloqueo
+compartido sobre '<diario>.lock' y la compactación, que reemplaza el archivo, toma
+el exclusivo; quien tenga abierto el archivo reemplazado lo vuelve a abrir antes
+de anexar. Sin fcntl (Windows) no hay bloqueo, pero tampoco se puede reemplazar
+un archivo que otro proceso tiene abierto: la compactación falla y se omite.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+RUTA_POR_DEFECTO = Path.home() / '.wppsi' / 'diario_cambios.log'
+MAX_BYTES_ANTES_DE_COMPACTAR = 8 * 1024 * 1024
+MAX_PENDIENTES = 10000          # Líneas retenidas en memoria mientras el disco falla
+INTERVALO_REINTENTO = 2.0       # Segundos entre reintentos tras un error de escritura
+
+
+def _codificar(valor):
+    if isinstance(valor, date):
+        return {'$fecha': valor.isoformat()}
+    raise TypeError(f"Valor no serializable en el diario: {type(valor).__name__}")
+
+def _decodificar(objeto: Dict):
+    if objeto.keys() == {'$fecha'}:
+        return date.fromisoformat(objeto['$fecha'])
+    return objeto
+
+def _linea(registro: Dict) -> bytes:
+    cuerpo = json.dumps(registro, ensure_ascii=False, separators=(',', ':'), default=_codificar).encode('utf-8')
+    return b'%08x %s\n' % (zlib.crc32(cuerpo), cuerpo)
+
+def _normalizar_examinador(examinador: Optional[str]) -> str:
+    return (examinador or '').strip().casefold()
+
+
+class DiarioCambios:
+    """Diario de cambios compartido por todas las sesiones del proceso"""
+
+    def __init__(self, ruta=None, intervalo_sync: float = 0.25):
+        self.ruta = Path(ruta or os.environ.get('WPPSI_DIARIO', RUTA_POR_DEFECTO))
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        self.intervalo_sync = intervalo_sync
+        self._bloqueo_archivo = os.open(self.ruta.with_name(self.ruta.name + '.lock'),
+                                        os.O_RDWR | os.O_CREAT, 0o600)
+
+        if self.ruta.exists() and self.ruta.stat().st_size > MAX_BYTES_ANTES_DE_COMPACTAR:
+            with self._bloqueo(exclusivo=True):
+                try:
+                    self._compactar()
+                except OSError:
+                    pass   # Se compactará en otra apertura; el diario sigue siendo válido
+
+        self._archivo = None
+        with self._bloqueo():
+            self._abrir_si_reemplazado()
+            if os.fstat(self._archivo).st_size and not self._termina_en_salto():
+                # Cerrar la línea cortada por una caída para no corromper la siguiente
+                os.write(self._archivo, b'\n')
+        self._pendientes = []
+        self._encolados = 0
+        self._sincronizados = 0
+        self.descartados = 0
+        self._fallos = 0
+        self.error: Optional[OSError] = None   # Último error de escritura, None tras un reintento correcto
+        self._cerrado = False
+        self._cond = threading.Condition()
+        self._hilo = threading.Thread(target=self._escritor, name='wppsi-diario', daemon=True)
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    @contextmanager
+    def _bloqueo(self, exclusivo: bool = False):
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._bloqueo_archivo, fcntl.LOCK_EX if exclusivo else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._bloqueo_archivo, fcntl.LOCK_UN)
+
+    def _abrir_si_reemplazado(self):
+        """(Re)abre el diario para anexar si aún no está abierto o si otro proceso lo compactó"""
+        if self._archivo is not None:
+            try:
+                actual = os.stat(self.ruta)
+                abierto = os.fstat(self._archivo)
+                if (actual.st_dev, actual.st_ino) == (abierto.st_dev, abierto.st_ino):
+                    return
+            except FileNotFoundError:
+                pass
+            os.close(self._archivo)
+            self._archivo = None
+        self._archivo = os.open(self.ruta, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+
+    def _termina_en_salto(self) -> bool:
+        with open(self.ruta, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b'\n'
+
+    # ───────────── Escritura ─────────────
+
+    def registrar(self, sesion: str, examinador: str, cambios: Dict):
+        """Encola los campos modificados en un rerun (no espera al disco)"""
+        if cambios:
+            self._encolar(_linea({'s': sesion, 'e': examinador, 't': time.time(), 'c': cambios}))
+
+    def terminar(self, sesion: str, examinador: str, evaluacion_id: Optional[int] = None):
+        """Marca la evaluación de la sesión como terminada (ya no se ofrece para recuperar)"""
+        self._encolar(_linea({'s': sesion, 'e': examinador, 't': time.time(), 'fin': evaluacion_id}))
+
+    def _encolar(self, linea: bytes):
+        with self._cond:
+            if self._cerrado:
+                return
+            if len(self._pendientes) >= MAX_PENDIENTES:
+                self.descartados += 1
+                return
+            self._pendientes.append(linea)
+            self._encolados += 1
+            self._cond.notify_all()
+
+    def _escritor(self):
+        while True:
+            with self._cond:
+                while not self._pendientes and not self._cerrado:
+                    self._cond.wait()
+                if not self._pendientes and self._cerrado:
+                    return
+            # Juntar en un solo lote los cambios que lleguen durante el intervalo
+            if not self._cerrado:
+                time.sleep(self.intervalo_sync if self.error is None else INTERVALO_REINTENTO)
+            with self._cond:
+                lote, self._pendientes = self._pendientes, []
+            try:
+                self._anexar(lote)
+            except OSError as e:
+                with self._cond:
+                    self._pendientes[:0] = lote   # Se reintenta entero en la siguiente vuelta
+                    self.error = e
+                    self._fallos += 1
+                    self._cond.notify_all()
+                    if self._cerrado:
+                        return
+                continue
+            with self._cond:
+                self.error = None
+                self._sincronizados += len(lote)
+                self._cond.notify_all()
+
+    def _anexar(self, lote):
+        # Tras un error puede haber quedado media línea: el salto la cierra (las vacías se ignoran)
+        datos = (b'\n' if self.error is not None else b'') + b''.join(lote)
+        with self._bloqueo():
+            self._abrir_si_reemplazado()
+            while datos:
+                datos = datos[os.write(self._archivo, datos):]
+            os.fsync(self._archivo)
+
+    def vaciar(self, espera: float = 5.0) -> bool:
+        """Espera a que todo lo encolado esté en disco (False si no llega a tiempo o falla una escritura)"""
+        with self._cond:
+            objetivo, fallos = self._encolados, self._fallos
+            self._cond.wait_for(lambda: self._sincronizados >= objetivo or self._fallos > fallos,
+                                timeout=espera)
+            return self._sincronizados >= objetivo
+
+    def cerrar(self):
+        with self._cond:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._cond.notify_all()
+        self._hilo.join()
+        os.close(self._archivo)
+        os.close(self._bloqueo_archivo)
+
+    # ───────────── Lectura y recuperación ─────────────
+
+    def leer(self) -> Iterator[Dict]:
+        """Registros válidos en orden de escritura"""
+        if not self.ruta.exists():
+            return
+        with open(self.ruta, 'rb') as f:
+            for linea in f:
+                crc, _, cuerpo = linea.rstrip(b'\n').partition(b' ')
+                try:
+                    if int(crc, 16) != zlib.crc32(cuerpo):
+                        continue
+                    yield json.loads(cuerpo, object_hook=_decodificar)
+                except ValueError:
+                    continue
+
+    def _sesiones(self) -> Dict[str, Dict]:
+        """Estado acumulado por sesión: examinador, último cambio, campos y si terminó"""
+        sesiones = {}
+        for registro in self.leer():
+            sesion = sesiones.setdefault(registro['s'], {'sesion': registro['s'], 'campos': {}})
+            sesion['examinador'] = registro['e']
+            sesion['actualizado'] = registro['t']
+            if 'fin' in registro:
+                sesion['terminada'] = True
+            else:
+                sesion['terminada'] = False
+                sesion['campos'].update(registro['c'])
+        return sesiones
+
+    def pendiente(self, examinador: str, excluir: Optional[str] = None) -> Optional[Dict]:
+        """
+        Última evaluación sin terminar del examinador
+
+        Returns:
+            {'sesion', 'examinador', 'actualizado', 'campos'} o None
+        """
+        clave = _normalizar_examinador(examinador)
+        candidatas = [s for s in self._sesiones().values()
+                      if not s['terminada'] and s['sesion'] != excluir
+                      and _normalizar_examinador(s['examinador']) == clave]
+        return max(candidatas, key=lambda s: s['actualizado'], default=None)
+
+    def _compactar(self):
+        """
+        Reescribe el diario con un registro por sesión sin terminar (las
+        terminadas se descartan). Se reemplaza de forma atómica; se llama con el
+        bloqueo exclusivo para que ningún proceso anexe al archivo reemplazado
+        """
+        lineas = [_linea({'s': s['sesion'], 'e': s['examinador'], 't': s['actualizado'], 'c': s['campos']})
+                  for s in self._sesiones().values() if not s['terminada']]
+
+        descriptor, temporal = tempfile.mkstemp(dir=self.ruta.parent, prefix=self.ruta.name, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(b''.join(lineas))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, self.ruta)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+
+
+_diario = None
+_lock_diario = threading.Lock()
+
+def obtener_diario() -> DiarioCambios:
+    """Diario del proceso, abierto una sola vez (ruta configurable con WPPSI_DIARIO)"""
+    global _diario
+    if _diario is None:
+        with _lock_diario:
+            if _diario is None:
+                _diario = DiarioCambios()
+    return _diario
@@ -0,0 +1,155 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+PROCESAMIENTO DE UNA EVALUACIÓN WPPSI-IV
+Conversión, índices, análisis de perfil y recomendaciones automáticas
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+import os
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from .baremos import BaremosWPPSIUltra, INDICES_PRIMARIOS, MOTOR_INDICES
+from .cache import CacheLRU
+from .resultado import ResultadoEvaluacion
+
+# Memo de puntuaciones compartido por todas las sesiones del proceso
+CACHE_EVALUACIONES = CacheLRU(max_entradas=int(os.environ.get('WPPSI_CACHE_EVALUACIONES', 512)))
+
+
+def edad_en_meses(datos_personales: Dict) -> Optional[int]:
+    """Edad cronológica en meses a partir de las fechas de datos_personales (None si faltan)"""
+    try:
+        fecha_nac = datos_personales['fecha_nacimiento']
+        fecha_eval = datos_personales['fecha_evaluacion']
+        if isinstance(fecha_nac, str):
+            fecha_nac = date.fromisoformat(fecha_nac)
+        if isinstance(fecha_eval, str):
+            fecha_eval = date.fromisoformat(fecha_eval)
+        years, months, _ = BaremosWPPSIUltra.calcular_edad_exacta(fecha_nac, fecha_eval)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return years * 12 + months
+
+def clave_evaluacion(pruebas_aplicadas: Dict, pd_dict: Dict, edad_meses: Optional[int]) -> Optional[Tuple]:
+    """
+    Clave canónica del memo: pruebas en su orden (el orden se refleja en los
+    resultados), marca de aplicada, PD y edad. None si algún valor no es hashable
+    """
+    clave = (tuple((prueba, bool(aplicada), pd_dict.get(prueba)) for prueba, aplicada in pruebas_aplicadas.items()),
+             edad_meses)
+    try:
+        hash(clave)
+    except TypeError:
+        return None
+    return clave
+
+
+def procesar_evaluacion_completa(datos_personales: Dict, pruebas_aplicadas: Dict, pd_dict: Dict) -> ResultadoEvaluacion:
+    """
+    Procesa la evaluación WPPSI-IV de forma completa y genera todos los análisis
+    
+    Args:
+        datos_personales: Diccionario con datos del paciente (solo se usa la edad)
+        pruebas_aplicadas: Diccionario con pruebas marcadas como aplicadas
+        pd_dict: Diccionario con puntuaciones directas
+    
+    Returns:
+        ResultadoEvaluacion inmutable. Se memoriza en CACHE_EVALUACIONES y el mismo
+        objeto se comparte entre llamadas; resultado.a_dict() da el dict clásico
+    """
+    edad_meses = edad_en_meses(datos_personales)
+    clave = clave_evaluacion(pruebas_aplicadas, pd_dict, edad_meses)
+    encontrado, resultado = CACHE_EVALUACIONES.obtener(clave) if clave is not None else (False, None)
+    if not encontrado:
+        resultado = _puntuar_evaluacion(pruebas_aplicadas, pd_dict, edad_meses)
+        if clave is not None:
+            CACHE_EVALUACIONES.guardar(clave, resultado)
+    return resultado
+
+def _puntuar_evaluacion(pruebas_aplicadas: Dict, pd_dict: Dict, edad_meses: Optional[int] = None) -> ResultadoEvaluacion:
+    """Cálculo sin memo; de los datos personales solo usa la edad (banda de normas)"""
+    # 1. CONVERTIR PD A PE
+    pruebas, valores_pd, valores_pe = [], [], []
+    for prueba, aplicada in pruebas_aplicadas.items():
+        if aplicada and prueba in pd_dict and pd_dict[prueba] is not None:
+            puntuacion_directa = pd_dict[prueba]
+            pruebas.append(prueba)
+            valores_pd.append(puntuacion_directa)
+            valores_pe.append(BaremosWPPSIUltra.convertir_pd_a_pe(prueba, puntuacion_directa, edad_meses))
+    pe_dict = dict(zip(pruebas, valores_pe))
+    
+    # 2. CALCULAR SUMAS POR ÍNDICE PRIMARIO
+    sumas = dict.fromkeys(INDICES_PRIMARIOS, 0)
+    contadores = dict.fromkeys(INDICES_PRIMARIOS, 0)
+    
+    for prueba, pe in pe_dict.items():
+        if pe is not None:
+            indice = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]['indice_primario']
+            if indice in sumas:
+                sumas[indice] += pe
+                contadores[indice] += 1
+    
+    # 3. CALCULAR ÍNDICES COMPUESTOS PRIMARIOS
+    indices = tuple((indice, BaremosWPPSIUltra.calcular_indice_compuesto(suma, indice))
+                    for indice, suma in sumas.items() if contadores[indice] >= 2)
+    
+    # 4. CALCULAR CIT
+    cit = BaremosWPPSIUltra.calcular_cit_total(sum(valores_pe)) if len(pe_dict) >= 5 else None
+    
+    # 5. CALCULAR ÍNDICES SECUNDARIOS
+    secundarios = []
+    for idx_sec, config in BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG.items():
+        valores = [pe_dict[prueba] for prueba in config['pruebas'] if pe_dict.get(prueba) is not None]
+        
+        if len(valores) >= len(config['pruebas']) and idx_sec in MOTOR_INDICES.tablas:
+            ic_sec = MOTOR_INDICES.convertir(idx_sec, sum(valores))
+            if ic_sec:
+                secundarios.append((idx_sec, ic_sec))
+    
+    # Percentiles, categorías, fortalezas, estadísticas y recomendaciones
+    # se derivan bajo demanda en ResultadoEvaluacion
+    return ResultadoEvaluacion(
+        pruebas=tuple(pruebas),
+        valores_pd=tuple(valores_pd),
+        valores_pe=tuple(valores_pe),
+        sumas=tuple(sumas.values()),
+        indices=indices,
+        cit=cit,
+        secundarios=tuple(secundarios),
+        edad_meses=edad_meses,
+    )
+
+def generar_recomendaciones(resultados: Dict) -> List[str]:
+    """Genera recomendaciones automáticas a partir de 'cit', 'fortalezas' y 'debilidades'"""
+    recomendaciones = []
+    
+    # Recomendaciones por CIT
+    if resultados.get('cit'):
+        cit = resultados['cit']
+        if cit >= 120:
+            recomendaciones.append("Considerar programas de enriquecimiento académico")
+            recomendaciones.append("Promover actividades de pensamiento crítico y creativo")
+        elif cit <= 80:
+            recomendaciones.append("Considerar evaluación psicopedagógica complementaria")
+            recomendaciones.append("Implementar estrategias de apoyo individualizado")
+    
+    # Recomendaciones por fortalezas
+    if resultados.get('fortalezas'):
+        areas_fuertes = [f['indice'] for f in resultados['fortalezas']]
+        if 'ICV' in areas_fuertes:
+            recomendaciones.append("Aprovechar fortalezas verbales en el aprendizaje")
+        if 'IVE' in areas_fuertes:
+            recomendaciones.append("Utilizar material visual y espacial en la enseñanza")
+    
+    # Recomendaciones por debilidades
+    if resultados.get('debilidades'):
+        areas_debiles = [d['indice'] for d in resultados['debilidades']]
+        if 'IVP' in areas_debiles:
+            recomendaciones.append("Permitir tiempo adicional en tareas que requieren rapidez")
+            recomendaciones.append("Reducir carga de trabajo que dependa de velocidad de procesamiento")
+        if 'IMT' in areas_debiles:
+            recomendaciones.append("Simplificar instrucciones y presentarlas en pasos pequeños")
+            recomendaciones.append("Utilizar apoyos visuales y recordatorios")
+    
+    return recomendaciones
@@ -0,0 +1,205 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+GRÁFICOS VECTORIALES DEL INFORME PDF (REPORTLAB)
+Perfil escalar, índices compuestos y curva normal como Drawing nativos
+═══════════════════════════════════════════════════════════════════════════════
+Reproducen los gráficos de Plotly de la aplicación (colores, zonas, líneas de
+referencia y fondo de la plantilla por defecto) sin rasterizar: cada Drawing es
+un Flowable que se añade tal cual al documento, se dibuja en milisegundos y
+queda nítido a cualquier zoom. ReportLab se importa al llamar a las funciones.
+"""
+
+import math
+from typing import Dict, Optional, TYPE_CHECKING
+
+from .baremos import BaremosWPPSIUltra
+
+if TYPE_CHECKING:
+    from reportlab.graphics.shapes import Drawing
+
+# Colores de la plantilla de Plotly y de los gráficos de la aplicación
+FONDO_GRAFICO = '#E5ECF6'
+GRANATE = '#8B1538'
+AZUL_BARRAS = '#3498db'
+AZUL_CURVA = '#636efa'
+TEXTO = '#2a3f5f'
+ZONAS_PE = ((13, 19, (39, 174, 96, 0.12)), (8, 12, (243, 156, 18, 0.10)), (1, 7, (231, 76, 60, 0.12)))
+
+# Escala 'RdYlGn' de Plotly (marcadores del perfil, de PE 1 a 19)
+RDYLGN = ((165, 0, 38), (215, 48, 39), (244, 109, 67), (253, 174, 97), (254, 224, 139), (255, 255, 191),
+          (217, 239, 139), (166, 217, 106), (102, 189, 99), (26, 152, 80), (0, 104, 55))
+
+
+def _rgba(r: int, g: int, b: int, alfa: float = 1.0):
+    from reportlab.lib import colors
+    return colors.Color(r / 255, g / 255, b / 255, alpha=alfa)
+
+def _hex(codigo: str, alfa: float = 1.0):
+    codigo = codigo.lstrip('#')
+    return _rgba(*(int(codigo[i:i + 2], 16) for i in (0, 2, 4)), alfa)
+
+def color_rdylgn(valor: float, minimo: float = 1, maximo: float = 19):
+    """Color de la escala RdYlGn interpolado como en Plotly"""
+    t = min(max((valor - minimo) / (maximo - minimo), 0.0), 1.0) * (len(RDYLGN) - 1)
+    i = min(int(t), len(RDYLGN) - 2)
+    f = t - i
+    return _rgba(*(round(a + (b - a) * f) for a, b in zip(RDYLGN[i], RDYLGN[i + 1])))
+
+def _titulo(dibujo: 'Drawing', texto: str, tamano: int = 11):
+    from reportlab.graphics.shapes import String
+    dibujo.add(String(dibujo.width / 2, dibujo.height - tamano - 2, texto, textAnchor='middle',
+                      fontName='Helvetica-Bold', fontSize=tamano, fillColor=_hex(TEXTO)))
+
+def _escala(minimo: float, maximo: float, origen: float, longitud: float):
+    """Función valor -> coordenada de un eje lineal fijo"""
+    return lambda v: origen + (v - minimo) / (maximo - minimo) * longitud
+
+def _ejes_valor(eje, minimo: float, maximo: float, paso: float, tamano_fuente: int = 7):
+    """Eje de valores con rango fijo, rejilla blanca y sin línea de eje (estilo Plotly)"""
+    from reportlab.lib import colors
+    eje.valueMin, eje.valueMax, eje.valueStep = minimo, maximo, paso
+    eje.visibleAxis = 0
+    eje.visibleTicks = 0
+    eje.visibleGrid = 1
+    eje.gridStrokeColor = colors.white
+    eje.gridStrokeWidth = 0.8
+    eje.labels.fontName = 'Helvetica'
+    eje.labels.fontSize = tamano_fuente
+    eje.labels.fillColor = _hex(TEXTO)
+
+
+def dibujo_perfil_escalares(pe: Dict[str, Optional[int]], ancho: float = 500,
+                            alto: float = 250) -> Optional['Drawing']:
+    """Perfil de PE: zonas, media 10 y línea granate con marcadores coloreados por valor"""
+    from reportlab.graphics.charts.lineplots import LinePlot
+    from reportlab.graphics.shapes import Drawing, Line, Rect, String
+    from reportlab.graphics.widgets.markers import makeMarker
+
+    puntos = [(p, v) for p, v in pe.items() if v is not None]
+    if not puntos:
+        return None
+    nombres = [BaremosWPPSIUltra.PRUEBAS_INFO[p]['nombre'] for p, _ in puntos]
+
+    dibujo = Drawing(ancho, alto)
+    grafico = LinePlot()
+    grafico.x, grafico.y = 40, 75
+    grafico.width, grafico.height = ancho - 60, alto - 75 - 28
+    grafico.data = [[(i, v) for i, (_, v) in enumerate(puntos)]]
+    _ejes_valor(grafico.yValueAxis, 0, 20, 2)
+    grafico.xValueAxis.valueMin, grafico.xValueAxis.valueMax = -0.5, len(puntos) - 0.5
+    grafico.xValueAxis.valueSteps = list(range(len(puntos)))
+    grafico.xValueAxis.visibleAxis = grafico.xValueAxis.visibleTicks = 0
+    grafico.xValueAxis.labelTextFormat = lambda i: nombres[int(round(i))] if 0 <= i < len(nombres) else ''
+    grafico.xValueAxis.labels.angle = 45
+    grafico.xValueAxis.labels.boxAnchor = 'ne'
+    grafico.xValueAxis.labels.fontName = 'Helvetica'
+    grafico.xValueAxis.labels.fontSize = 7
+    grafico.xValueAxis.labels.fillColor = _hex(TEXTO)
+    grafico.lines[0].strokeColor = _hex(GRANATE)
+    grafico.lines[0].strokeWidth = 3
+    for j, (_, v) in enumerate(puntos):
+        marcador = makeMarker('FilledCircle', size=7)
+        marcador.fillColor = color_rdylgn(v)
+        marcador.strokeColor = None
+        grafico.lines[0, j].symbol = marcador
+
+    # Fondo, zonas y media debajo del gráfico (que aporta la rejilla, la línea y los marcadores)
+    y = _escala(0, 20, grafico.y, grafico.height)
+    dibujo.add(Rect(grafico.x, grafico.y, grafico.width, grafico.height, fillColor=_hex(FONDO_GRAFICO),
+                    strokeColor=None))
+    for desde, hasta, color in ZONAS_PE:
+        dibujo.add(Rect(grafico.x, y(desde), grafico.width, y(hasta) - y(desde), fillColor=_rgba(*color),
+                        strokeColor=None))
+    dibujo.add(Line(grafico.x, y(10), grafico.x + grafico.width, y(10), strokeColor=_hex('#7f8c8d'),
+                    strokeWidth=1.5, strokeDashArray=[1.5, 2]))
+    dibujo.add(grafico)
+
+    x = _escala(-0.5, len(puntos) - 0.5, grafico.x, grafico.width)
+    for i, (_, v) in enumerate(puntos):
+        dibujo.add(String(x(i), y(v) + 6, str(v), textAnchor='middle', fontName='Helvetica-Bold',
+                          fontSize=7, fillColor=_hex(TEXTO)))
+    _titulo(dibujo, 'PERFIL DE PUNTUACIONES ESCALARES (PE)')
+    return dibujo
+
+def dibujo_indices_compuestos(indices: Dict[str, Optional[int]], ancho: float = 450,
+                              alto: float = 220) -> Optional['Drawing']:
+    """Barras de los índices con su valor encima y la media 100 discontinua"""
+    from reportlab.graphics.charts.barcharts import VerticalBarChart
+    from reportlab.graphics.shapes import Drawing, Line, Rect
+    from reportlab.lib import colors
+
+    datos = [(k, v) for k, v in indices.items() if v is not None]
+    if not datos:
+        return None
+
+    dibujo = Drawing(ancho, alto)
+    grafico = VerticalBarChart()
+    grafico.x, grafico.y = 40, 25
+    grafico.width, grafico.height = ancho - 60, alto - 25 - 28
+    grafico.data = [[v for _, v in datos]]
+    _ejes_valor(grafico.valueAxis, 40, 160, 20)
+    grafico.categoryAxis.categoryNames = [k for k, _ in datos]
+    grafico.categoryAxis.visibleAxis = grafico.categoryAxis.visibleTicks = 0
+    grafico.categoryAxis.labels.fontName = 'Helvetica'
+    grafico.categoryAxis.labels.fontSize = 8
+    grafico.categoryAxis.labels.fillColor = _hex(TEXTO)
+    grafico.bars[0].fillColor = _hex(AZUL_BARRAS)
+    grafico.bars[0].strokeColor = colors.white
+    grafico.bars[0].strokeWidth = 1
+    grafico.barLabelFormat = '%d'
+    grafico.barLabels.nudge = 6
+    grafico.barLabels.fontName = 'Helvetica-Bold'
+    grafico.barLabels.fontSize = 8
+    grafico.barLabels.fillColor = _hex(TEXTO)
+
+    y = _escala(40, 160, grafico.y, grafico.height)
+    dibujo.add(Rect(grafico.x, grafico.y, grafico.width, grafico.height, fillColor=_hex(FONDO_GRAFICO),
+                    strokeColor=None))
+    dibujo.add(grafico)
+    dibujo.add(Line(grafico.x, y(100), grafico.x + grafico.width, y(100), strokeColor=_hex('#2c3e50'),
+                    strokeWidth=1, strokeDashArray=[4, 3]))
+    _titulo(dibujo, 'PERFIL DE ÍNDICES COMPUESTOS')
+    return dibujo
+
+
+def _densidad_normal(x: float, media: float = 100, de: float = 15) -> float:
+    return math.exp(-0.5 * ((x - media) / de) ** 2) / (de * math.sqrt(2 * math.pi))
+
+def dibujo_distribucion_normal(ci: Optional[int], ancho: float = 450, alto: float = 200,
+                               puntos: int = 241) -> Optional['Drawing']:
+    """Curva N(100, 15) rellena con la posición del CI marcada en rojo"""
+    from reportlab.graphics.charts.lineplots import LinePlot
+    from reportlab.graphics.shapes import Drawing, Line, Rect, String
+
+    if ci is None:
+        return None
+    curva = [(40 + 120 * i / (puntos - 1), _densidad_normal(40 + 120 * i / (puntos - 1))) for i in range(puntos)]
+    maximo = _densidad_normal(100) * 1.05
+
+    dibujo = Drawing(ancho, alto)
+    grafico = LinePlot()
+    grafico.x, grafico.y = 20, 30
+    grafico.width, grafico.height = ancho - 40, alto - 30 - 28
+    grafico.data = [curva]
+    _ejes_valor(grafico.xValueAxis, 40, 160, 20)
+    grafico.xValueAxis.visibleGrid = 1
+    grafico.yValueAxis.valueMin, grafico.yValueAxis.valueMax = 0, maximo
+    grafico.yValueAxis.visibleAxis = grafico.yValueAxis.visibleTicks = grafico.yValueAxis.visibleLabels = 0
+    grafico.lines[0].strokeColor = _hex(AZUL_CURVA)
+    grafico.lines[0].strokeWidth = 1.5
+    grafico.lines[0].inFill = True
+    grafico.lines[0].fillColor = _hex(AZUL_CURVA, 0.5)
+
+    x = _escala(40, 160, grafico.x, grafico.width)
+    marca = x(min(max(ci, 40), 160))
+    dibujo.add(Rect(grafico.x, grafico.y, grafico.width, grafico.height, fillColor=_hex(FONDO_GRAFICO),
+                    strokeColor=None))
+    dibujo.add(grafico)
+    dibujo.add(Line(marca, grafico.y, marca, grafico.y + grafico.height, strokeColor=_hex('#ff0000'),
+                    strokeWidth=1.2, strokeDashArray=[4, 3]))
+    dibujo.add(String(marca + 3, grafico.y + grafico.height - 9, f"CI: {ci}", fontName='Helvetica',
+                      fontSize=8, fillColor=_hex(TEXTO)))
+    dibujo.add(String(ancho / 2, 5, 'CI', textAnchor='middle', fontName='Helvetica', fontSize=8,
+                      fillColor=_hex(TEXTO)))
+    _titulo(dibujo, 'POSICIÓN EN LA CURVA NORMAL')
+    return dibujo
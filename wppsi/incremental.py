@@ -0,0 +1,147 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+RECÁLCULO INCREMENTAL DE ÍNDICES
+Grafo prueba -> compuestos: al cambiar una PD solo se recalcula lo que depende de ella
+═══════════════════════════════════════════════════════════════════════════════
+Las reglas son las de procesar_evaluacion_completa: un índice primario necesita
+2 pruebas, el CIT 5 pruebas (suma de todas las PE) y un índice secundario todas
+sus pruebas. Las sumas se mantienen por diferencias, así que actualizar una PD
+cuesta una conversión y unas pocas búsquedas en tabla.
+"""
+
+from typing import Dict, Optional, Tuple
+
+from .baremos import BaremosWPPSIUltra, INDICES_PRIMARIOS, MOTOR_INDICES
+
+INDICES_SECUNDARIOS = tuple(BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG)
+COMPUESTOS = INDICES_PRIMARIOS + ('CIT',) + INDICES_SECUNDARIOS
+
+# Pruebas necesarias para calcular cada compuesto
+MINIMO_PRUEBAS = {
+    **dict.fromkeys(INDICES_PRIMARIOS, 2),
+    'CIT': 5,
+    **{idx: len(config['pruebas']) for idx, config in BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG.items()},
+}
+
+
+def construir_grafo_dependencias() -> Dict[str, Tuple[str, ...]]:
+    """Compuestos que dependen de cada prueba (índice primario, CIT y secundarios)"""
+    grafo = {}
+    for prueba, info in BaremosWPPSIUltra.PRUEBAS_INFO.items():
+        dependientes = [info['indice_primario']] if info['indice_primario'] in INDICES_PRIMARIOS else []
+        dependientes.append('CIT')
+        dependientes.extend(idx for idx, config in BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG.items()
+                            if prueba in config['pruebas'])
+        grafo[prueba] = tuple(dependientes)
+    return grafo
+
+GRAFO_DEPENDENCIAS = construir_grafo_dependencias()
+
+
+class PuntuacionIncremental:
+    """Estado de puntuación de una evaluación en curso que se actualiza prueba a prueba"""
+
+    def __init__(self, edad_meses: Optional[int] = None):
+        self._reiniciar(edad_meses)
+
+    def _reiniciar(self, edad_meses: Optional[int]):
+        self.edad_meses = edad_meses
+        self.pd: Dict[str, int] = {}
+        self.pe: Dict[str, int] = {}
+        self.sumas = dict.fromkeys(COMPUESTOS, 0)
+        self.contadores = dict.fromkeys(COMPUESTOS, 0)
+        self.valores: Dict[str, Optional[int]] = {}
+
+    def actualizar(self, prueba: str, puntuacion_directa) -> Tuple[str, ...]:
+        """
+        Registra la PD de una prueba y recalcula solo los compuestos afectados
+
+        Returns:
+            Compuestos recalculados (vacío si la PD no cambió)
+        """
+        if puntuacion_directa is None or puntuacion_directa == '':
+            return self.quitar(prueba)
+        if prueba in self.pe and self.pd[prueba] == puntuacion_directa:
+            return ()
+
+        pe = BaremosWPPSIUltra.convertir_pd_a_pe(prueba, puntuacion_directa, self.edad_meses)
+        anterior = self.pe.get(prueba)
+        self.pd[prueba] = puntuacion_directa
+        self.pe[prueba] = pe
+
+        dependientes = GRAFO_DEPENDENCIAS.get(prueba, ('CIT',))
+        for compuesto in dependientes:
+            self.sumas[compuesto] += pe - (anterior or 0)
+            if anterior is None:
+                self.contadores[compuesto] += 1
+        return self._recalcular(dependientes)
+
+    def quitar(self, prueba: str) -> Tuple[str, ...]:
+        """Elimina una prueba (desmarcada o sin PD) y recalcula sus compuestos"""
+        if prueba not in self.pe:
+            return ()
+        del self.pd[prueba]
+        anterior = self.pe.pop(prueba)
+
+        dependientes = GRAFO_DEPENDENCIAS.get(prueba, ('CIT',))
+        for compuesto in dependientes:
+            self.sumas[compuesto] -= anterior
+            self.contadores[compuesto] -= 1
+        return self._recalcular(dependientes)
+
+    def sincronizar(self, pd_dict: Dict[str, int], edad_meses: Optional[int] = None) -> Tuple[str, ...]:
+        """
+        Alinea el estado con un diccionario de PD completo. Un cambio de edad (otra
+        banda de normas) obliga a reconvertir todas las pruebas
+
+        Returns:
+            Compuestos recalculados
+        """
+        if edad_meses != self.edad_meses:
+            self._reiniciar(edad_meses)
+            for prueba, puntuacion_directa in pd_dict.items():
+                self.actualizar(prueba, puntuacion_directa)
+            return COMPUESTOS
+
+        cambiados = []
+        for prueba in [p for p in self.pe if p not in pd_dict]:
+            cambiados.extend(self.quitar(prueba))
+        for prueba, puntuacion_directa in pd_dict.items():
+            cambiados.extend(self.actualizar(prueba, puntuacion_directa))
+        return tuple(dict.fromkeys(cambiados))
+
+    def _recalcular(self, compuestos: Tuple[str, ...]) -> Tuple[str, ...]:
+        for compuesto in compuestos:
+            suma = self.sumas[compuesto]
+            if self.contadores[compuesto] < MINIMO_PRUEBAS[compuesto]:
+                self.valores.pop(compuesto, None)
+            elif compuesto == 'CIT':
+                self.valores[compuesto] = BaremosWPPSIUltra.calcular_cit_total(suma)
+            elif compuesto in INDICES_PRIMARIOS:
+                self.valores[compuesto] = BaremosWPPSIUltra.calcular_indice_compuesto(suma, compuesto)
+            else:
+                valor = MOTOR_INDICES.convertir(compuesto, suma) if compuesto in MOTOR_INDICES.tablas else None
+                if valor:
+                    self.valores[compuesto] = valor
+                else:
+                    self.valores.pop(compuesto, None)
+        return compuestos
+
+    # ───────────── Consultas ─────────────
+
+    @property
+    def cit(self) -> Optional[int]:
+        return self.valores.get('CIT')
+
+    @property
+    def indices_primarios(self) -> Dict[str, Optional[int]]:
+        """Índices primarios calculados más 'CIT', en el orden de los resultados"""
+        return {k: self.valores[k] for k in INDICES_PRIMARIOS + ('CIT',) if k in self.valores}
+
+    @property
+    def indices_secundarios(self) -> Dict[str, int]:
+        return {k: self.valores[k] for k in INDICES_SECUNDARIOS if k in self.valores}
+
+    @property
+    def sumas_indices(self) -> Dict[str, int]:
+        return {k: self.sumas[k] for k in INDICES_PRIMARIOS}
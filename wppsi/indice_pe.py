@@ -0,0 +1,242 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+ÍNDICE COLUMNAR DE PERFILES PE (MEMMAP)
+PE, compuestos, edad e id de cada evaluación guardada, en columnas de ancho fijo
+═══════════════════════════════════════════════════════════════════════════════
+Un directorio con un archivo por columna y una cabecera (little endian):
+
+    cabecera.bin   8s magic 'WPPSICOL', H versión, I filas, I activas,
+                   I crc32 de los nombres de columna, 26s última 'actualizada'
+    id.i8          int64                 id de la evaluación (creciente)
+    pe.i1          int8  [filas][15]     PE en el orden de PRUEBAS_INFO (0 = no aplicada)
+    compuestos.i2  int16 [filas][10]     COMPUESTOS (0 = no calculado)
+    edad.i2        int16                 edad en meses (-1 = desconocida)
+    activa.u1      uint8                 0 si la evaluación se eliminó
+
+Los datos se escriben antes que la cabecera: lo que haya más allá de `filas`
+se ignora y se sobrescribe en el siguiente alta. Reemplazar una evaluación
+reescribe su fila en el sitio (los ids llegan ordenados de SQLite). El
+almacén compara `activas` y la última 'actualizada' con la base al abrir el
+índice y lo reconstruye si no coinciden.
+
+Varios procesos pueden compartir la base (WAL) y con ella el índice: el
+almacén solo lo escribe dentro de una transacción de escritura de SQLite, que
+ordena a todos los procesos, y antes de cada alta o baja vuelve a leer la
+cabecera y la compara con la base. Si otro proceso lo dejó desfasado, se
+reconstruye en vez de escribir encima.
+"""
+
+import os
+import struct
+import threading
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Optional, Tuple, TYPE_CHECKING
+
+from .baremos import BaremosWPPSIUltra
+from .incremental import COMPUESTOS
+from .resultado import ResultadoEvaluacion
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MAGIC = b'WPPSICOL'
+VERSION = 1
+CABECERA = struct.Struct('<8sHIII26s')
+
+PRUEBAS = tuple(BaremosWPPSIUltra.PRUEBAS_INFO)
+ESQUEMA = zlib.crc32('\0'.join(PRUEBAS + ('|',) + COMPUESTOS).encode('utf-8'))
+
+# nombre -> (archivo, dtype, ancho)
+COLUMNAS = {
+    'id': ('id.i8', '<i8', 1),
+    'pe': ('pe.i1', 'i1', len(PRUEBAS)),
+    'compuestos': ('compuestos.i2', '<i2', len(COMPUESTOS)),
+    'edad': ('edad.i2', '<i2', 1),
+    'activa': ('activa.u1', 'u1', 1),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class VistaIndicePE:
+    """Columnas del índice como memmaps de solo lectura (sin copia)"""
+    ids: 'np.ndarray'
+    pe: 'np.ndarray'
+    compuestos: 'np.ndarray'
+    edad_meses: 'np.ndarray'
+    activa: 'np.ndarray'
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class IndicePE:
+    """Índice columnar de un almacén; se escribe con el bloqueo de escritura de la base"""
+
+    def __init__(self, directorio):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.filas, self.activas, self.actualizada = 0, 0, ''
+        self.desfasado = False
+        self._leer_cabecera()
+
+    # ───────────── Cabecera ─────────────
+
+    def _leer_cabecera(self):
+        ruta = self.directorio / 'cabecera.bin'
+        if not ruta.exists() or ruta.stat().st_size != CABECERA.size:
+            return
+        magic, version, filas, activas, esquema, actualizada = CABECERA.unpack(ruta.read_bytes())
+        if magic != MAGIC or version != VERSION or esquema != ESQUEMA:
+            return
+        # Una columna más corta que `filas` (archivo truncado o borrado) invalida el índice
+        import numpy as np
+        for archivo, dtype, ancho in COLUMNAS.values():
+            ruta_columna = self.directorio / archivo
+            if not ruta_columna.exists() or ruta_columna.stat().st_size < filas * ancho * np.dtype(dtype).itemsize:
+                return
+        self.filas, self.activas = filas, activas
+        self.actualizada = actualizada.rstrip(b'\0').decode('ascii')
+
+    def _recargar(self):
+        self.filas, self.activas, self.actualizada = 0, 0, ''
+        self._leer_cabecera()
+
+    def recargar(self):
+        """Vuelve a leer la cabecera (otro proceso con la misma base pudo escribir el índice)"""
+        with self._lock:
+            self._recargar()
+
+    def _escribir_cabecera(self):
+        with open(self.directorio / 'cabecera.bin', 'wb') as f:
+            f.write(CABECERA.pack(MAGIC, VERSION, self.filas, self.activas, ESQUEMA,
+                                  self.actualizada.encode('ascii')))
+
+    def sincronizado(self, activas: int, actualizada: Optional[str]) -> bool:
+        """True si el índice refleja una base con esas activas y esa última modificación"""
+        return self.activas == activas and self.actualizada == (actualizada or '')
+
+    # ───────────── Escritura ─────────────
+
+    def _fila(self, evaluacion_id: int) -> Optional[int]:
+        """Posición de un id (los ids están ordenados), o None"""
+        if not self.filas:
+            return None
+        ids = self._columna('id')
+        posicion = int(ids.searchsorted(evaluacion_id))
+        return posicion if posicion < self.filas and ids[posicion] == evaluacion_id else None
+
+    def _escribir_fila(self, posicion: int, valores: dict):
+        import numpy as np
+        for nombre, (archivo, dtype, ancho) in COLUMNAS.items():
+            datos = np.asarray(valores[nombre], dtype=dtype).reshape(ancho).tobytes()
+            with open(self.directorio / archivo, 'r+b' if (self.directorio / archivo).exists() else 'wb') as f:
+                f.seek(posicion * len(datos))
+                f.write(datos)
+
+    def agregar(self, evaluacion_id: int, resultado: ResultadoEvaluacion, actualizada: str):
+        """Alta o reemplazo de una evaluación"""
+        pe = resultado.pe
+        compuestos = dict(resultado.compuestos())
+        valores = {
+            'id': evaluacion_id,
+            'pe': [pe.get(p) or 0 for p in PRUEBAS],
+            'compuestos': [compuestos.get(c) or 0 for c in COMPUESTOS],
+            'edad': resultado.edad_meses if resultado.edad_meses is not None else -1,
+            'activa': 1,
+        }
+        with self._lock:
+            posicion = self._fila(evaluacion_id)
+            if posicion is None:
+                if self.filas and evaluacion_id < int(self._columna('id')[self.filas - 1]):
+                    raise ValueError(f"id {evaluacion_id} fuera de orden: hay que reconstruir el índice")
+                posicion = self.filas
+                self.filas += 1
+                self.activas += 1
+            elif not self._columna('activa')[posicion]:
+                self.activas += 1
+            self._escribir_fila(posicion, valores)
+            self.actualizada = actualizada
+            self._escribir_cabecera()
+
+    def quitar(self, evaluacion_id: int, actualizada: Optional[str]):
+        """Marca una evaluación eliminada (la fila se conserva hasta reconstruir)"""
+        with self._lock:
+            posicion = self._fila(evaluacion_id)
+            if posicion is not None and self._columna('activa')[posicion]:
+                with open(self.directorio / COLUMNAS['activa'][0], 'r+b') as f:
+                    f.seek(posicion)
+                    f.write(b'\0')
+                self.activas -= 1
+            self.actualizada = actualizada or ''
+            self._escribir_cabecera()
+
+    def reconstruir(self, evaluaciones: Iterable[Tuple[int, Optional[int]]],
+                    puntuaciones: Iterable[Tuple[int, str, int]],
+                    compuestos: Iterable[Tuple[int, str, int]], actualizada: Optional[str]):
+        """
+        Reescribe el índice completo
+
+        Args:
+            evaluaciones: (id, edad_meses) ordenadas por id
+            puntuaciones: (evaluacion_id, prueba, pe) con pe no nula
+            compuestos: (evaluacion_id, compuesto, valor)
+        """
+        import numpy as np
+
+        evaluaciones = list(evaluaciones)
+        n = len(evaluaciones)
+        ids = np.fromiter((e[0] for e in evaluaciones), dtype=np.int64, count=n)
+        columnas = {
+            'id': ids,
+            'pe': np.zeros((n, len(PRUEBAS)), dtype=np.int8),
+            'compuestos': np.zeros((n, len(COMPUESTOS)), dtype=np.int16),
+            'edad': np.fromiter((-1 if e[1] is None else e[1] for e in evaluaciones), dtype=np.int16, count=n),
+            'activa': np.ones(n, dtype=np.uint8),
+        }
+        for nombre, filas, orden in (('pe', puntuaciones, PRUEBAS), ('compuestos', compuestos, COMPUESTOS)):
+            posicion = {medida: i for i, medida in enumerate(orden)}
+            filas = [f for f in filas if f[1] in posicion]
+            if filas:
+                destino = columnas[nombre]
+                evaluacion = np.fromiter((f[0] for f in filas), dtype=np.int64, count=len(filas))
+                columna = np.fromiter((posicion[f[1]] for f in filas), dtype=np.intp, count=len(filas))
+                destino[ids.searchsorted(evaluacion), columna] = np.fromiter(
+                    (f[2] for f in filas), dtype=destino.dtype, count=len(filas))
+
+        with self._lock:
+            for nombre, (archivo, dtype, _) in COLUMNAS.items():
+                temporal = self.directorio / (archivo + '.tmp')
+                columnas[nombre].astype(dtype, copy=False).tofile(temporal)
+                os.replace(temporal, self.directorio / archivo)
+            self.filas = self.activas = n
+            self.actualizada = actualizada or ''
+            self.desfasado = False
+            self._escribir_cabecera()
+
+    # ───────────── Lectura ─────────────
+
+    def _columna(self, nombre: str) -> 'np.ndarray':
+        import numpy as np
+        archivo, dtype, ancho = COLUMNAS[nombre]
+        if not self.filas:
+            return np.zeros((0, ancho) if ancho > 1 else 0, dtype=dtype)
+        forma = (self.filas, ancho) if ancho > 1 else (self.filas,)
+        return np.memmap(self.directorio / archivo, dtype=dtype, mode='r', shape=forma)
+
+    def vista(self) -> VistaIndicePE:
+        """
+        Instantánea de las filas escritas hasta ahora (incluye las inactivas), según
+        la cabecera en disco: pueden venir de otro proceso
+        """
+        with self._lock:
+            self._recargar()
+            return VistaIndicePE(
+                ids=self._columna('id'),
+                pe=self._columna('pe'),
+                compuestos=self._columna('compuestos'),
+                edad_meses=self._columna('edad'),
+                activa=self._columna('activa'),
+            )
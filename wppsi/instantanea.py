@@ -0,0 +1,217 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+INSTANTÁNEAS DE SESIÓN EN FORMATO BINARIO COMPRIMIDO
+Datos del paciente, pruebas, PD, observaciones, resultados y gráficos ya generados
+═══════════════════════════════════════════════════════════════════════════════
+Formato (little endian):
+
+    cabecera   8s magic 'WPPSISNP', H versión, I longitud descomprimida, I crc32
+    cuerpo     zlib( secciones )
+    sección    H longitud del nombre, nombre UTF-8, I longitud, datos
+
+La sección 'estado' es JSON compacto con los campos de la sesión y el
+resultado en su forma de tupla (ResultadoEvaluacion.a_tupla); cada gráfico va en
+su propia sección 'grafico:<nombre>' con el JSON de Plotly tal cual, para no
+tener que volver a generarlo al restaurar. No se usa pickle: el archivo
+llega de una subida del usuario, así que además del checksum se comprueba que
+pruebas y PD sean los que la aplicación puede producir y se vuelve a puntuar a
+partir de ellas (microsegundos). Si el resultado guardado no coincide con el
+puntuado se descarta junto con sus gráficos, que solo se reutilizan cuando
+corresponden al resultado restaurado.
+"""
+
+import json
+import struct
+import zlib
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Optional
+
+from .baremos import BaremosWPPSIUltra, INDICES_PRIMARIOS, TABLA_METRICAS
+from .evaluacion import procesar_evaluacion_completa
+from .resultado import ResultadoEvaluacion
+
+MAGIC = b'WPPSISNP'
+VERSION = 1
+CABECERA = struct.Struct('<8sHII')
+LONGITUD_NOMBRE = struct.Struct('<H')
+LONGITUD_DATOS = struct.Struct('<I')
+
+MAX_BYTES_DESCOMPRIMIDOS = 32 * 1024 * 1024
+PREFIJO_GRAFICO = 'grafico:'
+
+
+class ErrorInstantanea(ValueError):
+    """El archivo no es una instantánea válida de esta aplicación"""
+
+
+@dataclass(frozen=True, slots=True)
+class Instantanea:
+    campos: Dict                                    # Campos de la sesión (fechas como date)
+    resultado: Optional[ResultadoEvaluacion] = None
+    graficos: Dict[str, str] = field(default_factory=dict)   # nombre -> JSON de Plotly
+
+
+def _codificar(valor):
+    if isinstance(valor, date):
+        return {'$fecha': valor.isoformat()}
+    raise TypeError(f"Valor no serializable en la instantánea: {type(valor).__name__}")
+
+def _decodificar(objeto: Dict):
+    if objeto.keys() == {'$fecha'}:
+        return date.fromisoformat(objeto['$fecha'])
+    return objeto
+
+
+def _es_entero(valor, minimo: int, maximo: int) -> bool:
+    return isinstance(valor, int) and not isinstance(valor, bool) and minimo <= valor <= maximo
+
+def _validar_campos(campos: Dict):
+    """Las pruebas de los campos deben existir y sus PD estar en el rango de cada prueba"""
+    if not isinstance(campos, dict):
+        raise ErrorInstantanea("Campos de la sesión inválidos")
+    for campo in ('pruebas_aplicadas', 'pd_dict'):
+        valores = campos.get(campo, {})
+        if not isinstance(valores, dict):
+            raise ErrorInstantanea(f"Campo '{campo}' inválido")
+        desconocidas = set(valores) - set(BaremosWPPSIUltra.PRUEBAS_INFO)
+        if desconocidas:
+            raise ErrorInstantanea(f"Pruebas desconocidas en '{campo}': {', '.join(sorted(desconocidas))}")
+    for prueba, pd in campos.get('pd_dict', {}).items():
+        minimo, maximo = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]['rango_pd']
+        if not _es_entero(pd, minimo, maximo):
+            raise ErrorInstantanea(f"PD de {prueba} fuera de rango: {pd!r}")
+
+def _validar_resultado(resultado: ResultadoEvaluacion):
+    """El resultado guardado debe poder haberlo producido procesar_evaluacion_completa"""
+    pruebas = resultado.pruebas
+    desconocidas = set(pruebas) - set(BaremosWPPSIUltra.PRUEBAS_INFO)
+    if desconocidas:
+        raise ErrorInstantanea(f"Pruebas desconocidas en el resultado: {', '.join(sorted(map(str, desconocidas)))}")
+    if len(set(pruebas)) != len(pruebas):
+        raise ErrorInstantanea("Pruebas repetidas en el resultado")
+    if not len(resultado.valores_pd) == len(resultado.valores_pe) == len(pruebas):
+        raise ErrorInstantanea("PD y PE no están alineadas con las pruebas del resultado")
+    if len(resultado.sumas) != len(INDICES_PRIMARIOS):
+        raise ErrorInstantanea("Sumas de PE incompletas en el resultado")
+
+    for prueba, pd, pe in zip(pruebas, resultado.valores_pd, resultado.valores_pe):
+        minimo, maximo = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]['rango_pd']
+        if not _es_entero(pd, minimo, maximo):
+            raise ErrorInstantanea(f"PD de {prueba} fuera de rango: {pd!r}")
+        if not _es_entero(pe, 1, 19):
+            raise ErrorInstantanea(f"PE de {prueba} fuera de rango: {pe!r}")
+    if not all(_es_entero(suma, 0, 19 * len(pruebas)) for suma in resultado.sumas):
+        raise ErrorInstantanea("Suma de PE fuera de rango")
+
+    for grupo, validos in ((resultado.indices, INDICES_PRIMARIOS),
+                           (resultado.secundarios, BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG)):
+        nombres = [nombre for nombre, _ in grupo]
+        if len(set(nombres)) != len(nombres) or not set(nombres) <= set(validos):
+            raise ErrorInstantanea(f"Índices desconocidos o repetidos en el resultado: {', '.join(map(str, nombres))}")
+    for nombre, valor in (*resultado.indices, *resultado.secundarios, ('CIT', resultado.cit)):
+        if valor is not None and not _es_entero(valor, TABLA_METRICAS.minimo, TABLA_METRICAS.maximo):
+            raise ErrorInstantanea(f"{nombre} fuera de rango: {valor!r}")
+    if resultado.edad_meses is not None and not _es_entero(resultado.edad_meses, 0, 1200):
+        raise ErrorInstantanea(f"Edad fuera de rango: {resultado.edad_meses!r}")
+
+def _puntuar_campos(campos: Dict) -> ResultadoEvaluacion:
+    """Resultado que producen las fechas, pruebas y PD de los campos ya validados"""
+    # Las fechas como texto, igual que los datos personales de la sesión (sin fecha: sin edad)
+    datos_personales = {campo: str(campos.get(campo)) for campo in ('fecha_nacimiento', 'fecha_evaluacion')}
+    return procesar_evaluacion_completa(datos_personales, campos.get('pruebas_aplicadas', {}),
+                                        campos.get('pd_dict', {}))
+
+def _validar_grafico(nombre: str, grafico: str):
+    if not isinstance(json.loads(grafico), dict):
+        raise ErrorInstantanea(f"Gráfico '{nombre}' inválido")
+
+
+def crear_instantanea(instantanea: Instantanea, nivel: int = 6) -> bytes:
+    """Serializa una instantánea"""
+    estado = json.dumps(
+        {'campos': instantanea.campos,
+         'resultado': instantanea.resultado.a_tupla() if instantanea.resultado is not None else None},
+        ensure_ascii=False, separators=(',', ':'), default=_codificar
+    ).encode('utf-8')
+
+    secciones = [('estado', estado)]
+    secciones.extend((PREFIJO_GRAFICO + nombre, grafico.encode('utf-8'))
+                     for nombre, grafico in instantanea.graficos.items())
+
+    partes = []
+    for nombre, datos in secciones:
+        nombre = nombre.encode('utf-8')
+        partes += [LONGITUD_NOMBRE.pack(len(nombre)), nombre, LONGITUD_DATOS.pack(len(datos)), datos]
+    cuerpo = b''.join(partes)
+
+    comprimido = zlib.compress(cuerpo, nivel)
+    return CABECERA.pack(MAGIC, VERSION, len(cuerpo), zlib.crc32(comprimido)) + comprimido
+
+
+def leer_instantanea(datos: bytes) -> Instantanea:
+    """
+    Lee una instantánea validando magic, versión, checksum, tamaño y que pruebas,
+    PD, PE e índices sean valores que la aplicación puede producir. El resultado
+    devuelto es siempre el que dan las PD de los campos: si el guardado no
+    coincide se reemplaza y los gráficos guardados se descartan
+
+    Raises:
+        ErrorInstantanea: Si el archivo está dañado o no es una instantánea
+    """
+    if len(datos) < CABECERA.size:
+        raise ErrorInstantanea("Archivo demasiado corto")
+    magic, version, longitud, crc = CABECERA.unpack_from(datos, 0)
+    if magic != MAGIC:
+        raise ErrorInstantanea("No es una instantánea WPPSI")
+    if version > VERSION:
+        raise ErrorInstantanea(f"Versión {version} creada por una aplicación más nueva")
+    if version < 1:
+        raise ErrorInstantanea(f"Versión {version} inválida")
+    comprimido = memoryview(datos)[CABECERA.size:]
+    if zlib.crc32(comprimido) != crc:
+        raise ErrorInstantanea("Checksum incorrecto (archivo dañado)")
+    if longitud > MAX_BYTES_DESCOMPRIMIDOS:
+        raise ErrorInstantanea("Instantánea demasiado grande")
+
+    try:
+        descompresor = zlib.decompressobj()
+        cuerpo = descompresor.decompress(comprimido, longitud)
+    except zlib.error as e:
+        raise ErrorInstantanea(f"Contenido comprimido inválido: {e}") from e
+    if len(cuerpo) != longitud or descompresor.unconsumed_tail:
+        raise ErrorInstantanea("Longitud descomprimida inesperada")
+
+    secciones = {}
+    posicion = 0
+    try:
+        while posicion < len(cuerpo):
+            (n,) = LONGITUD_NOMBRE.unpack_from(cuerpo, posicion)
+            posicion += LONGITUD_NOMBRE.size
+            nombre = cuerpo[posicion:posicion + n].decode('utf-8')
+            posicion += n
+            (n,) = LONGITUD_DATOS.unpack_from(cuerpo, posicion)
+            posicion += LONGITUD_DATOS.size
+            secciones[nombre] = cuerpo[posicion:posicion + n]
+            posicion += n
+        estado = json.loads(secciones['estado'], object_hook=_decodificar)
+        campos = estado['campos']
+        resultado = ResultadoEvaluacion.desde_tupla(estado['resultado']) if estado['resultado'] else None
+        graficos = {nombre[len(PREFIJO_GRAFICO):]: datos.decode('utf-8')
+                    for nombre, datos in secciones.items() if nombre.startswith(PREFIJO_GRAFICO)}
+        _validar_campos(campos)
+        if resultado is not None:
+            _validar_resultado(resultado)
+            puntuado = _puntuar_campos(campos)
+            if puntuado != resultado:
+                resultado, graficos = puntuado, {}
+        else:
+            graficos = {}
+        for nombre, grafico in graficos.items():
+            _validar_grafico(nombre, grafico)
+    except ErrorInstantanea:
+        raise
+    except (struct.error, UnicodeDecodeError, KeyError, TypeError, ValueError) as e:
+        raise ErrorInstantanea(f"Contenido inválido: {e}") from e
+
+    return Instantanea(campos=campos, resultado=resultado, graficos=graficos)
@@ -0,0 +1,146 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+ANÁLISIS LONGITUDINAL DE RETEST
+Cambios entre evaluaciones sucesivas de un paciente y su significación
+═══════════════════════════════════════════════════════════════════════════════
+Toda la historia se carga con una consulta (AlmacenEvaluaciones.trayectoria)
+y se pasa a una matriz evaluación x medida. Los cambios se calculan para
+todas las celdas a la vez y se marcan como significativos cuando superan el
+cambio mínimo fiable al 90%: 1.645 * √2 * SEM.
+"""
+
+import math
+from typing import Dict, List, Optional, Sequence, Tuple, TYPE_CHECKING
+
+from .baremos import BaremosWPPSIUltra
+from .incremental import COMPUESTOS
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+# Error típico de medida. Compuestos: el mismo margen del IC 90% (6 puntos = SEM * 1.645);
+# PE: aproximado según manual WPPSI-IV (DE 3, fiabilidad ~0.85)
+SEM_COMPUESTO = 6 / 1.645
+SEM_PE = 1.2
+Z_90 = 1.645
+
+CAMBIO_MINIMO_COMPUESTO = Z_90 * math.sqrt(2) * SEM_COMPUESTO
+CAMBIO_MINIMO_PE = Z_90 * math.sqrt(2) * SEM_PE
+
+
+class AnalisisRetest:
+    """
+    Historia de un paciente como matrices (filas: evaluaciones en orden
+    cronológico, columnas: medidas). NaN indica medida no disponible
+    """
+
+    def __init__(self, evaluaciones: Sequence[int], fechas: Sequence[str], edades_meses: Sequence[Optional[int]],
+                 medidas: Sequence[str], compuestas: 'np.ndarray', valores: 'np.ndarray'):
+        import numpy as np
+
+        self.evaluaciones = tuple(evaluaciones)
+        self.fechas = tuple(fechas)
+        self.edades_meses = tuple(edades_meses)
+        self.medidas = tuple(medidas)
+        self.compuestas = compuestas                    # bool por medida
+        self.valores = valores
+
+        self.umbral = np.where(compuestas, CAMBIO_MINIMO_COMPUESTO, CAMBIO_MINIMO_PE)
+        self.cambio_previo = valores - self._ultimo_valor_anterior(valores)
+        self.cambio_base = valores - self._primer_valor(valores)
+        with np.errstate(invalid='ignore'):
+            self.significativo = np.abs(self.cambio_previo) > self.umbral
+
+    @staticmethod
+    def _ultimo_valor_anterior(valores: 'np.ndarray') -> 'np.ndarray':
+        """Para cada celda, el valor de la última evaluación anterior que midió esa columna"""
+        import numpy as np
+        n_filas, n_columnas = valores.shape
+        filas = np.where(~np.isnan(valores), np.arange(n_filas)[:, None], -1)
+        ultima = np.maximum.accumulate(filas, axis=0)
+        anterior = np.vstack([np.full((1, n_columnas), -1), ultima[:-1]])
+        resultado = valores[np.clip(anterior, 0, None), np.arange(n_columnas)]
+        resultado[anterior < 0] = np.nan
+        return resultado
+
+    @staticmethod
+    def _primer_valor(valores: 'np.ndarray') -> 'np.ndarray':
+        import numpy as np
+        medido = ~np.isnan(valores)
+        primera = np.where(medido.any(axis=0), medido.argmax(axis=0), 0)
+        return valores[primera, np.arange(valores.shape[1])][None, :]
+
+    @property
+    def n_evaluaciones(self) -> int:
+        return len(self.evaluaciones)
+
+    def serie(self, medida: str) -> 'np.ndarray':
+        return self.valores[:, self.medidas.index(medida)]
+
+    def tabla_cambios(self, solo_compuestos: Optional[bool] = None) -> 'pd.DataFrame':
+        """
+        Una fila por medida y evaluación posterior a la primera: valor, cambio
+        respecto a la anterior y a la línea base, y si el cambio es significativo
+        """
+        import numpy as np
+        import pandas as pd
+
+        columnas = np.arange(len(self.medidas))
+        if solo_compuestos is not None:
+            columnas = columnas[self.compuestas == solo_compuestos]
+
+        filas, cols = np.nonzero(~np.isnan(self.cambio_previo[:, columnas]))
+        cols = columnas[cols]
+        return pd.DataFrame({
+            'fecha_evaluacion': np.array(self.fechas, dtype=object)[filas],
+            'medida': np.array(self.medidas, dtype=object)[cols],
+            'valor': self.valores[filas, cols].astype(int),
+            'cambio': self.cambio_previo[filas, cols].astype(int),
+            'cambio_base': self.cambio_base[filas, cols].astype(int),
+            'umbral': self.umbral[cols].round(1),
+            'significativo': self.significativo[filas, cols],
+        })
+
+
+def _orden_medidas(medidas: set) -> List[str]:
+    """Subpruebas en el orden de PRUEBAS_INFO y luego compuestos en el orden de los resultados"""
+    orden = list(BaremosWPPSIUltra.PRUEBAS_INFO) + list(COMPUESTOS)
+    return sorted(medidas, key=lambda m: orden.index(m) if m in orden else len(orden))
+
+def analizar_trayectoria(filas: Sequence[Tuple]) -> Optional[AnalisisRetest]:
+    """
+    Construye el análisis a partir de las filas de AlmacenEvaluaciones.trayectoria
+
+    Returns:
+        AnalisisRetest, o None si no hay evaluaciones
+    """
+    if not filas:
+        return None
+    import numpy as np
+
+    evaluaciones: Dict[int, int] = {}
+    fechas, edades = [], []
+    for evaluacion_id, fecha, edad, *_ in filas:
+        if evaluacion_id not in evaluaciones:
+            evaluaciones[evaluacion_id] = len(evaluaciones)
+            fechas.append(fecha)
+            edades.append(edad)
+
+    compuestas_por_medida = {medida: bool(compuesta) for _, _, _, compuesta, medida, _ in filas}
+    medidas = _orden_medidas(set(compuestas_por_medida))
+    columna = {medida: i for i, medida in enumerate(medidas)}
+
+    indice_fila = np.fromiter((evaluaciones[f[0]] for f in filas), dtype=np.intp, count=len(filas))
+    indice_columna = np.fromiter((columna[f[4]] for f in filas), dtype=np.intp, count=len(filas))
+    valores = np.full((len(evaluaciones), len(medidas)), np.nan)
+    valores[indice_fila, indice_columna] = np.fromiter((f[5] for f in filas), dtype=np.float64, count=len(filas))
+
+    return AnalisisRetest(
+        evaluaciones=list(evaluaciones),
+        fechas=fechas,
+        edades_meses=edades,
+        medidas=medidas,
+        compuestas=np.array([compuestas_por_medida[m] for m in medidas], dtype=bool),
+        valores=valores,
+    )
@@ -0,0 +1,140 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+PROCESAMIENTO POR LOTES (COLUMNAR, VECTORIZADO)
+Requiere NumPy y pandas; se importa de forma diferida desde el paquete
+═══════════════════════════════════════════════════════════════════════════════
+"""
+
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd_lib
+
+from .baremos import BaremosWPPSIUltra, INDICES_PRIMARIOS, MOTOR_BAREMOS, MOTOR_INDICES, TABLA_METRICAS
+from .normas import obtener_normas
+
+
+def _matriz_pertenencia(grupos: Dict[str, List[str]]) -> np.ndarray:
+    """Matriz (prueba x grupo) con 1 donde la prueba aporta a la suma del grupo"""
+    matriz = np.zeros((len(MOTOR_BAREMOS.pruebas), len(grupos)), dtype=np.int32)
+    for j, pruebas in enumerate(grupos.values()):
+        for prueba in pruebas:
+            matriz[MOTOR_BAREMOS.posicion[prueba], j] = 1
+    return matriz
+
+def _columna_entera(valores: np.ndarray, validos: np.ndarray) -> pd_lib.arrays.IntegerArray:
+    return pd_lib.arrays.IntegerArray(np.where(validos, valores, 0).astype(np.int16), ~validos)
+
+def _calcular_edad_lote(fechas_nac, fechas_eval) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Versión vectorizada de BaremosWPPSIUltra.calcular_edad_exacta"""
+    nac = pd_lib.to_datetime(fechas_nac).to_numpy(dtype='datetime64[D]')
+    ev = pd_lib.to_datetime(fechas_eval).to_numpy(dtype='datetime64[D]')
+    validas = ~(np.isnat(nac) | np.isnat(ev))
+
+    def partes(fechas):
+        inicio_mes = fechas.astype('datetime64[M]')
+        anio = fechas.astype('datetime64[Y]').astype(np.int64) + 1970
+        mes = inicio_mes.astype(np.int64) % 12 + 1
+        dia = (fechas - inicio_mes.astype('datetime64[D]')).astype(np.int64) + 1
+        return anio, mes, dia
+
+    anio_n, mes_n, dia_n = partes(nac)
+    anio_e, mes_e, dia_e = partes(ev)
+    inicio_mes_eval = ev.astype('datetime64[M]')
+    dias_mes_anterior = (inicio_mes_eval.astype('datetime64[D]')
+                         - (inicio_mes_eval - 1).astype('datetime64[D]')).astype(np.int64)
+
+    years = anio_e - anio_n
+    months = mes_e - mes_n
+    days = dia_e - dia_n
+
+    negativos = days < 0
+    months = months - negativos
+    days = np.where(negativos, days + dias_mes_anterior, days)
+
+    negativos = months < 0
+    years = years - negativos
+    months = np.where(negativos, months + 12, months)
+
+    return years, months, days, validas
+
+def procesar_lote(df: pd_lib.DataFrame,
+                  columna_nacimiento: str = 'fecha_nacimiento',
+                  columna_evaluacion: str = 'fecha_evaluacion') -> pd_lib.DataFrame:
+    """
+    Procesa muchas evaluaciones en una sola llamada vectorizada
+
+    Args:
+        df: Una fila por evaluación, una columna de PD por prueba (NaN = no aplicada)
+            y opcionalmente las columnas de fecha de nacimiento y de evaluación
+        columna_nacimiento: Nombre de la columna de fecha de nacimiento
+        columna_evaluacion: Nombre de la columna de fecha de evaluación
+
+    Returns:
+        DataFrame columnar con el mismo índice: edad, PE por prueba, sumas por índice,
+        índices primarios/secundarios, CIT, percentiles, categorías, intervalos de
+        confianza y marcas de fortaleza/debilidad. Los valores coinciden con los de
+        procesar_evaluacion_completa para cada fila
+    """
+    pruebas = MOTOR_BAREMOS.pruebas
+    info = BaremosWPPSIUltra.PRUEBAS_INFO
+    secundarios = BaremosWPPSIUltra.INDICES_SECUNDARIOS_CONFIG
+
+    valores_pd = df.reindex(columns=list(pruebas)).to_numpy(dtype=np.float64, na_value=np.nan)
+    pe = MOTOR_BAREMOS.convertir_matriz(valores_pd)
+
+    salida = {}
+
+    if columna_nacimiento in df.columns and columna_evaluacion in df.columns:
+        years, months, days, validas = _calcular_edad_lote(df[columna_nacimiento], df[columna_evaluacion])
+        salida['edad_anios'] = _columna_entera(years, validas)
+        salida['edad_meses'] = _columna_entera(months, validas)
+        salida['edad_dias'] = _columna_entera(days, validas)
+
+        # Con edad conocida, cada fila se convierte con la banda de normas de su edad
+        normas = obtener_normas()
+        if normas is not None and validas.any():
+            pe[validas] = normas.convertir_matriz(valores_pd[validas], (years * 12 + months)[validas], pruebas)
+
+    aplicadas = pe > 0
+    pe32 = pe.astype(np.int32)
+
+    for j, prueba in enumerate(pruebas):
+        salida[f'pe_{prueba}'] = _columna_entera(pe[:, j], aplicadas[:, j])
+
+    # Sumas y conteos por índice mediante producto matricial
+    grupos_primarios = {idx: [p for p in pruebas if info[p]['indice_primario'] == idx] for idx in INDICES_PRIMARIOS}
+    pertenencia = _matriz_pertenencia(grupos_primarios)
+    sumas = pe32 @ pertenencia
+    contadores = aplicadas.astype(np.int32) @ pertenencia
+
+    pertenencia_sec = _matriz_pertenencia({k: c['pruebas'] for k, c in secundarios.items()})
+    sumas_sec = pe32 @ pertenencia_sec
+    contadores_sec = aplicadas.astype(np.int32) @ pertenencia_sec
+
+    for k, idx in enumerate(INDICES_PRIMARIOS):
+        salida[f'suma_{idx}'] = sumas[:, k]
+    suma_total = pe32.sum(axis=1)
+    salida['suma_total'] = suma_total
+
+    compuestos = {}
+    for k, idx in enumerate(INDICES_PRIMARIOS):
+        compuestos[idx] = (MOTOR_INDICES.convertir_lote(idx, sumas[:, k]), contadores[:, k] >= 2)
+    compuestos['CIT'] = (MOTOR_INDICES.convertir_lote('CIT', suma_total), aplicadas.sum(axis=1) >= 5)
+    for k, (idx, config) in enumerate(secundarios.items()):
+        compuestos[idx] = (MOTOR_INDICES.convertir_lote(idx, sumas_sec[:, k]),
+                           contadores_sec[:, k] >= len(config['pruebas']))
+
+    for idx, (valores, validos) in compuestos.items():
+        salida[idx] = _columna_entera(valores, validos)
+    for idx, (valores, validos) in compuestos.items():
+        salida[f'percentil_{idx}'] = np.where(validos, TABLA_METRICAS.columna('percentil', valores), None)
+        salida[f'categoria_{idx}'] = np.where(validos, TABLA_METRICAS.columna('categoria', valores), None)
+        salida[f'ic_inf_{idx}'] = _columna_entera(TABLA_METRICAS.columna('ic_inf', valores), validos)
+        salida[f'ic_sup_{idx}'] = _columna_entera(TABLA_METRICAS.columna('ic_sup', valores), validos)
+
+    for j, prueba in enumerate(pruebas):
+        salida[f'fortaleza_{prueba}'] = aplicadas[:, j] & (pe[:, j] >= 13)
+        salida[f'debilidad_{prueba}'] = aplicadas[:, j] & (pe[:, j] <= 7)
+
+    return pd_lib.DataFrame(salida, index=df.index)
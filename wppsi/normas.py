@@ -0,0 +1,275 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+NORMAS POR BANDA DE EDAD EN ARCHIVO BINARIO MAPEADO EN MEMORIA
+Tablas PD -> PE por banda de edad (meses), compartidas entre procesos vía mmap
+═══════════════════════════════════════════════════════════════════════════════
+Formato del archivo (little endian):
+
+    cabecera   8s magic 'WPPSINRM', H versión, H n_bandas, H n_pruebas,
+               H pd_maxima, H edad_min_meses, H meses_por_banda, I crc32
+    nombres    n_pruebas x 24 bytes (UTF-8, rellenado con ceros)
+    tablas     uint8 [n_bandas][n_pruebas][pd_maxima + 1]
+
+El CRC32 cubre nombres y tablas. Las celdas siguen las mismas reglas de recorte
+que MotorBaremosPE, así que la consulta es un único acceso por desplazamiento.
+El archivo incluido se genera desde TABLAS_CONVERSION_PD_PE; al cargarlo se
+compara con las tablas y, si alguien las edita sin regenerarlo, falla en vez de
+seguir puntuando con los valores viejos.
+
+    python -m wppsi.normas generar [ruta]
+    python -m wppsi.normas verificar [ruta]
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, TYPE_CHECKING
+
+from .baremos import BaremosWPPSIUltra, MotorBaremosPE
+
+if TYPE_CHECKING:
+    import numpy as np
+
+MAGIC = b'WPPSINRM'
+VERSION = 1
+CABECERA = struct.Struct('<8sHHHHHHI')
+BYTES_NOMBRE = 24
+
+EDAD_MIN_MESES = 48      # 4:0
+EDAD_MAX_MESES = 91      # 7:7
+MESES_POR_BANDA = 3
+
+RUTA_POR_DEFECTO = Path(__file__).resolve().parent / 'datos' / 'normas_wppsi.bin'
+
+
+class ErrorArchivoNormas(ValueError):
+    """El archivo de normas está dañado o no coincide con lo esperado"""
+
+
+def serializar_normas(tablas_por_banda: Sequence[Dict[str, Dict[int, int]]],
+                      edad_min_meses: int = EDAD_MIN_MESES, meses_por_banda: int = MESES_POR_BANDA) -> bytes:
+    """
+    Contenido del archivo de normas
+
+    Args:
+        tablas_por_banda: Una entrada por banda con el formato de TABLAS_CONVERSION_PD_PE
+        edad_min_meses: Edad (meses) del inicio de la primera banda
+        meses_por_banda: Amplitud de cada banda
+    """
+    pruebas = tuple(tablas_por_banda[0].keys())
+    motores = [MotorBaremosPE(tablas) for tablas in tablas_por_banda]
+    pd_maxima = max(motor.pd_maxima for motor in motores)
+
+    nombres = b''.join(p.encode('utf-8').ljust(BYTES_NOMBRE, b'\0') for p in pruebas)
+    celdas = bytearray()
+    for motor in motores:
+        for prueba in pruebas:
+            fila = motor.filas[motor.posicion[prueba]]
+            fila = fila + (fila[-1],) * (pd_maxima + 1 - len(fila))
+            celdas.extend(fila)
+
+    cuerpo = nombres + bytes(celdas)
+    cabecera = CABECERA.pack(MAGIC, VERSION, len(motores), len(pruebas), pd_maxima,
+                             edad_min_meses, meses_por_banda, zlib.crc32(cuerpo))
+    return cabecera + cuerpo
+
+
+def escribir_archivo_normas(ruta, tablas_por_banda: Sequence[Dict[str, Dict[int, int]]],
+                            edad_min_meses: int = EDAD_MIN_MESES,
+                            meses_por_banda: int = MESES_POR_BANDA) -> Path:
+    """
+    Escribe un archivo de normas de forma atómica (temporal + os.replace)
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    ruta = Path(ruta)
+    datos = serializar_normas(tablas_por_banda, edad_min_meses, meses_por_banda)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=ruta.name, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as f:
+            f.write(datos)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.unlink(temporal)
+        raise
+    return ruta
+
+
+def tablas_por_defecto() -> List[Dict[str, Dict[int, int]]]:
+    """
+    Baremos de BaremosWPPSIUltra replicados en cada banda de 3 meses de 4:0 a 7:7
+    (hasta disponer de tablas oficiales por banda)
+    """
+    n_bandas = (EDAD_MAX_MESES - EDAD_MIN_MESES) // MESES_POR_BANDA + 1
+    return [BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE] * n_bandas
+
+def generar_archivo_por_defecto(ruta=RUTA_POR_DEFECTO) -> Path:
+    """Genera el archivo incluido en el paquete a partir de tablas_por_defecto()"""
+    return escribir_archivo_normas(ruta, tablas_por_defecto())
+
+
+class NormasPorEdad:
+    """Vista de solo lectura sobre un archivo de normas mapeado en memoria"""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        with open(self.ruta, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            self._validar()
+        except Exception:
+            self._mm.close()
+            raise
+        self._vista = None
+
+    def _validar(self):
+        if len(self._mm) < CABECERA.size:
+            raise ErrorArchivoNormas(f"{self.ruta}: archivo truncado")
+
+        (magic, version, self.n_bandas, self.n_pruebas, self.pd_maxima,
+         self.edad_min_meses, self.meses_por_banda, crc) = CABECERA.unpack_from(self._mm, 0)
+
+        if magic != MAGIC:
+            raise ErrorArchivoNormas(f"{self.ruta}: no es un archivo de normas WPPSI")
+        if version != VERSION:
+            raise ErrorArchivoNormas(f"{self.ruta}: versión {version} no soportada")
+        if not (self.n_bandas and self.n_pruebas and self.meses_por_banda):
+            raise ErrorArchivoNormas(f"{self.ruta}: dimensiones vacías")
+
+        self.columnas = self.pd_maxima + 1
+        self.inicio_tablas = CABECERA.size + self.n_pruebas * BYTES_NOMBRE
+        esperado = self.inicio_tablas + self.n_bandas * self.n_pruebas * self.columnas
+        if len(self._mm) != esperado:
+            raise ErrorArchivoNormas(f"{self.ruta}: tamaño {len(self._mm)} bytes, se esperaban {esperado}")
+        if zlib.crc32(self._mm[CABECERA.size:]) != crc:
+            raise ErrorArchivoNormas(f"{self.ruta}: checksum incorrecto")
+
+        nombres = [self._mm[CABECERA.size + i * BYTES_NOMBRE:CABECERA.size + (i + 1) * BYTES_NOMBRE]
+                   .rstrip(b'\0').decode('utf-8') for i in range(self.n_pruebas)]
+        self.pruebas = tuple(nombres)
+        self.posicion = {prueba: i for i, prueba in enumerate(self.pruebas)}
+
+        faltantes = set(BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE) - set(self.posicion)
+        if faltantes or len(self.posicion) != self.n_pruebas:
+            raise ErrorArchivoNormas(f"{self.ruta}: pruebas incompletas o repetidas ({', '.join(sorted(faltantes))})")
+
+    def coincide_con(self, tablas_por_banda: Sequence[Dict[str, Dict[int, int]]]) -> bool:
+        """True si el archivo es exactamente el que se generaría con esas tablas"""
+        return self._mm[:] == serializar_normas(tablas_por_banda, self.edad_min_meses, self.meses_por_banda)
+
+    def banda(self, edad_meses: int) -> int:
+        """Banda de edad; las edades fuera de rango usan la banda más cercana"""
+        return min(max((edad_meses - self.edad_min_meses) // self.meses_por_banda, 0), self.n_bandas - 1)
+
+    def convertir_valor(self, prueba: str, puntuacion_directa: int, edad_meses: int) -> int:
+        """Conversión O(1): un acceso al byte de (banda, prueba, PD)"""
+        if puntuacion_directa < 0:
+            return 1
+        fila = self.banda(edad_meses) * self.n_pruebas + self.posicion[prueba]
+        return self._mm[self.inicio_tablas + fila * self.columnas + min(puntuacion_directa, self.pd_maxima)]
+
+    @property
+    def vista(self) -> 'np.ndarray':
+        """Array uint8 (banda x prueba x PD) sin copia sobre las páginas mapeadas"""
+        if self._vista is None:
+            import numpy as np
+            self._vista = np.frombuffer(self._mm, dtype=np.uint8, offset=self.inicio_tablas).reshape(
+                self.n_bandas, self.n_pruebas, self.columnas)
+        return self._vista
+
+    def convertir_matriz(self, pd_matriz, edades_meses, pruebas: Optional[List[str]] = None) -> 'np.ndarray':
+        """
+        Igual que MotorBaremosPE.convertir_matriz, pero cada fila usa la banda de su edad
+
+        Args:
+            pd_matriz: Array 2D de PD; NaN indica prueba no aplicada
+            edades_meses: Edad en meses de cada fila
+            pruebas: Nombre de prueba de cada columna (por defecto el orden de BaremosWPPSIUltra)
+        """
+        import numpy as np
+        pruebas = tuple(BaremosWPPSIUltra.TABLAS_CONVERSION_PD_PE) if pruebas is None else tuple(pruebas)
+        valores = np.asarray(pd_matriz, dtype=np.float64)
+        faltantes = np.isnan(valores)
+        pd_int = np.where(faltantes, 0, valores).astype(np.int64)
+
+        edades = np.asarray(edades_meses, dtype=np.int64)
+        bandas = np.clip((edades - self.edad_min_meses) // self.meses_por_banda, 0, self.n_bandas - 1)
+        filas = np.array([self.posicion[p] for p in pruebas], dtype=np.intp)
+
+        pe = self.vista[bandas[:, None], filas[None, :], np.clip(pd_int, 0, self.pd_maxima)]
+        pe = np.where(pd_int < 0, 1, pe).astype(np.int16)
+        pe[faltantes] = 0
+        return pe
+
+    def cerrar(self):
+        self._vista = None
+        self._mm.close()
+
+
+_normas = None
+_normas_cargadas = False
+_lock_normas = threading.Lock()
+
+def obtener_normas() -> Optional[NormasPorEdad]:
+    """
+    Normas del proceso, cargadas una sola vez. La ruta puede fijarse con
+    WPPSI_ARCHIVO_NORMAS. Si el archivo no existe se devuelve None y se usan los
+    baremos de BaremosWPPSIUltra; un archivo dañado, o el archivo incluido cuando
+    ya no coincide con TABLAS_CONVERSION_PD_PE, lanza ErrorArchivoNormas
+    """
+    global _normas, _normas_cargadas
+    if not _normas_cargadas:
+        with _lock_normas:
+            if not _normas_cargadas:
+                ruta = Path(os.environ.get('WPPSI_ARCHIVO_NORMAS', RUTA_POR_DEFECTO))
+                _normas = NormasPorEdad(ruta) if ruta.exists() else None
+                if _normas is not None and ruta == RUTA_POR_DEFECTO:
+                    _verificar_por_defecto(_normas)
+                _normas_cargadas = True
+    return _normas
+
+def _verificar_por_defecto(normas: NormasPorEdad):
+    if not normas.coincide_con(tablas_por_defecto()):
+        normas.cerrar()
+        raise ErrorArchivoNormas(f"{normas.ruta}: no coincide con TABLAS_CONVERSION_PD_PE; "
+                                 f"regenérelo con python -m wppsi.normas generar")
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera o verifica el archivo binario de normas por edad")
+    parser.add_argument('accion', choices=['generar', 'verificar'])
+    parser.add_argument('ruta', nargs='?', default=str(RUTA_POR_DEFECTO))
+    args = parser.parse_args(argv)
+
+    if args.accion == 'generar':
+        generar_archivo_por_defecto(args.ruta)
+
+    try:
+        normas = NormasPorEdad(args.ruta)
+        if Path(args.ruta).resolve() == RUTA_POR_DEFECTO:
+            _verificar_por_defecto(normas)
+    except (OSError, ErrorArchivoNormas) as e:
+        print(f"❌ {e}")
+        return 1
+
+    print(f"✅ {normas.ruta}: {normas.n_bandas} bandas de {normas.meses_por_banda} meses desde "
+          f"{normas.edad_min_meses} meses, {normas.n_pruebas} pruebas, PD 0-{normas.pd_maxima}")
+    normas.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
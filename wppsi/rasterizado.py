@@ -0,0 +1,173 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+RASTERIZADO DE GRÁFICOS EN PARALELO
+Pool de renderizadores de Kaleido ya arrancados para los gráficos del informe
+═══════════════════════════════════════════════════════════════════════════════
+Cada PlotlyScope de Kaleido 0.2 mantiene su propio proceso de Chromium y
+atiende una figura a la vez. El pool arranca varios al crearse (con una figura
+vacía, el primer render es el que paga el arranque) y reparte entre ellos las
+figuras de un informe: el lote tarda lo que el gráfico más lento. Un lote que
+excede el tiempo límite mata el proceso de las figuras pendientes (se rearranca
+con la siguiente) y las devuelve como error, igual que cualquier fallo de
+Kaleido. Sin Kaleido 0.2 cada renderizador usa plotly.io.to_image. Con una
+CacheImagenesDisco, las figuras ya rasterizadas con el mismo tamaño no pasan
+por Kaleido.
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from .cache_imagenes import CacheImagenesDisco, obtener_cache_imagenes
+
+FIGURA_VACIA = {'data': [], 'layout': {}}
+
+
+@dataclass(frozen=True)
+class ImagenRenderizada:
+    """PNG de un gráfico, o el error que impidió generarlo"""
+    nombre: str
+    png: Optional[bytes]
+    milisegundos: float
+    error: Optional[str] = None
+    desde_cache: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.png is not None
+
+
+class _Renderizador:
+    """Un proceso de Kaleido, reutilizado figura tras figura"""
+
+    def __init__(self):
+        try:
+            from kaleido.scopes.plotly import PlotlyScope
+            self._scope = PlotlyScope()
+        except ImportError:
+            self._scope = None
+
+    def png(self, figura: Any, ancho: int, alto: int, escala: float) -> bytes:
+        if self._scope is None:
+            import plotly.io as pio
+            return pio.to_image(figura, format='png', width=ancho, height=alto, scale=escala)
+        return self._scope.transform(figura, format='png', width=ancho, height=alto, scale=escala)
+
+    def detener(self):
+        """Mata el proceso de Chromium (desbloquea una figura colgada); Kaleido lo rearranca al usarlo"""
+        proceso = getattr(self._scope, '_proc', None)
+        if proceso is not None:
+            proceso.kill()
+
+
+class PoolRenderizado:
+    """Renderizadores calientes compartidos por todas las sesiones del proceso"""
+
+    def __init__(self, renderizadores: int = 3, tiempo_limite: float = 30.0,
+                 cache: Optional[CacheImagenesDisco] = None):
+        self.renderizadores = max(1, int(renderizadores))
+        self.tiempo_limite = tiempo_limite
+        self.cache = cache
+        self._libres = queue.Queue()
+        for _ in range(self.renderizadores):
+            self._libres.put(_Renderizador())
+        # Un hilo por renderizador: nunca hay una tarea en curso esperando un renderizador libre
+        self._ejecutor = ThreadPoolExecutor(max_workers=self.renderizadores, thread_name_prefix='wppsi-render')
+        self._lock = threading.Lock()
+        self.renderizadas = 0
+        self.fallidas = 0
+        for _ in range(self.renderizadores):
+            self._ejecutor.submit(self._renderizar, '_calentamiento', FIGURA_VACIA, 10, 10, 1, {})
+
+    def _renderizar(self, nombre: str, figura: Any, ancho: int, alto: int, escala: float,
+                    en_uso: Dict[str, _Renderizador]) -> ImagenRenderizada:
+        renderizador = self._libres.get()
+        en_uso[nombre] = renderizador
+        inicio = time.perf_counter()
+        try:
+            png, error = renderizador.png(figura, ancho, alto, escala), None
+        except Exception as e:
+            png, error = None, f"{type(e).__name__}: {' '.join(str(e).split())}"
+        finally:
+            en_uso.pop(nombre, None)
+            self._libres.put(renderizador)
+        return ImagenRenderizada(nombre, png, (time.perf_counter() - inicio) * 1000, error)
+
+    def renderizar(self, trabajos: Dict[str, Tuple[Any, int, int, float]],
+                   tiempo_limite: Optional[float] = None) -> Dict[str, ImagenRenderizada]:
+        """
+        Rasteriza un lote de figuras en paralelo
+
+        Args:
+            trabajos: {nombre: (figura, ancho, alto, escala)}; las figuras None se omiten
+            tiempo_limite: Segundos para todo el lote (por defecto el del pool)
+
+        Returns:
+            {nombre: ImagenRenderizada} con una entrada por figura no nula
+        """
+        limite = self.tiempo_limite if tiempo_limite is None else tiempo_limite
+        trabajos = {nombre: trabajo for nombre, trabajo in trabajos.items() if trabajo[0] is not None}
+        resultados, claves = {}, {}
+        if self.cache is not None:
+            for nombre, (figura, ancho, alto, escala) in trabajos.items():
+                inicio = time.perf_counter()
+                claves[nombre] = self.cache.clave(figura, ancho, alto, escala)
+                png = self.cache.obtener(claves[nombre])
+                if png is not None:
+                    resultados[nombre] = ImagenRenderizada(nombre, png, (time.perf_counter() - inicio) * 1000,
+                                                           desde_cache=True)
+
+        en_uso: Dict[str, _Renderizador] = {}
+        futuros = {nombre: self._ejecutor.submit(self._renderizar, nombre, figura, ancho, alto, escala, en_uso)
+                   for nombre, (figura, ancho, alto, escala) in trabajos.items() if nombre not in resultados}
+        wait(futuros.values(), timeout=limite)
+
+        for nombre, futuro in futuros.items():
+            if futuro.done():
+                resultados[nombre] = futuro.result()
+                if resultados[nombre].ok and nombre in claves:
+                    self.cache.guardar(claves[nombre], resultados[nombre].png)
+                continue
+            if not futuro.cancel():
+                renderizador = en_uso.get(nombre)
+                if renderizador is not None:
+                    renderizador.detener()
+            resultados[nombre] = ImagenRenderizada(nombre, None, limite * 1000, f"Tiempo agotado ({limite:g} s)")
+
+        with self._lock:
+            self.renderizadas += sum(resultados[nombre].ok for nombre in futuros)
+            self.fallidas += sum(not resultados[nombre].ok for nombre in futuros)
+        return {nombre: resultados[nombre] for nombre in trabajos}
+
+    def estadisticas(self) -> Dict:
+        with self._lock:
+            return {'renderizadores': self.renderizadores, 'renderizadas': self.renderizadas,
+                    'fallidas': self.fallidas}
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=False, cancel_futures=True)
+        while not self._libres.empty():
+            self._libres.get_nowait().detener()
+
+
+_pool = None
+_lock_pool = threading.Lock()
+
+def obtener_pool_renderizado() -> PoolRenderizado:
+    """
+    Pool del proceso, creado (y calentado en segundo plano) la primera vez que se pide.
+    WPPSI_RENDERIZADORES y WPPSI_TIEMPO_RENDER configuran tamaño y tiempo límite;
+    las imágenes se guardan en obtener_cache_imagenes()
+    """
+    global _pool
+    if _pool is None:
+        with _lock_pool:
+            if _pool is None:
+                _pool = PoolRenderizado(int(os.environ.get('WPPSI_RENDERIZADORES', 3)),
+                                        float(os.environ.get('WPPSI_TIEMPO_RENDER', 30)),
+                                        cache=obtener_cache_imagenes())
+    return _pool
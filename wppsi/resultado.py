@@ -0,0 +1,202 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MODELO COMPACTO DE RESULTADOS DE UNA EVALUACIÓN
+Dataclass inmutable con slots: cada valor se guarda una sola vez
+═══════════════════════════════════════════════════════════════════════════════
+Solo se almacenan los valores primarios (pruebas, PD, PE, sumas e índices).
+Percentiles, categorías, intervalos, fortalezas/debilidades, estadísticas y
+recomendaciones son vistas derivadas que se calculan al consultarlas. Al ser
+inmutable, el mismo objeto puede compartirse entre sesiones y con el memo.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .baremos import BaremosWPPSIUltra, INDICES_PRIMARIOS, TABLA_METRICAS
+
+
+@dataclass(frozen=True, slots=True)
+class ResultadoEvaluacion:
+    """Resultado de procesar_evaluacion_completa"""
+
+    pruebas: Tuple[str, ...]                   # Pruebas puntuadas, en orden de aplicación
+    valores_pd: Tuple[int, ...]                # PD alineadas con pruebas
+    valores_pe: Tuple[int, ...]                # PE alineadas con pruebas
+    sumas: Tuple[int, ...]                     # Suma de PE alineada con INDICES_PRIMARIOS
+    indices: Tuple[Tuple[str, int], ...]       # Índices primarios calculados (sin CIT)
+    cit: Optional[int]
+    secundarios: Tuple[Tuple[str, int], ...]   # Índices secundarios calculados
+    edad_meses: Optional[int] = None
+
+    # ───────────── Serialización compacta ─────────────
+
+    def a_tupla(self) -> Tuple:
+        """Forma plana de tuplas, enteros y cadenas (sirve para pickle, JSON o msgpack)"""
+        return (self.pruebas, self.valores_pd, self.valores_pe, self.sumas,
+                self.indices, self.cit, self.secundarios, self.edad_meses)
+
+    @classmethod
+    def desde_tupla(cls, datos) -> 'ResultadoEvaluacion':
+        pruebas, valores_pd, valores_pe, sumas, indices, cit, secundarios, edad_meses = datos
+        return cls(tuple(pruebas), tuple(valores_pd), tuple(valores_pe), tuple(sumas),
+                   tuple((k, v) for k, v in indices), cit,
+                   tuple((k, v) for k, v in secundarios), edad_meses)
+
+    def __reduce__(self):
+        return (ResultadoEvaluacion, self.a_tupla())
+
+    # ───────────── Vistas para la interfaz y el PDF ─────────────
+
+    @property
+    def pd(self) -> Dict[str, int]:
+        return dict(zip(self.pruebas, self.valores_pd))
+
+    @property
+    def pe(self) -> Dict[str, int]:
+        return dict(zip(self.pruebas, self.valores_pe))
+
+    @property
+    def sumas_indices(self) -> Dict[str, int]:
+        return dict(zip(INDICES_PRIMARIOS, self.sumas))
+
+    @property
+    def suma_total(self) -> int:
+        return sum(self.valores_pe)
+
+    @property
+    def indices_primarios(self) -> Dict[str, int]:
+        """Índices primarios calculados más 'CIT' (como en el resultado clásico)"""
+        indices = dict(self.indices)
+        if self.cit is not None:
+            indices['CIT'] = self.cit
+        return indices
+
+    @property
+    def indices_secundarios(self) -> Dict[str, int]:
+        return dict(self.secundarios)
+
+    def compuestos(self) -> Iterator[Tuple[str, int]]:
+        """Todos los compuestos calculados: primarios, CIT y secundarios"""
+        yield from self.indices
+        if self.cit is not None:
+            yield 'CIT', self.cit
+        yield from self.secundarios
+
+    def valor(self, indice: str) -> Optional[int]:
+        for nombre, valor in self.compuestos():
+            if nombre == indice:
+                return valor
+        return None
+
+    def percentil(self, indice: str):
+        return TABLA_METRICAS.obtener(self.valor(indice))[0]
+
+    def categoria(self, indice: str) -> Dict[str, str]:
+        _, cat, color, desc, _, _ = TABLA_METRICAS.obtener(self.valor(indice))
+        return {'categoria': cat, 'color': color, 'descripcion': desc}
+
+    def intervalo(self, indice: str) -> Tuple[Optional[int], Optional[int]]:
+        return TABLA_METRICAS.obtener(self.valor(indice))[4:6]
+
+    @property
+    def percentiles(self) -> Dict:
+        return {k: self.percentil(k) for k, _ in self.compuestos()}
+
+    @property
+    def categorias(self) -> Dict[str, Dict[str, str]]:
+        return {k: self.categoria(k) for k, _ in self.compuestos()}
+
+    @property
+    def intervalos_confianza(self) -> Dict[str, Tuple[int, int]]:
+        return {k: self.intervalo(k) for k, _ in self.compuestos()}
+
+    def _pruebas_clasificadas(self, clasificacion: str) -> List[Dict]:
+        seleccion = []
+        for prueba, pe in zip(self.pruebas, self.valores_pe):
+            if BaremosWPPSIUltra.clasificar_pe(pe) == clasificacion:
+                info = BaremosWPPSIUltra.PRUEBAS_INFO[prueba]
+                seleccion.append({
+                    'prueba': info['nombre'],
+                    'codigo': info['nombre_corto'],
+                    'pe': pe,
+                    'descripcion': info['descripcion'],
+                    'que_mide': info['que_mide'],
+                    'indice': info['indice_primario'],
+                    'habilidades': info.get('habilidades', [])
+                })
+        return seleccion
+
+    @property
+    def fortalezas(self) -> List[Dict]:
+        return self._pruebas_clasificadas("Fortaleza")
+
+    @property
+    def debilidades(self) -> List[Dict]:
+        return self._pruebas_clasificadas("Debilidad")
+
+    @property
+    def estadisticas_perfil(self) -> Dict:
+        if not self.valores_pe:
+            return {}
+
+        import numpy as np  # diferido: no encarece la importación del paquete
+
+        pe_valores = list(self.valores_pe)
+        return {
+            'pe_min': min(pe_valores),
+            'pe_max': max(pe_valores),
+            'pe_media': np.mean(pe_valores),
+            'pe_mediana': np.median(pe_valores),
+            'pe_desviacion': np.std(pe_valores),
+            'pe_rango': max(pe_valores) - min(pe_valores),
+            'pe_varianza': np.var(pe_valores),
+            'pe_coef_variacion': (np.std(pe_valores) / np.mean(pe_valores)) * 100 if np.mean(pe_valores) > 0 else 0
+        }
+
+    @property
+    def analisis_comparativo(self) -> Dict[str, Dict]:
+        """Diferencia de cada índice primario respecto a la media personal de índices"""
+        analisis = {}
+        calculados = [(idx, valor) for idx, valor in self.indices if valor is not None]
+        if len(self.indices) + (self.cit is not None) >= 2 and calculados:
+            import numpy as np
+
+            media_indices = np.mean([v for _, v in calculados])
+            for idx, valor in calculados:
+                diferencia = valor - media_indices
+                analisis[idx] = {
+                    'valor': valor,
+                    'media_personal': media_indices,
+                    'diferencia_media': diferencia,
+                    'significativo': abs(diferencia) >= 15,
+                    'desviaciones': diferencia / 15  # En unidades de DE
+                }
+        return analisis
+
+    @property
+    def recomendaciones(self) -> List[str]:
+        from .evaluacion import generar_recomendaciones
+        return generar_recomendaciones({'cit': self.cit, 'fortalezas': self.fortalezas,
+                                        'debilidades': self.debilidades})
+
+    def a_dict(self, datos_personales: Optional[Dict] = None, pruebas_aplicadas: Optional[Dict] = None) -> Dict:
+        """Resultado anidado clásico (para exportaciones o código que aún espera el dict)"""
+        return {
+            'datos_personales': datos_personales,
+            'pruebas_aplicadas': pruebas_aplicadas,
+            'pd': self.pd,
+            'pe': self.pe,
+            'sumas_indices': self.sumas_indices,
+            'indices_primarios': self.indices_primarios,
+            'indices_secundarios': self.indices_secundarios,
+            'cit': self.cit,
+            'percentiles': self.percentiles,
+            'categorias': self.categorias,
+            'intervalos_confianza': self.intervalos_confianza,
+            'fortalezas': self.fortalezas,
+            'debilidades': self.debilidades,
+            'analisis_comparativo': self.analisis_comparativo,
+            'interpretacion_narrativa': {},
+            'estadisticas_perfil': self.estadisticas_perfil,
+            'recomendaciones': self.recomendaciones
+        }
@@ -0,0 +1,75 @@
+"""
+Medición del presupuesto de importación del núcleo de puntuación
+
+    python -m wppsi.tiempo_importacion [--presupuesto-ms 100] [--repeticiones 5]
+
+Lanza intérpretes nuevos (sin módulos en caché), mide `import wppsi` y
+comprueba que no se hayan cargado dependencias pesadas. Sale con código 1
+si la mediana supera el presupuesto o si se importó alguna de ellas.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+PRESUPUESTO_IMPORTACION_MS = 100.0
+MODULOS_PESADOS = ('streamlit', 'numpy', 'pandas', 'scipy', 'plotly', 'reportlab')
+
+_CODIGO_MEDICION = """
+import json, sys, time
+t = time.perf_counter()
+import {modulo}
+ms = (time.perf_counter() - t) * 1000
+print(json.dumps({{'ms': ms, 'pesados': [m for m in {pesados!r} if m in sys.modules]}}))
+"""
+
+
+def medir_importacion(modulo: str = 'wppsi', repeticiones: int = 5) -> Dict:
+    """Mide el tiempo de importación en procesos nuevos y devuelve mediana y muestras"""
+    codigo = _CODIGO_MEDICION.format(modulo=modulo, pesados=MODULOS_PESADOS)
+    raiz = Path(__file__).resolve().parent.parent
+    muestras: List[float] = []
+    pesados = set()
+
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', codigo], cwd=raiz,
+                                capture_output=True, text=True, check=True)
+        datos = json.loads(salida.stdout.strip().splitlines()[-1])
+        muestras.append(datos['ms'])
+        pesados.update(datos['pesados'])
+
+    return {
+        'modulo': modulo,
+        'mediana_ms': statistics.median(muestras),
+        'muestras_ms': muestras,
+        'modulos_pesados': sorted(pesados)
+    }
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica el presupuesto de importación de wppsi")
+    parser.add_argument('--presupuesto-ms', type=float, default=PRESUPUESTO_IMPORTACION_MS)
+    parser.add_argument('--repeticiones', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    resultado = medir_importacion(repeticiones=args.repeticiones)
+    print(f"import wppsi: mediana {resultado['mediana_ms']:.1f} ms "
+          f"(presupuesto {args.presupuesto_ms:.0f} ms, {args.repeticiones} procesos)")
+
+    if resultado['modulos_pesados']:
+        print(f"❌ Dependencias pesadas importadas: {', '.join(resultado['modulos_pesados'])}")
+        return 1
+    if resultado['mediana_ms'] > args.presupuesto_ms:
+        print("❌ Presupuesto de importación superado")
+        return 1
+
+    print("✅ Dentro del presupuesto")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())